@@ -1,18 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, Form, Request, Response
 from typing import List, Dict, Optional
 from app.db.repository.files import FilesRepository
 from app.db.repository.tags import TagsRepository
-from app.schemas.app import FileOut, TagOut, FileUploadResponse, TagInput
+from app.schemas.app import FileOut, TagOut, TagFacetsOut, FileUploadResponse, TagInput
 from app.core.security import get_current_user
 from uuid import uuid4
 from datetime import datetime, timedelta
 import json
-from app.utils.s3 import upload_file_to_s3, delete_object,generate_presigned_url
-from app.utils.video_utils import generate_video_thumbnail
+from app.utils.s3 import upload_file_to_s3, upload_stream_to_s3, delete_object,generate_presigned_url, generate_presigned_urls
+from app.celery_worker.tasks.media import generate_file_renditions, THUMBNAIL_PENDING, THUMBNAIL_FAILED
+from app.utils.renditions import media_kind
+from app.utils.tag_index import tag_index
+from app.utils.pagination import decode_cursor, set_next_cursor
 from fastapi.responses import StreamingResponse
 import io
 import csv
-from rapidfuzz import fuzz
 import asyncio
 import tempfile
 import os
@@ -21,127 +23,134 @@ router = APIRouter()
 files_repo = FilesRepository()
 tags_repo = TagsRepository()
 
-@router.post("/upload")
-async def upload_file(
-    file: UploadFile = File(...),
-    tags: str = Form("{}"),
-    current_user: dict = Depends(get_current_user)
-):
-    tenant_id = current_user.get("tenant_id")
-    bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
-    
-        # Check if file is a video and generate thumbnail
-    file_content_type = file.content_type or ""
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv']
-    video_content_types = ['video/mp4', 'video/x-msvideo', 'video/quicktime', 'video/webm', 'video/x-flv', 'video/x-ms-wmv']
-    
-    # Parse tags from form data
-    try:
-        tags_data = json.loads(tags)
-    except json.JSONDecodeError:
-        tags_data = {}
-        
-    # Read file content once
-    file_content = await file.read()
-    
-    # Create a new UploadFile-like object for S3 upload
-    file_for_s3 = UploadFile(
-        filename=file.filename,
-        file=io.BytesIO(file_content),
-    )
-    
-    # Create a new UploadFile-like object for thumbnail generation
-    file_for_thumbnail = UploadFile(
-        filename=file.filename,
-        file=io.BytesIO(file_content),
-    )
-    
-    # Upload file to S3
-    s3_key = f"{tenant_id}/{str(uuid4())}/{file.filename}"
-    s3_url = await upload_file_to_s3(file_for_s3, s3_key, bucket_name)
-    
+async def _save_uploaded_file(
+    tenant_id: str,
+    bucket_name: str,
+    file_name: str,
+    s3_key: str,
+    s3_url: str,
+    tags_data: Dict[str, List[str]],
+    content_type: Optional[str] = None
+) -> Dict:
+    """Tag and record a file that is already in S3, queueing its renditions for images, PDFs and videos."""
     # Create file record
     file_id = str(uuid4())
     file_record = {
         "_id": file_id,
-        "file_name": file.filename,
+        "file_name": file_name,
         "s3_key": s3_key,
         "s3_url": s3_url,
         "created_at": datetime.now(),
         "tenant_id": tenant_id,
+        "content_type": content_type,
         "tags": []
     }
     
-
-    is_video = (file_content_type.startswith('video/') or 
-                file_content_type in video_content_types or 
-                file_extension in video_extensions)
+    # Previews are rendered in the background; clients poll thumbnail_status
+    has_renditions = media_kind(file_name, content_type) is not None
+    if has_renditions:
+        file_record["thumbnail_status"] = THUMBNAIL_PENDING
     
-    if is_video:
-                
-        thumbnail_result = await generate_video_thumbnail(file_for_thumbnail)
-        
-        
-        if thumbnail_result:
-            thumbnail_data, content_type = thumbnail_result
-            
-            # Upload thumbnail to S3
-            thumbnail_key = f"{tenant_id}/{str(uuid4())}/thumbnail_{file.filename}.jpg"
-            
-            # Create upload file object for the thumbnail
-            thumbnail_upload = UploadFile(
-                filename=f"thumbnail_{file.filename}.jpg",
-                file=io.BytesIO(thumbnail_data),
-            )
-            
-            # Upload to S3
-            thumbnail_url = await upload_file_to_s3(thumbnail_upload, thumbnail_key, bucket_name)
-            file_record["thumbnail_url"] = thumbnail_url
-            print(f"Thumbnail uploaded to S3: {thumbnail_url}","file record",file_record)
-    
-    # Process tags
-    for tag_type, tag_list in tags_data.items():
-        for tag_name in tag_list:
-            # Check if tag exists
-            existing_tag = await tags_repo.find_one({
-                "name": tag_name,
-                "type": tag_type,
-                "tenant_id": tenant_id
-            })
-            
-            if existing_tag:
-                tag_id = existing_tag["_id"]
-            else:
-                # Create new tag
-                tag_id = str(uuid4())
-                await tags_repo.insert_one({
-                    "_id": tag_id,
-                    "name": tag_name,
-                    "type": tag_type,
-                    "tenant_id": tenant_id
-                })
-            
-            # Add tag to file record
-            file_record["tags"].append(tag_id)
+    # Resolve or create all tags at once
+    file_record["tags"] = await tags_repo.bulk_upsert(tenant_id, tags_data)
+    file_record["tag_types"] = files_repo.tag_types_of(tags_data)
     
     # Save file record
     await files_repo.insert_one(file_record)
+    await tag_index.file_tagged(tenant_id, file_id, file_record["tags"])
+    
+    if has_renditions:
+        try:
+            # delay() talks to the broker synchronously, keep it off the event loop
+            await asyncio.to_thread(generate_file_renditions.delay, file_id, bucket_name)
+        except Exception as e:
+            print(f"Could not queue renditions for file {file_id}: {str(e)}")
+            file_record["thumbnail_status"] = THUMBNAIL_FAILED
+            await files_repo.update_one({"_id": file_id}, {"thumbnail_status": THUMBNAIL_FAILED})
     
     response = {
         "id": file_id,
-        "file_name": file.filename,
+        "file_name": file_name,
         "s3_key": s3_key,
         "s3_url": s3_url,
         "tags": file_record["tags"]
     }
     
-    # Add thumbnail_url to response if available
-    if "thumbnail_url" in file_record:
-        response["thumbnail_url"] = file_record["thumbnail_url"]
+    if "thumbnail_status" in file_record:
+        response["thumbnail_status"] = file_record["thumbnail_status"]
     
     return response
 
+
+def _parse_tags(tags: str) -> Dict[str, List[str]]:
+    try:
+        return json.loads(tags)
+    except json.JSONDecodeError:
+        return {}
+
+
+@router.post("/upload")
+async def upload_file(
+    file: UploadFile = File(...),
+    tags: str = Form("{}"),
+    current_user: dict = Depends(get_current_user)
+):
+    tenant_id = current_user.get("tenant_id")
+    bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
+    
+    # Parse tags from form data
+    tags_data = _parse_tags(tags)
+    
+    # Upload straight from the spooled upload, so the content is never copied into memory
+    s3_key = f"{tenant_id}/{str(uuid4())}/{file.filename}"
+    s3_url = await upload_file_to_s3(file, s3_key, bucket_name)
+    
+    return await _save_uploaded_file(tenant_id, bucket_name, file.filename, s3_key, s3_url, tags_data, file.content_type)
+
+
+@router.put("/upload/stream")
+async def upload_file_stream(
+    request: Request,
+    file_name: str = Query(..., description="Name of the uploaded file"),
+    tags: str = Query("{}", description="JSON object of tag type -> list of tag names"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Upload a file sent as the raw request body (not multipart form data).
+
+    The body is piped to an S3 multipart upload as it arrives, so memory use
+    stays bounded whatever the file size.
+    """
+    tenant_id = current_user.get("tenant_id")
+    bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
+    content_type = request.headers.get("content-type") or "application/octet-stream"
+    tags_data = _parse_tags(tags)
+    
+    s3_key = f"{tenant_id}/{str(uuid4())}/{file_name}"
+    s3_url = await upload_stream_to_s3(request.stream(), s3_key, bucket_name, content_type)
+    
+    return await _save_uploaded_file(tenant_id, bucket_name, file_name, s3_key, s3_url, tags_data, content_type)
+
+
+@router.get("/files/{file_id}/thumbnail")
+async def get_file_thumbnail(
+    file_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Poll the background thumbnail and renditions of an uploaded file."""
+    tenant_id = current_user.get("tenant_id")
+    
+    file = await files_repo.find_one({"_id": file_id, "tenant_id": tenant_id})
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return {
+        "id": file_id,
+        "thumbnail_status": file.get("thumbnail_status"),
+        "thumbnail_url": file.get("thumbnail_url"),
+        "renditions": file.get("renditions")
+    }
+
 @router.get("/download/{file_id}")
 async def download_file(
     file_id: str,
@@ -163,12 +172,15 @@ async def download_file(
 
 @router.get("/files", response_model=List[FileOut])
 async def get_files(
+    response: Response,
     offset: int = 0,
     limit: int = Query(default=10, le=100),
     tag_type: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces offset"),
     current_user: dict = Depends(get_current_user)
 ):
     tenant_id = current_user.get("tenant_id")
+    after = decode_cursor(cursor) if cursor else None
     
     # Call appropriate repository method based on whether tag_type is provided
     if tag_type:
@@ -177,7 +189,8 @@ async def get_files(
             tenant_id=tenant_id, 
             tag_type=tag_type,
             limit=limit, 
-            skip=offset
+            skip=offset,
+            after=after
         )
     else:
         # Get all files without tag type filtering
@@ -185,9 +198,16 @@ async def get_files(
             tenant_id=tenant_id, 
             limit=limit, 
             skip=offset,
-            sort={"created_at": -1}  # Sort by created_at descending (newest first)
+            sort={"created_at": -1},  # Sort by created_at descending (newest first)
+            after=after
         )
     
+    # Both listings are ordered newest first
+    set_next_cursor(response, files, {"created_at": -1}, limit)
+    
+    # Sign the download URLs of the whole page at once
+    download_urls = generate_presigned_urls(f"AWS_S3_BUCKET_{tenant_id}", [file["s3_key"] for file in files])
+    
     result = []
     for file in files:
         result.append({
@@ -195,7 +215,10 @@ async def get_files(
             "file_name": file["file_name"],
             "s3_key": file["s3_key"],
             "created_at": file["created_at"],
-            "tags": file.get("tags", [])  # Leave as list of tag IDs to match schema
+            "tags": file.get("tags", []),  # Leave as list of tag IDs to match schema
+            "download_url": download_urls[file["s3_key"]],
+            "thumbnail_url": file.get("thumbnail_url"),
+            "renditions": file.get("renditions")
         })
     
     return result
@@ -216,6 +239,9 @@ async def get_files_by_tags(
         limit=limit
     )
     
+    # Sign the download URLs of the whole page at once
+    download_urls = generate_presigned_urls(f"AWS_S3_BUCKET_{tenant_id}", [file["s3_key"] for file in files])
+    
     result = []
     for file in files:
         tags_by_type = {}
@@ -236,6 +262,7 @@ async def get_files_by_tags(
             "file_name": file["file_name"],
             "s3_key": file["s3_key"],
             "s3_url": file["s3_url"],
+            "download_url": download_urls[file["s3_key"]],
             "created_at": file["created_at"],
             "tags": formatted_tags
         }
@@ -243,6 +270,10 @@ async def get_files_by_tags(
         # Add thumbnail_url to response if it exists
         if "thumbnail_url" in file:
             file_data["thumbnail_url"] = file["thumbnail_url"]
+        if "thumbnail_status" in file:
+            file_data["thumbnail_status"] = file["thumbnail_status"]
+        if "renditions" in file:
+            file_data["renditions"] = file["renditions"]
         
         result.append(file_data)
     
@@ -276,18 +307,15 @@ async def tag_suggestions(
     tag_ids: Optional[List[str]] = Query(None, description="List of tag IDs to filter by"),
     offset: int = 0,
     limit: int = Query(default=10, le=50),
+    fuzzy: bool = Query(False, description="Match tag names similar to the query, tolerating typos"),
     current_user: dict = Depends(get_current_user)
 ):
     tenant_id = current_user.get("tenant_id")
     
-    # Use the new repository method with a single pipeline
-    tags = await tags_repo.get_tag_suggestions(
-        tenant_id=tenant_id,
-        query=query,
-        tag_ids=tag_ids,
-        skip=offset,
-        limit=limit
-    )
+    # Served from the in-memory tag index: word-prefix (or fuzzy) matches,
+    # restricted to tags co-occurring with tag_ids and ranked by how often they do
+    index = await tag_index.get(tenant_id)
+    tags = index.suggest(query, selected=tag_ids, skip=offset, limit=limit, fuzzy=fuzzy)
     
     return [
         {
@@ -297,6 +325,32 @@ async def tag_suggestions(
         } for tag in tags
     ]
 
+@router.get("/tags-facets", response_model=TagFacetsOut)
+async def tag_facets(
+    tag_ids: Optional[List[str]] = Query(None, description="List of tag IDs to filter by"),
+    top_n: int = Query(default=10, le=100, description="Number of tags returned per tag type"),
+    current_user: dict = Depends(get_current_user)
+):
+    tenant_id = current_user.get("tenant_id")
+    
+    # Counts for every tag type and its top tags among the files having all
+    # tag_ids, answered (and cached per filter) by the in-memory tag index
+    index = await tag_index.get(tenant_id)
+    facets = index.facets(tag_ids, top_n=top_n)
+    
+    return {
+        "total": facets["total"],
+        "types": [
+            {
+                **facet,
+                "tags": [
+                    {"id": tag["_id"], "name": tag["name"], "type": tag["type"], "count": tag["count"]}
+                    for tag in facet["tags"]
+                ]
+            } for facet in facets["types"]
+        ]
+    }
+
 @router.put("/files/{file_id}/tags", response_model=FileOut)
 async def update_file_tags(
     file_id: str,
@@ -310,33 +364,15 @@ async def update_file_tags(
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Process new tags
-    new_tag_ids = []
-    for tag_type, tag_names in tag_input.tags.items():
-        for tag_name in tag_names:
-            # Check if tag exists
-            existing_tag = await tags_repo.find_one({
-                "name": tag_name,
-                "type": tag_type,
-                "tenant_id": tenant_id
-            })
-            
-            if existing_tag:
-                tag_id = existing_tag["_id"]
-            else:
-                # Create new tag
-                tag_id = str(uuid4())
-                await tags_repo.insert_one({
-                    "_id": tag_id,
-                    "name": tag_name,
-                    "type": tag_type,
-                    "tenant_id": tenant_id
-                })
-            
-            new_tag_ids.append(tag_id)
+    # Resolve or create all tags at once
+    new_tag_ids = await tags_repo.bulk_upsert(tenant_id, tag_input.tags)
     
     # Update file with new tags
-    await files_repo.update_one({"_id": file_id}, {"tags": new_tag_ids})
+    await files_repo.update_one(
+        {"_id": file_id},
+        {"tags": new_tag_ids, "tag_types": files_repo.tag_types_of(tag_input.tags)}
+    )
+    await tag_index.file_tagged(tenant_id, file_id, new_tag_ids)
     
     # Return updated file with only tag IDs to match the FileOut schema
     updated_file = await files_repo.files_with_tags(tenant_id=tenant_id, limit=1, skip=0, id=file_id)
@@ -366,6 +402,7 @@ async def delete_file(file_id: str, current_user: dict = Depends(get_current_use
     
     # Delete file record
     await files_repo.delete_one({"_id": file_id})
+    await tag_index.file_removed(tenant_id, file_id)
     return {"detail": "File deleted successfully"}
 
 
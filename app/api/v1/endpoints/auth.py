@@ -131,7 +131,7 @@ async def signup(
     await users_repo.insert_one(new_user)
     
     # Get the role name for the response
-    role = await roles_repo.find_one({"_id": str(role_id)})
+    role = await roles_repo.get_role(str(role_id))
     role_name = role["name"] if role else "user"
     
     return UserResponse(
@@ -170,7 +170,7 @@ async def login(
         if not user or not pwd_context.verify(form_data.password, user["hashed_password"]):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
         
-        role = await roles_repo.find_one({"_id": user["role_id"]}) if user.get("role_id") else None
+        role = await roles_repo.get_role(user.get("role_id"))
         token_data = {
             "_id": user["_id"] if "_id" in user else user.get("id"),
             "tenant_id": user["tenant_id"],
@@ -210,7 +210,7 @@ async def swagger_login(login_data: OAuth2PasswordRequestForm = Depends()):
         # Get tenant_id from the user record
         tenant_id = user["tenant_id"]
         
-        role = await roles_repo.find_one({"_id": user["role_id"]}) if user.get("role_id") else None
+        role = await roles_repo.get_role(user.get("role_id"))
         token_data = {
             "_id": user["_id"] if "_id" in user else user.get("id"),
             "tenant_id": tenant_id,
@@ -253,7 +253,7 @@ async def refresh_token(refresh_token: str):
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
 
-        role = await roles_repo.find_one({"_id": user["role_id"]}) if user.get("role_id") else None
+        role = await roles_repo.get_role(user.get("role_id"))
         token_data = {
             "_id": user["_id"] if "_id" in user else user.get("id"),
             "tenant_id": user["tenant_id"],
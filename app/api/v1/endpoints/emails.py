@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
 from typing import List, Dict, Any, Optional
 from uuid import UUID, uuid4
 from datetime import datetime
+import asyncio
 import base64
 import io
 from app.schemas.email import EmailData, EmailResponse, Attachment
@@ -9,8 +10,19 @@ from app.db.repository.emails import EmailsRepository
 from app.core.security import get_current_user
 from app.utils.openai_api import gpt
 from app.schemas.event import AIEventExtraction
-from app.utils.s3 import upload_file_to_s3, get_valid_bucket_name, create_s3_bucket
+from app.utils.s3 import upload_file_to_s3, get_valid_bucket_name, ensure_s3_bucket
+from app.utils.pagination import decode_cursor, set_next_cursor
+from app.utils.search import search_sort
+from app.utils.event_extraction import extraction_text, extract_event
+from app.celery_worker.tasks.emails import (
+    ingest_email,
+    attachment_s3_key,
+    ATTACHMENT_UPLOAD_CONCURRENCY,
+    QUEUED_ATTACHMENTS_MAX_BYTES
+)
 from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
 import logging
 
 # Set up logging
@@ -19,14 +31,66 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 emails_repo = EmailsRepository()
 
+async def _upload_attachment(
+    attachment: Dict[str, Any],
+    tenant_id: str,
+    bucket_name: str,
+    semaphore: asyncio.Semaphore,
+    s3_key: Optional[str] = None
+) -> None:
+    """
+    Upload one base64 attachment to S3 (under s3_key, or a new unique key),
+    replacing its content with the S3 key and URL.
+    """
+    if not attachment.get("filename"):
+        return
+    
+    # Get content and decode from base64
+    content = attachment.get("content")
+    if not content:
+        return
+    
+    async with semaphore:
+        try:
+            # Decoding large attachments is CPU bound, keep it off the event loop
+            file_content = await asyncio.to_thread(base64.b64decode, content)
+            
+            # Create upload file object
+            upload_file = UploadFile(
+                filename=attachment["filename"],
+                file=io.BytesIO(file_content),
+            )
+            
+            # Generate S3 key
+            if s3_key is None:
+                attachment_id = str(uuid4())
+                s3_key = f"{tenant_id}/{attachment_id}/{attachment['filename']}"
+            
+            # Upload to S3
+            s3_url = await upload_file_to_s3(upload_file, s3_key, bucket=bucket_name)
+            
+            # Update attachment with S3 information
+            attachment["s3_key"] = s3_key
+            attachment["s3_url"] = s3_url
+            
+            # Remove the base64 content to save database space
+            attachment["content"] = None
+            
+        except Exception as e:
+            logger.error(f"Error uploading attachment to S3: {str(e)}")
+
 @router.post("/receive", response_model=Dict[str, Any])
 async def receive_email(
     email_data: EmailData = Body(...),
     tenant_id: str = Query(...),
+    queue: bool = Query(False, description="Acknowledge with 202 and store the email in the background"),
 ):
     """
     Receive and store an incoming email
     """
+    if queue:
+        return await _enqueue_email(email_data, tenant_id)
+    
     try:
         # Create email record
         email_dict = email_data.dict()
@@ -38,52 +102,27 @@ async def receive_email(
         # Define bucket name for tenant
         bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
         
-        # Ensure bucket exists
-        await create_s3_bucket(bucket_name)
+        # Ensure bucket exists (only the tenant's first email provisions it)
+        await ensure_s3_bucket(bucket_name)
         
-        # Process attachments if they exist
+        # Process attachments concurrently if they exist
         if email_dict.get("attachments"):
-            for i, attachment in enumerate(email_dict["attachments"]):
-                if not attachment.get("filename"):
-                    continue
-                
-                # Get content and decode from base64
-                content = attachment.get("content")
-                if not content:
-                    continue
-                
-                try:
-                    # Decode base64 content
-                    file_content = base64.b64decode(content)
-                    
-                    # Create a file-like object for S3 upload
-                    file_obj = io.BytesIO(file_content)
-                    
-                    # Create upload file object
-                    upload_file = UploadFile(
-                        filename=attachment["filename"],
-                        file=file_obj,
-                    )
-                    
-                    # Generate S3 key
-                    attachment_id = str(uuid4())
-                    s3_key = f"{tenant_id}/{attachment_id}/{attachment['filename']}"
-                    
-                    # Upload to S3
-                    s3_url = await upload_file_to_s3(upload_file, s3_key, bucket=bucket_name)
-                    
-                    # Update attachment with S3 information
-                    email_dict["attachments"][i]["s3_key"] = s3_key
-                    email_dict["attachments"][i]["s3_url"] = s3_url
-                    
-                    # Remove the base64 content to save database space
-                    email_dict["attachments"][i]["content"] = None
-                    
-                except Exception as e:
-                    logger.error(f"Error uploading attachment to S3: {str(e)}")
+            semaphore = asyncio.Semaphore(ATTACHMENT_UPLOAD_CONCURRENCY)
+            await asyncio.gather(*(
+                _upload_attachment(attachment, tenant_id, bucket_name, semaphore)
+                for attachment in email_dict["attachments"]
+            ))
         
         # Insert into database
-        await emails_repo.insert_one(email_dict)
+        try:
+            await emails_repo.insert_one(email_dict)
+        except DuplicateKeyError:
+            existing = await emails_repo.find_one({"tenant_id": tenant_id, "message_id": email_dict["message_id"]})
+            return {
+                "success": True,
+                "message": "Email already received",
+                "email_id": str(existing["_id"]) if existing else None
+            }
         
         return {
             "success": True,
@@ -97,13 +136,66 @@ async def receive_email(
             detail=f"Error processing email: {str(e)}"
         )
 
+async def _enqueue_email(email_data: EmailData, tenant_id: str) -> JSONResponse:
+    """
+    Hand a validated email to the ingest_email task and acknowledge it.
+    Attachments too large for the broker are uploaded to S3 first, under the
+    keys the task would have used.
+    """
+    email_id = str(uuid4())
+    email = email_data.dict()
+    try:
+        # Memoized, so only the tenant's first email waits for the bucket
+        bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
+        await ensure_s3_bucket(bucket_name)
+        
+        attachments = email.get("attachments") or []
+        if sum(len(attachment.get("content") or "") for attachment in attachments) > QUEUED_ATTACHMENTS_MAX_BYTES:
+            semaphore = asyncio.Semaphore(ATTACHMENT_UPLOAD_CONCURRENCY)
+            await asyncio.gather(*(
+                _upload_attachment(
+                    attachment,
+                    tenant_id,
+                    bucket_name,
+                    semaphore,
+                    s3_key=attachment_s3_key(tenant_id, email_id, index, attachment.get("filename") or "")
+                )
+                for index, attachment in enumerate(attachments)
+            ))
+        
+        # delay() talks to the broker synchronously, keep it off the event loop
+        await asyncio.to_thread(
+            ingest_email.delay,
+            email,
+            tenant_id,
+            email_id,
+            datetime.utcnow().isoformat()
+        )
+    except Exception as e:
+        logger.error(f"Error queueing email: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Could not queue email: {str(e)}"
+        )
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "message": "Email queued for processing",
+            "email_id": email_id
+        }
+    )
+
 @router.get("/", response_model=List[EmailResponse])
 async def get_emails(
+    response: Response,
     offset: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    sort_field: Optional[str] = Query("created_at", description="Field to sort by"),
+    sort_field: Optional[str] = Query(None, description="Field to sort by (defaults to created_at, or relevance when searching)"),
     sort_order: Optional[int] = Query(-1, description="Sort order: 1 for ascending, -1 for descending"),
-    search: Optional[str] = Query(None, description="Search in subject or from fields"),
+    search: Optional[str] = Query(None, description="Search in subject or from fields (word prefixes)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces offset"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -114,25 +206,30 @@ async def get_emails(
     # Build query
     query = {"tenant_id": tenant_id}
     
-    # Add search filter if provided
-    if search:
-        query = {
-            "$and": [
-                {"tenant_id": tenant_id},
-                {"$or": [
-                    {"subject": {"$regex": search, "$options": "i"}},
-                    {"from_": {"$regex": search, "$options": "i"}}
-                ]}
-            ]
-        }
+    sort_params = [(sort_field, sort_order)] if sort_field else None
+    after = decode_cursor(cursor) if cursor else None
     
-    # Get emails
-    emails = await emails_repo.find_many(
-        query,
-        skip=offset,
-        limit=limit,
-        sort=[(sort_field, sort_order)]
-    )
+    if search:
+        emails = await emails_repo.search(
+            query,
+            search,
+            skip=offset,
+            limit=limit,
+            sort=sort_params,
+            after=after
+        )
+        set_next_cursor(response, emails, search_sort(search, sort_params), limit)
+    else:
+        # Get emails
+        sort_params = sort_params or [("created_at", -1)]
+        emails = await emails_repo.find_many(
+            query,
+            skip=offset,
+            limit=limit,
+            sort=sort_params,
+            after=after
+        )
+        set_next_cursor(response, emails, sort_params, limit)
     
     return emails
 
@@ -153,6 +250,30 @@ async def get_email(
     
     return email
 
+async def _event_extraction(email: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The AI event extraction of an email: the one stored on it when there is
+    one, otherwise extracted now, stored, and the email marked processed.
+    """
+    if email.get("ai_extraction"):
+        return email["ai_extraction"]
+    
+    text = extraction_text(email)
+    if not text:
+        raise HTTPException(
+            status_code=400,
+            detail="No email body content available for extraction"
+        )
+    
+    ai_extraction = await extract_event(gpt, text, email.get("tenant_id"))
+    
+    now = datetime.utcnow()
+    await emails_repo.update_one(
+        {"_id": email["_id"]},
+        {"ai_extraction": ai_extraction, "ai_extracted_at": now, "processed": True, "processed_at": now}
+    )
+    return ai_extraction
+
 @router.post("/{email_id}/extract-event", response_model=AIEventExtraction)
 async def extract_event_from_email(
     email_id: str,
@@ -169,51 +290,9 @@ async def extract_event_from_email(
         raise HTTPException(status_code=404, detail="Email not found")
     
     try:
-        # Get the email body (plain text preferred, fallback to HTML)
-        email_text = email.get("body") if email.get("body") else email.get("html_body")
-        
-        if not email_text:
-            raise HTTPException(
-                status_code=400,
-                detail="No email body content available for extraction"
-            )
-        
-        # Prepare prompt for AI extraction
-        prompt = """
-        You are an AI assistant that extracts event information from emails.
-        Extract the following fields from the email text:
-        - event_name: Name of the event
-        - description: Description of the event
-        - event_date: Date of the event in YYYY-MM-DD format
-        - location: Location where the event will be held
-        - institute_name: Name of the institute/organization hosting the event
-        - contact_name: Name of the contact person
-        - contact_number: Phone number of the contact person
-        - email: Email address for contact
-        - website: Website of the event or institute (as a valid URL)
-        - expected_audience: Expected number of attendees as a number
-        - is_paid_event: Whether it's a paid event (true or false)
-        - fees: Fee amount if it's a paid event as a number
-        - payment_status: Current payment status
-        - travel_accomodation: Travel and accommodation details
-        - status: Current status of the event planning
-        
-        For each field, provide the extracted value or null if you can't extract it
-        
-        Respond with a JSON object that follows the specified schema.
-        """
-        
-        # Add the email subject and text as context
-        text = f"Email subject: {email.get('subject')}\nEmail text: {email_text}"        
-        ai_extraction = await gpt.send_text(text=text, prompt=prompt, model=AIEventExtraction)
-        
-        # Mark the email as processed
-        await emails_repo.update_one(
-            {"_id": email_id},
-            {"processed": True, "processed_at": datetime.utcnow()}
-        )
-        
-        return ai_extraction
+        return await _event_extraction(email)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error extracting event from email: {str(e)}")
         raise HTTPException(
@@ -257,12 +336,8 @@ async def create_event_from_email(
         raise HTTPException(status_code=404, detail="Email not found")
     
     try:
-        ai_extraction = await extract_event_from_email(email_id, current_user)
-        
-        await emails_repo.update_one(
-            {"_id": email_id},
-            {"processed": True, "processed_at": datetime.utcnow()}
-        )
+        # Reuses the extraction stored by the batch job or an earlier call
+        ai_extraction = await _event_extraction(email)
         
         return {
             "success": True,
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Query, Response, Form
 from typing import List, Optional, Dict, Any
-import json
-import tempfile
 import os
+import json
+import asyncio
 from datetime import datetime, date, timedelta
 from uuid import uuid4
 from io import BytesIO
@@ -12,13 +12,15 @@ from app.schemas.event import (
     EmailTextRequest, AIExtractedField, AIEventExtraction
 )
 from app.utils.s3 import upload_file_to_s3, delete_object, create_s3_bucket
-from app.utils.pdf_generator import generate_event_pdf
+from app.utils.pdf_cache import pdf_cache, iter_file
 from fastapi.responses import StreamingResponse
 from app.core.security import get_current_user
-from app.utils.csv_utils import generate_model_csv
+from app.utils.csv_utils import generate_streaming_csv
+from app.utils.pagination import decode_cursor, set_next_cursor
+from app.utils.search import search_sort
 from pydantic import BaseModel
 from app.utils.openai_api import gpt
-from app.utils.pdf_utils import convert_pdf_to_images
+from app.utils.vision_inputs import VisionInputs, prepare_vision_inputs
 from dateutil import parser as date_parser
 
 
@@ -111,6 +113,7 @@ async def add_event_attachments(
             "updated_at": datetime.utcnow()
         }
     )
+    await pdf_cache.invalidate(event_id)
     
     # Get updated event
     updated_event = await events_repo.find_one({"_id": event_id})
@@ -124,11 +127,13 @@ async def add_event_attachments(
 
 @router.get("/", response_model=List[Event])
 async def get_events(
+    response: Response,
     offset: int = Query(0, ge=0),
     limit: int = Query(100, ge=1),
     sort_field: Optional[str] = Query(None, description="Field to sort by"),
     sort_order: Optional[int] = Query(1, description="Sort order: 1 for ascending, -1 for descending"),
-    search: Optional[str] = Query(None, description="Search in event name, institute name, and location"),
+    search: Optional[str] = Query(None, description="Search in event name, institute name, and location (word prefixes, ranked by relevance unless sort_field is given)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces offset"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     tenant_id = current_user["tenant_id"]
@@ -136,31 +141,33 @@ async def get_events(
     # Build base query
     query = {"tenant_id": tenant_id}
     
-    # Add search filter if provided
-    if search:
-        query = {
-            "$and": [
-                {"tenant_id": tenant_id},
-                {"$or": [
-                    {"event_name": {"$regex": search, "$options": "i"}},
-                    {"institute_name": {"$regex": search, "$options": "i"}},
-                    {"location": {"$regex": search, "$options": "i"}}
-                ]}
-            ]
-        }
-    
     # Build sort parameters if provided
     sort_params = None
     if sort_field:
         sort_params = [(sort_field, sort_order)]
     
-    # Use the updated repository method with pagination and sorting
-    events = await events_repo.find_many(
-        query,
-        skip=offset,
-        limit=limit,
-        sort=sort_params
-    )
+    after = decode_cursor(cursor) if cursor else None
+    
+    if search:
+        events = await events_repo.search(
+            query,
+            search,
+            skip=offset,
+            limit=limit,
+            sort=sort_params,
+            after=after
+        )
+        set_next_cursor(response, events, search_sort(search, sort_params), limit)
+    else:
+        # Use the updated repository method with pagination and sorting
+        events = await events_repo.find_many(
+            query,
+            skip=offset,
+            limit=limit,
+            sort=sort_params,
+            after=after
+        )
+        set_next_cursor(response, events, sort_params, limit)
     
     # Format for response
     formatted_events = []
@@ -237,6 +244,7 @@ async def update_event_form(
     
     # Update the event
     await events_repo.update_one({"_id": event_id}, update_dict)
+    await pdf_cache.invalidate(event_id)
     
     # Get updated event
     updated_event = await events_repo.find_one({"_id": event_id})
@@ -294,36 +302,27 @@ async def get_event_pdf(
     event_dict = dict(event)
     event_dict["attachments"] = event_dict["attachments"].split(",") if event_dict["attachments"] else []
     
-    # Create output buffer
-    output_buffer = BytesIO()
-    
-    # Generate PDF
-    generate_event_pdf(event_dict, event_dict["attachments"], output_buffer)
-    
-    # Reset buffer position
-    output_buffer.seek(0)
+    # Serve the cached brochure, rendering it only if the event content changed
+    # The open file stays readable even if the cache evicts the PDF meanwhile
+    pdf_file = await pdf_cache.get_or_render(event_dict, event_dict["attachments"])
     
     return StreamingResponse(
-        output_buffer, 
+        iter_file(pdf_file),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"inline; filename=event_{event_id}.pdf"}
+        headers={
+            "Content-Disposition": f"inline; filename=event_{event_id}.pdf",
+            "Content-Length": str(os.fstat(pdf_file.fileno()).st_size)
+        }
     )
 
 @router.get("/events/csv")
 async def get_events_csv(
     offset: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of events to export; all events if omitted"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     tenant_id = current_user["tenant_id"]
     
-    # Use the updated repository method with pagination
-    events = await events_repo.find_many(
-        {"tenant_id": tenant_id},
-        skip=offset,
-        limit=limit
-    )
-    
     # Define CSV headers
     headers = [
         "id", "contact_name", "contact_number", "description", "email",
@@ -335,19 +334,24 @@ async def get_events_csv(
     
     # Special field handling
     field_mapping = {
-        "attachments": "attachments",  # This will be handled specially
+        "attachments": "attachments",  # Stored as a comma-separated string
         "id": "_id"  # Map MongoDB _id to id for CSV
     }
     
-    # Format events for CSV - no need for pagination as it's already done in the repo
-    formatted_events = []
-    for event in events:
-        event_dict = dict(event)
-        formatted_events.append(event_dict)
+    # Only fetch the exported fields
+    projection = {field_mapping.get(header, header): 1 for header in headers}
     
-    # Generate CSV
-    return await generate_model_csv(
-        models=formatted_events,
+    # Rows are read from the cursor and written out in chunks as the client downloads
+    events = events_repo.iter_many(
+        {"tenant_id": tenant_id},
+        projection=projection,
+        skip=offset,
+        limit=limit or 0,
+        sort=[("created_at", 1), ("_id", 1)]
+    )
+    
+    return generate_streaming_csv(
+        models=events,
         headers=headers,
         field_mapping=field_mapping,
         filename="events.csv"
@@ -393,6 +397,7 @@ async def delete_event(
     
     # Delete the event
     await events_repo.delete_one({"_id": event_id})
+    await pdf_cache.invalidate(event_id)
     
     return {"message": "Event deleted successfully"}
 
@@ -449,6 +454,7 @@ async def delete_event_attachments(
             "updated_at": datetime.utcnow()
         }
     )
+    await pdf_cache.invalidate(event_id)
     
     # Get the updated event
     updated_event = await events_repo.find_one({"_id": event_id})
@@ -490,43 +496,30 @@ async def extract_event_from_email(
         Respond with a JSON object that follows the specified schema.
         """
         
-        image_paths = []
-        pdf_files = []
+        image_uploads = []
+        pdf_uploads = []
         ai_extraction = None
         
         # Process uploaded files
         if files:
             for file in files:
                 if file.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.gif')):
-                    try:
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_img:
-                            temp_img.write(await file.read())
-                            image_paths.append(temp_img.name)
-                    except Exception as e:
-                        print(f"Error saving uploaded image {file.filename}: {str(e)}")
+                    image_uploads.append(await file.read())
                 elif file.filename.lower().endswith('.pdf'):
-                    # Rewind the file before adding it to the list
-                    await file.seek(0)
-                    pdf_files.append(file)
+                    pdf_uploads.append(await file.read())
         
-        # Process PDF files - convert to images
-        if pdf_files:
-            try:
-                for pdf_file in pdf_files:
-                    # Convert PDF to images
-                    pdf_images = await convert_pdf_to_images(pdf_file)
-                    image_paths.extend(pdf_images)
-            except Exception as e:
-                print(f"Error processing PDF files: {str(e)}")
+        # Downscale to what the model uses, drop blank and duplicate pages, and
+        # send PDF pages that have a text layer as text, all in memory
+        vision = VisionInputs()
+        if image_uploads or pdf_uploads:
+            vision = await prepare_vision_inputs(image_uploads, pdf_uploads)
+        document_text = f"\n\nDocument text: {vision.text}" if vision.text else ""
         
-        # Validate image paths exist before proceeding
-        valid_image_paths = [path for path in image_paths if os.path.exists(path)]
-        print(f"Valid image paths: {valid_image_paths}")
-        # Try to use images if we have valid paths
-        if valid_image_paths:
+        # Try to use images if we have any
+        if vision.images:
             try:
-                enhanced_prompt = f"Email text: {email_text}\n\nAnalyze the email text and any provided images or document scans to extract event details."
-                ai_extraction = await gpt.send_images(image_paths=valid_image_paths, prompt=enhanced_prompt,response_model=AIEventExtraction)
+                enhanced_prompt = f"Email text: {email_text}{document_text}\n\nAnalyze the email text and any provided images or document scans to extract event details."
+                ai_extraction = await gpt.send_images(prompt=enhanced_prompt, response_model=AIEventExtraction, images=vision.images, tenant_id=current_user.get("tenant_id"))
                 print(f"Image extraction result type: {type(ai_extraction)}")
             except Exception as e:
                 print(f"Error with send_images, falling back to text only: {str(e)}")
@@ -542,16 +535,8 @@ async def extract_event_from_email(
         
         # If images failed or weren't provided, use text-only
         if ai_extraction is None:
-            text = f"Email text: {email_text}"
-            ai_extraction = await gpt.send_text(text=text, prompt=prompt, model=AIEventExtraction)
-        
-        # Clean up temporary files
-        for path in image_paths:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    print(f"Error removing temp file {path}: {str(e)}")
+            text = f"Email text: {email_text}{document_text}"
+            ai_extraction = await gpt.send_text(text=text, prompt=prompt, model=AIEventExtraction, tenant_id=current_user.get("tenant_id"))
         
         # Process extraction results
         event_data = {
@@ -594,15 +579,6 @@ async def extract_event_from_email(
             raise HTTPException(status_code=422, detail=f"Invalid event data format: {str(e)}")
             
     except Exception as e:
-        # Ensure any temporary files are cleaned up in case of error
-        if 'image_paths' in locals() and image_paths:
-            for path in image_paths:
-                if os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except:
-                        pass
-                        
         raise HTTPException(status_code=500, detail=f"Error extracting event information: {str(e)}")
 
 def convert_to_date(date_string: str) -> date:
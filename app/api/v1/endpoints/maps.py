@@ -10,6 +10,7 @@ from app.schemas.maps import (
     CityResponse
 )
 from app.core.security import get_current_user
+from app.utils.pagination import decode_cursor, next_cursor
 
 router = APIRouter()
 
@@ -23,6 +24,7 @@ async def get_countries(
     search: Optional[str] = None,
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces offset"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -51,13 +53,15 @@ async def get_countries(
         skip=offset,
         limit=limit,
         sort=sort,
-        projection=projection
+        projection=projection,
+        after=decode_cursor(cursor) if cursor else None
     )
     
     # Format the response
     return {
         "items": countries,
-        "total": total
+        "total": total,
+        "next_cursor": next_cursor(countries, sort, limit)
     }
 
 
@@ -67,6 +71,7 @@ async def get_states(
     search: Optional[str] = None,
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces offset"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -99,13 +104,15 @@ async def get_states(
         skip=offset,
         limit=limit,
         sort=sort,
-        projection=projection
+        projection=projection,
+        after=decode_cursor(cursor) if cursor else None
     )
     
     # Format the response
     return {
         "items": states,
-        "total": total
+        "total": total,
+        "next_cursor": next_cursor(states, sort, limit)
     }
 
 
@@ -116,6 +123,7 @@ async def get_cities(
     search: Optional[str] = None,
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces offset"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -152,11 +160,13 @@ async def get_cities(
         skip=offset,
         limit=limit,
         sort=sort,
-        projection=projection
+        projection=projection,
+        after=decode_cursor(cursor) if cursor else None
     )
     
     # Format the response
     return {
         "items": cities,
-        "total": total
+        "total": total,
+        "next_cursor": next_cursor(cities, sort, limit)
     }
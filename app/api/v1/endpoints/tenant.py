@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from uuid import uuid4
 from app.db.repository.tenants import TenantsRepository
@@ -19,6 +19,7 @@ from app.schemas.tenant import (
 from app.core.security import get_current_user
 from app.models.user import User as DBUser
 from app.utils.s3 import create_s3_bucket
+from app.utils.pagination import decode_cursor, set_next_cursor
 
 
 router = APIRouter()
@@ -30,8 +31,10 @@ permissions_repo = PermissionsRepository()
 # Tenant endpoints
 @router.get("/tenants", response_model=List[TenantSchema])
 async def list_tenants(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces skip"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -40,7 +43,9 @@ async def list_tenants(
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    tenants = await tenants_repo.find_many({}, skip=skip, limit=limit)
+    after = decode_cursor(cursor) if cursor else None
+    tenants = await tenants_repo.find_many({}, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, tenants, None, limit)
     transformed_tenants = []
     for t in tenants:
         tenant_dict = dict(t)
@@ -49,7 +54,6 @@ async def list_tenants(
         if "created_at" not in tenant_dict or tenant_dict["created_at"] is None:
             tenant_dict["created_at"] = datetime.utcnow()
         transformed_tenants.append(tenant_dict)
-    print (TenantSchema(**transformed_tenants[0]))
     
     return [TenantSchema(**t) for t in transformed_tenants]
 
@@ -212,6 +216,7 @@ async def create_tenant_role(
     
     # Insert into database
     await roles_repo.insert_one(doc)
+    roles_repo.invalidate_tenant(tenant_id)
     
     # Get the created role
     created_role = await roles_repo.find_one({"_id": doc["_id"]})
@@ -242,6 +247,7 @@ async def update_role(
     
     # Update basic fields
     await roles_repo.update_one({"_id": role_id}, role_data.dict(exclude_unset=True))
+    roles_repo.invalidate_tenant(role["tenant_id"])
     updated = await roles_repo.find_one({"_id": role_id})
     if not updated:
         raise HTTPException(status_code=404, detail="Role not found")
@@ -270,6 +276,7 @@ async def delete_role(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     result = await roles_repo.delete_one({"_id": role_id})
+    roles_repo.invalidate_tenant(updated["tenant_id"])
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Role not found")
     
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, Form, status
+from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, Form, Response, status
 from typing import List, Optional
 from app.db.repository.users import UsersRepository
 from app.db.repository.tenants import TenantsRepository
@@ -6,6 +6,7 @@ from app.db.repository.roles import RolesRepository
 from app.schemas.user import UserResponse, UserWithDetails, UserRoleUpdate, UserProfileUpdate,UserWithDetailstoken
 from app.core.security import get_current_user
 from app.utils.s3 import upload_file_to_s3
+from app.utils.pagination import decode_cursor, set_next_cursor
 import io
 from datetime import datetime
 from pydantic import parse_obj_as
@@ -18,16 +19,23 @@ roles_repo = RolesRepository()
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+    response: Response,
     offset: int = 0,
     limit: int = Query(default=10, le=20),  # Set max limit to 20
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page; replaces offset"),
     current_user: dict = Depends(get_current_user)
 ):
     tenant_id = current_user.get("tenant_id")
-    users = await users_repo.find_many({"tenant_id": tenant_id}, limit=limit, skip=offset)
+    after = decode_cursor(cursor) if cursor else None
+    users = await users_repo.find_many({"tenant_id": tenant_id}, limit=limit, skip=offset, after=after)
+    set_next_cursor(response, users, None, limit)
+    
+    # Resolve the roles of the whole page in one query instead of one per user
+    roles = await roles_repo.get_roles_by_ids(user.get("role_id") for user in users)
     
     result = []
     for user in users:
-        role = await roles_repo.find_one({"_id": user.get("role_id")}) if user.get("role_id") else None
+        role = roles.get(user.get("role_id"))
         role_name = role["name"] if role else "user"
         
         user_response = UserResponse(
@@ -85,7 +93,7 @@ async def read_users_me(current_user: dict = Depends(get_current_user)):
             detail=f"User with ID {user_id} not found in database"
         )
     
-    role = await roles_repo.find_one({"_id": user.get("role_id")}) if user.get("role_id") else None
+    role = await roles_repo.get_role(user.get("role_id"))
     
     # Return the user details
     return UserWithDetails(
@@ -122,7 +130,7 @@ async def get_user(user_id: str, current_user: dict = Depends(get_current_user))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    role = await roles_repo.find_one({"_id": user["role_id"]}) if user.get("role_id") else None
+    role = await roles_repo.get_role(user.get("role_id"))
     
     return UserWithDetails(
         _id=user["_id"] if "_id" in user else user.get("id"),
@@ -214,7 +222,7 @@ async def update_user_profile(
     
     # Get updated user
     updated_user = await users_repo.find_one({"_id": user_id})
-    role = await roles_repo.find_one({"_id": updated_user["role_id"]}) if updated_user.get("role_id") else None
+    role = await roles_repo.get_role(updated_user.get("role_id"))
     
     return UserWithDetails(
         _id=updated_user["_id"],
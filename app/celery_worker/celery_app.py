@@ -5,7 +5,8 @@ import os
 celery_app = Celery(
     "worker",
     broker=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
-    backend=os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    backend=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    include=["app.celery_worker.tasks.media", "app.celery_worker.tasks.emails"]
 )
 
 # Configure task routes
@@ -19,4 +20,8 @@ celery_app.conf.beat_schedule = {
         "task": "app.celery_worker.tasks.recurring_tasks.process_recurring_tasks",
         "schedule": 60.0 * 60,  # Run every hour
     },
+    "extract-pending-emails": {
+        "task": "app.celery_worker.tasks.emails.extract_pending_emails",
+        "schedule": 60.0 * 5,  # Run every 5 minutes
+    },
 } 
\ No newline at end of file
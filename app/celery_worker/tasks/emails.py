@@ -0,0 +1,220 @@
+from app.celery_worker.celery_app import celery_app
+from app.db.session import get_sync_db
+from app.db.repository.emails import EMAIL_SEARCH_FIELDS
+from app.utils.search import search_tokens
+from app.utils.s3 import upload_bytes_to_s3_sync
+from app.utils.openai_api import GPT, gpt
+from app.utils.event_extraction import extract_events
+from app.core.config import (
+    OPENAI_API_KEY,
+    AI_EXTRACTION_BATCH_SIZE,
+    AI_EXTRACTION_CONCURRENCY,
+    AI_EXTRACTION_TOKENS_PER_MINUTE
+)
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
+import asyncio
+import base64
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Attachments of one email uploaded to S3 at the same time
+ATTACHMENT_UPLOAD_CONCURRENCY = 4
+
+# Base64 attachment content above this total is uploaded to S3 by the
+# endpoint before queueing, rather than carried through the Redis broker
+QUEUED_ATTACHMENTS_MAX_BYTES = 256 * 1024
+
+# Emails whose extraction failed this many times are left for a manual retry
+AI_EXTRACTION_MAX_ATTEMPTS = 3
+
+# Longest an extraction run holds its lock and its claimed emails; a crashed
+# run's are picked up again after this
+AI_EXTRACTION_LEASE_SECONDS = 30 * 60
+
+def _acquire_lease(db, name: str, seconds: int) -> Optional[str]:
+    """Take the named lease unless an unexpired one is held; returns its token, or None."""
+    token = str(uuid4())
+    now = datetime.utcnow()
+    try:
+        db["task_leases"].update_one(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {"$set": {"token": token, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease exists and hasn't expired, so the upsert tried to insert a second one
+        return None
+    return token
+
+def _release_lease(db, name: str, token: str) -> None:
+    db["task_leases"].delete_one({"_id": name, "token": token})
+
+def attachment_s3_key(tenant_id: str, email_id: str, index: int, filename: str) -> str:
+    """
+    S3 key of an email's attachment. Derived from the email id and the
+    attachment's position, so a retried upload overwrites the first one.
+    """
+    return f"{tenant_id}/{email_id}/{index}/{filename}"
+
+def _store_attachment(attachment: dict, tenant_id: str, email_id: str, index: int, bucket: str) -> None:
+    """Upload one base64 attachment to S3, replacing its content with the S3 key and URL."""
+    if not attachment.get("filename") or not attachment.get("content"):
+        return
+
+    try:
+        s3_key = attachment_s3_key(tenant_id, email_id, index, attachment["filename"])
+        attachment["s3_url"] = upload_bytes_to_s3_sync(
+            base64.b64decode(attachment["content"]),
+            s3_key,
+            bucket,
+            attachment.get("content_type") or "application/octet-stream",
+            content_disposition="attachment"
+        )
+        attachment["s3_key"] = s3_key
+        # Remove the base64 content to save database space
+        attachment["content"] = None
+    except Exception as e:
+        logger.error(f"Error uploading attachment to S3: {str(e)}")
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=30)
+def ingest_email(self, email: dict, tenant_id: str, email_id: str, received_at: str):
+    """
+    Store an email accepted by POST /emails/receive?queue=true: upload its
+    attachments to S3 (those the endpoint already staged there are kept as
+    they are) and insert it. Emails whose message_id the tenant
+    already has are dropped, so forwarder redeliveries and task retries are
+    harmless. The time from receipt to insert is logged and stored as
+    `ingest_latency_ms`.
+    """
+    emails = get_sync_db()["emails"]
+
+    message_id = email.get("message_id")
+    duplicate = {"tenant_id": tenant_id, "message_id": message_id} if message_id else {"_id": email_id}
+    if emails.find_one(duplicate, {"_id": 1}):
+        logger.info(f"Email {message_id or email_id} already ingested for tenant {tenant_id}, skipping")
+        return None
+
+    try:
+        bucket = f"AWS_S3_BUCKET_{tenant_id}"
+        attachments = email.get("attachments") or []
+        with ThreadPoolExecutor(max_workers=ATTACHMENT_UPLOAD_CONCURRENCY) as pool:
+            list(pool.map(
+                lambda item: _store_attachment(item[1], tenant_id, email_id, item[0], bucket),
+                enumerate(attachments)
+            ))
+
+        received = datetime.fromisoformat(received_at)
+        ingested = datetime.utcnow()
+        doc = {
+            **email,
+            "_id": email_id,
+            "tenant_id": tenant_id,
+            "created_at": received,
+            "processed": False,
+            "ingested_at": ingested,
+            "ingest_latency_ms": int((ingested - received).total_seconds() * 1000)
+        }
+        doc["search_tokens"] = search_tokens(doc, EMAIL_SEARCH_FIELDS)
+        emails.insert_one(doc)
+    except DuplicateKeyError:
+        # A concurrent delivery of the same message won the insert
+        logger.info(f"Email {message_id or email_id} already ingested for tenant {tenant_id}, skipping")
+        return None
+    except Exception as e:
+        logger.error(f"Error ingesting email {email_id}: {str(e)}")
+        raise self.retry(exc=e)
+
+    logger.info(
+        f"Ingested email {email_id} for tenant {tenant_id} in {doc['ingest_latency_ms']} ms "
+        f"({len(attachments)} attachments)"
+    )
+    return email_id
+
+async def _extract_batch(emails: list) -> dict:
+    # A client per run: the shared one is bound to the event loop it first ran on
+    client = GPT(OPENAI_API_KEY, gpt.model, gpt.voice_model)
+    try:
+        return await extract_events(
+            client,
+            emails,
+            concurrency=AI_EXTRACTION_CONCURRENCY,
+            tokens_per_minute=AI_EXTRACTION_TOKENS_PER_MINUTE
+        )
+    finally:
+        await client.close()
+
+def _extract_pending(emails, batch_size: int, claim: str) -> int:
+    now = datetime.utcnow()
+    claimable = {
+        "processed": False,
+        "ai_extraction": {"$exists": False},
+        "ai_extraction_attempts": {"$not": {"$gte": AI_EXTRACTION_MAX_ATTEMPTS}},
+        "ai_extraction_started_at": {"$not": {"$gte": now - timedelta(seconds=AI_EXTRACTION_LEASE_SECONDS)}}
+    }
+    candidates = [
+        email["_id"]
+        for email in emails.find(claimable, {"_id": 1}).sort("created_at", 1).limit(batch_size)
+    ]
+    if not candidates:
+        return 0
+
+    # Each email is claimed atomically: one claimed by a concurrent run no longer matches
+    emails.update_many(
+        {"_id": {"$in": candidates}, **claimable},
+        {"$set": {"ai_extraction_claim": claim, "ai_extraction_started_at": now}}
+    )
+    pending = list(emails.find(
+        {"_id": {"$in": candidates}, "ai_extraction_claim": claim},
+        {"tenant_id": 1, "subject": 1, "body": 1, "html_body": 1}
+    ))
+    if not pending:
+        return 0
+
+    results = asyncio.run(_extract_batch(pending))
+
+    extracted = 0
+    for email_id, result in results.items():
+        if isinstance(result, Exception):
+            logger.error(f"Error extracting event from email {email_id}: {str(result)}")
+            emails.update_one(
+                {"_id": email_id},
+                {"$inc": {"ai_extraction_attempts": 1}, "$unset": {"ai_extraction_started_at": ""}}
+            )
+            continue
+        now = datetime.utcnow()
+        emails.update_one(
+            {"_id": email_id},
+            {"$set": {"ai_extraction": result, "ai_extracted_at": now, "processed": True, "processed_at": now}}
+        )
+        extracted += 1
+
+    logger.info(f"Extracted events from {extracted} of {len(pending)} emails")
+    return extracted
+
+@celery_app.task
+def extract_pending_emails(batch_size: int = AI_EXTRACTION_BATCH_SIZE):
+    """
+    Run the AI event extraction over the oldest unprocessed emails, several
+    at a time, and store each result on its email as `ai_extraction`, where
+    the extract-event and create-event endpoints pick it up.
+
+    One run at a time: a run that finds another one's lease skips, so runs
+    never share the AI_EXTRACTION_TOKENS_PER_MINUTE budget. The batch is also
+    claimed on the emails themselves, so a run outliving its lease doesn't
+    hand the same emails to the next one.
+    """
+    db = get_sync_db()
+    lease = _acquire_lease(db, "extract_pending_emails", AI_EXTRACTION_LEASE_SECONDS)
+    if lease is None:
+        logger.info("Another email extraction run is in progress, skipping")
+        return 0
+
+    try:
+        return _extract_pending(db["emails"], batch_size, lease)
+    finally:
+        _release_lease(db, "extract_pending_emails", lease)
@@ -0,0 +1,82 @@
+from app.celery_worker.celery_app import celery_app
+from app.db.session import get_sync_db
+from app.utils.s3 import download_from_s3_sync, upload_bytes_to_s3_sync
+from app.utils.renditions import media_kind, rendition_key, load_source_image, render_renditions
+from io import BytesIO
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Values of the `thumbnail_status` field on file documents
+THUMBNAIL_PENDING = "pending"
+THUMBNAIL_PROCESSING = "processing"
+THUMBNAIL_READY = "ready"
+THUMBNAIL_FAILED = "failed"
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=30)
+def generate_file_renditions(self, file_id: str, bucket: str):
+    """
+    Build the previews of an uploaded image, PDF or video: download it from S3,
+    decode a source image (the image, the first page, or a keyframe), and
+    upload small/medium WebP renditions under deterministic keys. The file
+    document gets `renditions` ({name: url}) and a `thumbnail_url`: the
+    full-size keyframe JPEG for videos, the medium rendition otherwise.
+    """
+    files = get_sync_db()["files"]
+    file = files.find_one({"_id": file_id})
+    if not file:
+        logger.warning(f"File {file_id} no longer exists, skipping renditions")
+        return None
+
+    kind = media_kind(file["file_name"], file.get("content_type"))
+    if kind is None:
+        return None
+
+    files.update_one({"_id": file_id}, {"$set": {"thumbnail_status": THUMBNAIL_PROCESSING}})
+
+    try:
+        # Spill to disk past 8 MB so large files don't sit in worker memory
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as source:
+            download_from_s3_sync(bucket, file["s3_key"], source)
+            source.seek(0)
+            image = load_source_image(kind, source)
+            if image is not None:
+                image.load()
+
+        if image is None:
+            # Not worth retrying: the file itself has nothing to render
+            logger.warning(f"Nothing could be decoded from file {file_id}")
+            files.update_one({"_id": file_id}, {"$set": {"thumbnail_status": THUMBNAIL_FAILED}})
+            return None
+
+        tenant_id = file["tenant_id"]
+        update = {}
+
+        if kind == "video":
+            frame_io = BytesIO()
+            image.convert("RGB").save(frame_io, format="JPEG")
+            update["thumbnail_url"] = upload_bytes_to_s3_sync(
+                frame_io.getvalue(),
+                rendition_key(tenant_id, file_id, "thumbnail", "jpg"),
+                bucket,
+                "image/jpeg"
+            )
+
+        update["renditions"] = {
+            name: upload_bytes_to_s3_sync(data, rendition_key(tenant_id, file_id, name), bucket, "image/webp")
+            for name, data in render_renditions(image).items()
+        }
+        update.setdefault("thumbnail_url", update["renditions"]["medium"])
+        update["thumbnail_status"] = THUMBNAIL_READY
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            files.update_one({"_id": file_id}, {"$set": {"thumbnail_status": THUMBNAIL_PENDING}})
+            raise self.retry(exc=e)
+        logger.error(f"Error generating renditions for file {file_id}: {str(e)}")
+        files.update_one({"_id": file_id}, {"$set": {"thumbnail_status": THUMBNAIL_FAILED}})
+        return None
+
+    files.update_one({"_id": file_id}, {"$set": update})
+    logger.info(f"Renditions for file {file_id} uploaded: {', '.join(update['renditions'])}")
+    return update["renditions"]
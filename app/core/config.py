@@ -15,3 +15,23 @@ TASKS_FILE_AWS_S3_BUCKET = settings.TASKS_FILE_AWS_S3_BUCKET
 MONGO_URI = settings.MONGO_URI
 MONGO_DB_NAME = settings.MONGO_DB_NAME
 OPENAI_API_KEY = settings.OPENAI_API_KEY
+PDF_CACHE_DIR = settings.PDF_CACHE_DIR
+PDF_CACHE_MAX_BYTES = settings.PDF_CACHE_MAX_BYTES
+PDF_CACHE_S3_BUCKET = settings.PDF_CACHE_S3_BUCKET
+MAP_PROVIDER = settings.MAP_PROVIDER
+MAP_CACHE_DIR = settings.MAP_CACHE_DIR
+MAP_CACHE_TTL_SECONDS = settings.MAP_CACHE_TTL_SECONDS
+MAP_CACHE_MAX_BYTES = settings.MAP_CACHE_MAX_BYTES
+AI_EXTRACTION_BATCH_SIZE = settings.AI_EXTRACTION_BATCH_SIZE
+AI_EXTRACTION_CONCURRENCY = settings.AI_EXTRACTION_CONCURRENCY
+AI_EXTRACTION_TOKENS_PER_MINUTE = settings.AI_EXTRACTION_TOKENS_PER_MINUTE
+GPT_BACKEND = settings.GPT_BACKEND
+OPENAI_BASE_URL = settings.OPENAI_BASE_URL
+OPENAI_MAX_CONNECTIONS = settings.OPENAI_MAX_CONNECTIONS
+OPENAI_TIMEOUT_SECONDS = settings.OPENAI_TIMEOUT_SECONDS
+OPENAI_MAX_RETRIES = settings.OPENAI_MAX_RETRIES
+OPENAI_HEDGE_AFTER_SECONDS = settings.OPENAI_HEDGE_AFTER_SECONDS
+OPENAI_TENANT_CONCURRENCY = settings.OPENAI_TENANT_CONCURRENCY
+GPT_CACHE_TTL_SECONDS = settings.GPT_CACHE_TTL_SECONDS
+GPT_CACHE_MAX_ENTRIES = settings.GPT_CACHE_MAX_ENTRIES
+GPT_CACHE_REDIS_URL = settings.GPT_CACHE_REDIS_URL
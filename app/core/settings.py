@@ -1,6 +1,8 @@
 # app/core/settings.py
 from pydantic_settings import BaseSettings
 import os
+import tempfile
+from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()  # This will load variables from a .env file in the current directory
 
@@ -19,6 +21,27 @@ class Settings(BaseSettings):
     MONGO_URI : str = os.getenv("MONGO_URI")
     MONGO_DB_NAME : str = os.getenv("MONGO_DB_NAME")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    PDF_CACHE_DIR: str = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "event_pdf_cache"))
+    PDF_CACHE_MAX_BYTES: int = int(os.getenv("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+    PDF_CACHE_S3_BUCKET: Optional[str] = os.getenv("PDF_CACHE_S3_BUCKET")
+    MAP_PROVIDER: str = os.getenv("MAP_PROVIDER", "google")
+    MAP_CACHE_DIR: str = os.getenv("MAP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "static_map_cache"))
+    MAP_CACHE_TTL_SECONDS: int = int(os.getenv("MAP_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+    MAP_CACHE_MAX_BYTES: int = int(os.getenv("MAP_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+    AI_EXTRACTION_BATCH_SIZE: int = int(os.getenv("AI_EXTRACTION_BATCH_SIZE", 100))
+    AI_EXTRACTION_CONCURRENCY: int = int(os.getenv("AI_EXTRACTION_CONCURRENCY", 4))
+    AI_EXTRACTION_TOKENS_PER_MINUTE: int = int(os.getenv("AI_EXTRACTION_TOKENS_PER_MINUTE", 100000))
+    GPT_BACKEND: str = os.getenv("GPT_BACKEND", "openai")
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL")
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+    OPENAI_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 120))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", 3))
+    # 0 disables hedging
+    OPENAI_HEDGE_AFTER_SECONDS: float = float(os.getenv("OPENAI_HEDGE_AFTER_SECONDS", 0))
+    OPENAI_TENANT_CONCURRENCY: int = int(os.getenv("OPENAI_TENANT_CONCURRENCY", 4))
+    GPT_CACHE_TTL_SECONDS: int = int(os.getenv("GPT_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+    GPT_CACHE_MAX_ENTRIES: int = int(os.getenv("GPT_CACHE_MAX_ENTRIES", 1024))
+    GPT_CACHE_REDIS_URL: Optional[str] = os.getenv("GPT_CACHE_REDIS_URL", os.getenv("REDIS_URL"))
 
 
 settings = Settings()
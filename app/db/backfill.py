@@ -0,0 +1,75 @@
+"""
+One-off data backfills for documents written before a feature existed.
+
+Run with:
+    python -m app.db.backfill search-tokens
+    python -m app.db.backfill renditions
+    python -m app.db.backfill dedupe-tags
+    python -m app.db.backfill dedupe-emails
+    python -m app.db.backfill tag-types
+"""
+import argparse
+import asyncio
+from app.db.repository.events import EventsRepository
+from app.db.repository.emails import EmailsRepository
+from app.db.repository.files import FilesRepository
+from app.db.repository.tags import TagsRepository
+from app.db.indexes import reconcile_indexes
+from app.celery_worker.tasks.media import generate_file_renditions, THUMBNAIL_PENDING
+from app.utils.renditions import media_kind
+
+
+async def backfill_search_tokens() -> None:
+    events = await EventsRepository().backfill_search_tokens()
+    emails = await EmailsRepository().backfill_search_tokens()
+    print(f"Indexed {events} events and {emails} emails for search")
+
+
+async def backfill_renditions() -> None:
+    """Queue renditions for images, PDFs and videos uploaded before the rendition pipeline"""
+    files_repo = FilesRepository()
+    queued = 0
+    projection = {"file_name": 1, "tenant_id": 1, "content_type": 1}
+    async for file in files_repo.collection.find({"renditions": {"$exists": False}}, projection):
+        if media_kind(file["file_name"], file.get("content_type")) is None:
+            continue
+        await files_repo.update_one({"_id": file["_id"]}, {"thumbnail_status": THUMBNAIL_PENDING})
+        generate_file_renditions.delay(file["_id"], f"AWS_S3_BUCKET_{file['tenant_id']}")
+        queued += 1
+    print(f"Queued renditions for {queued} files")
+
+
+async def dedupe_tags() -> None:
+    """Merge duplicate tags, then build the unique tag index that prevents new ones"""
+    removed = await TagsRepository().merge_duplicates()
+    print(f"Merged {removed} duplicate tags")
+    await reconcile_indexes()
+
+
+async def dedupe_emails() -> None:
+    """Remove repeated deliveries of a message, then build the unique message_id index that prevents new ones"""
+    removed = await EmailsRepository().remove_duplicate_messages()
+    print(f"Removed {removed} duplicate emails")
+    await reconcile_indexes()
+
+
+async def backfill_tag_types() -> None:
+    updated = await FilesRepository().backfill_tag_types()
+    print(f"Set tag types on {updated} files")
+    await reconcile_indexes()
+
+
+BACKFILLS = {
+    "search-tokens": backfill_search_tokens,
+    "renditions": backfill_renditions,
+    "dedupe-tags": dedupe_tags,
+    "dedupe-emails": dedupe_emails,
+    "tag-types": backfill_tag_types,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a data backfill.")
+    parser.add_argument("name", choices=sorted(BACKFILLS))
+    args = parser.parse_args()
+    asyncio.run(BACKFILLS[args.name]())
@@ -0,0 +1,173 @@
+from typing import Any, Dict, List
+from pymongo.errors import OperationFailure
+from app.db.session import get_db
+from app.db.repository.users import UsersRepository
+from app.db.repository.roles import RolesRepository
+from app.db.repository.events import EventsRepository
+from app.db.repository.files import FilesRepository
+from app.db.repository.tags import TagsRepository
+from app.db.repository.emails import EmailsRepository
+from app.db.repository.tenants import TenantsRepository
+from app.db.repository.maps import CountriesRepository, StatesRepository, CitiesRepository
+
+# Repositories that declare `collection_name`, `indexes` and `canonical_queries`
+INDEXED_REPOSITORIES = [
+    UsersRepository,
+    RolesRepository,
+    EventsRepository,
+    FilesRepository,
+    TagsRepository,
+    EmailsRepository,
+    TenantsRepository,
+    CountriesRepository,
+    StatesRepository,
+    CitiesRepository,
+]
+
+
+def _key_of(index_spec: Dict[str, Any]) -> List[tuple]:
+    return [(field, direction) for field, direction in index_spec["key"].items()]
+
+
+async def _index_usage(collection) -> Dict[str, int]:
+    """Number of operations served by each index since the server started."""
+    try:
+        return {
+            stat["name"]: stat["accesses"]["ops"]
+            async for stat in collection.aggregate([{"$indexStats": {}}])
+        }
+    except Exception:
+        # $indexStats needs the clusterMonitor role on some deployments
+        return {}
+
+
+async def reconcile_indexes() -> Dict[str, Dict[str, List[str]]]:
+    """
+    Create the indexes declared on each repository that are missing.
+
+    Nothing is ever dropped: indexes found in the database but not declared,
+    declared indexes whose key differs from the existing one, and indexes that
+    have not served any query are only reported, so they can be reviewed.
+    Safe to run on every startup.
+
+    Returns:
+        Dict of collection name -> {"created", "failed", "conflicting", "unknown", "unused"}
+    """
+    db = get_db()
+    report = {}
+
+    for repository in INDEXED_REPOSITORIES:
+        collection = db[repository.collection_name]
+        existing = await collection.index_information()
+
+        missing = []
+        conflicting = []
+        for index in repository.indexes:
+            spec = index.document
+            current = existing.get(spec["name"])
+            if current is None:
+                missing.append(index)
+            elif current["key"] != _key_of(spec):
+                conflicting.append(spec["name"])
+
+        created = []
+        failed = []
+        for index in missing:
+            try:
+                created.extend(await collection.create_indexes([index]))
+            except OperationFailure as e:
+                # e.g. a unique index over data that still has duplicates
+                failed.append(index.document["name"])
+                print(f"Could not create index {repository.collection_name}.{index.document['name']}: {e}")
+
+        declared = {index.document["name"] for index in repository.indexes}
+        unknown = [name for name in existing if name != "_id_" and name not in declared]
+
+        usage = await _index_usage(collection)
+        unused = [name for name, ops in usage.items() if name != "_id_" and ops == 0]
+
+        report[repository.collection_name] = {
+            "created": list(created),
+            "failed": failed,
+            "conflicting": conflicting,
+            "unknown": unknown,
+            "unused": unused,
+        }
+
+        if created:
+            print(f"Created indexes on {repository.collection_name}: {', '.join(created)}")
+        for name in conflicting:
+            print(f"Index {repository.collection_name}.{name} exists with a different key than declared")
+        for name in unknown:
+            print(f"Index {repository.collection_name}.{name} is not declared by {repository.__name__}")
+        for name in unused:
+            print(f"Index {repository.collection_name}.{name} has not served any query since the server started")
+
+    return report
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten a winning plan into the list of its stage names."""
+    stages = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        stages.extend(_plan_stages(plan["inputStage"]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    if "queryPlan" in plan:
+        stages.extend(_plan_stages(plan["queryPlan"]))
+    return stages
+
+
+async def explain_canonical_queries() -> List[Dict[str, Any]]:
+    """
+    Run explain() on the canonical queries of every repository and flag the
+    ones that scan the whole collection or sort in memory.
+    """
+    db = get_db()
+    results = []
+
+    for repository in INDEXED_REPOSITORIES:
+        collection = db[repository.collection_name]
+        for query in repository.canonical_queries:
+            cursor = collection.find(query["filter"])
+            if query.get("sort"):
+                cursor = cursor.sort(query["sort"])
+            explanation = await cursor.explain()
+
+            stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+            results.append({
+                "collection": repository.collection_name,
+                "filter": query["filter"],
+                "sort": query.get("sort"),
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages,
+                "in_memory_sort": "SORT" in stages,
+            })
+
+    return results
+
+
+async def _main(explain: bool) -> None:
+    if not explain:
+        await reconcile_indexes()
+        return
+
+    for result in await explain_canonical_queries():
+        flags = []
+        if result["collection_scan"]:
+            flags.append("COLLSCAN")
+        if result["in_memory_sort"]:
+            flags.append("IN-MEMORY SORT")
+        status = ", ".join(flags) if flags else "ok"
+        sort = f" sort={result['sort']}" if result["sort"] else ""
+        print(f"[{status}] {result['collection']} {result['filter']}{sort} -> {' > '.join(result['stages'])}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Reconcile MongoDB indexes or explain the canonical queries.")
+    parser.add_argument("--explain", action="store_true", help="run explain() on each repository's canonical queries")
+    args = parser.parse_args()
+    asyncio.run(_main(args.explain))
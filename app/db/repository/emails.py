@@ -1,12 +1,36 @@
 from typing import List, Dict, Any, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.db.session import get_db
+from app.utils.search import search_tokens, search_pipeline
+from app.utils.pagination import paginate_query
 from datetime import datetime
 from uuid import UUID
 import copy
 
+# Fields covered by the `search` query param
+EMAIL_SEARCH_FIELDS = ("subject", "from_")
+
 class EmailsRepository:
-    def __init__(self):
-        self.collection_name = "emails"
+    collection_name = "emails"
+    indexes = [
+        IndexModel([("tenant_id", ASCENDING), ("created_at", DESCENDING)], name="tenant_id_created_at"),
+        IndexModel([("tenant_id", ASCENDING), ("search_tokens", ASCENDING)], name="tenant_id_search_tokens"),
+        # One email per forwarded message; emails without a message_id aren't constrained.
+        # Can't be built over existing duplicates: run `python -m app.db.backfill dedupe-emails`
+        IndexModel(
+            [("tenant_id", ASCENDING), ("message_id", ASCENDING)],
+            name="tenant_id_message_id_unique",
+            unique=True,
+            partialFilterExpression={"message_id": {"$type": "string"}}
+        ),
+        # Backlog scanned by the extract_pending_emails task, oldest first
+        IndexModel([("processed", ASCENDING), ("created_at", ASCENDING)], name="processed_created_at"),
+    ]
+    canonical_queries = [
+        {"filter": {"tenant_id": "tenant"}, "sort": [("created_at", -1)]},
+        {"filter": {"tenant_id": "tenant", "search_tokens": {"$regex": "^invit"}}},
+        {"filter": {"processed": False}, "sort": [("created_at", 1)]},
+    ]
 
     async def get_collection(self):
         db = get_db()
@@ -44,7 +68,8 @@ class EmailsRepository:
         filter_dict: Dict[str, Any],
         skip: int = 0,
         limit: int = 100,
-        sort: Optional[List[tuple]] = None
+        sort: Optional[List[tuple]] = None,
+        after: Optional[List[Any]] = None
     ) -> List[Dict[str, Any]]:
         collection = await self.get_collection()
         
@@ -53,21 +78,38 @@ class EmailsRepository:
             filter_dict = copy.deepcopy(filter_dict)
             filter_dict['tenant_id'] = str(filter_dict['tenant_id'])
         
-        cursor = collection.find(filter_dict).skip(skip).limit(limit)
-        
-        if sort:
-            sort_list = []
-            for field, order in sort:
-                sort_list.append((field, order))
-            cursor = cursor.sort(sort_list)
+        # Resume after the cursor when given, otherwise skip to the offset
+        filter_dict, sort_list = paginate_query(filter_dict, sort, after)
+        cursor = collection.find(filter_dict).sort(sort_list)
+        if after is None:
+            cursor = cursor.skip(skip)
+        cursor = cursor.limit(limit)
         
         return await cursor.to_list(length=limit)
 
+    async def search(
+        self,
+        filter_dict: Dict[str, Any],
+        search: str,
+        skip: int = 0,
+        limit: int = 100,
+        sort: Optional[List[tuple]] = None,
+        after: Optional[List[Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find emails matching filter_dict whose subject or sender contain words
+        starting with each term of search, ranked by relevance unless sort is given
+        """
+        collection = await self.get_collection()
+        pipeline = search_pipeline(filter_dict, search, "subject", skip=skip, limit=limit, sort=sort, after=after)
+        return [doc async for doc in collection.aggregate(pipeline)]
+
     async def insert_one(self, data: Dict[str, Any]) -> str:
         collection = await self.get_collection()
         
         # Prepare document for MongoDB
         doc = self._prepare_document(data)
+        doc["search_tokens"] = search_tokens(doc, EMAIL_SEARCH_FIELDS)
         
         result = await collection.insert_one(doc)
         return str(result.inserted_id)
@@ -86,8 +128,55 @@ class EmailsRepository:
         update_doc = {"$set": self._prepare_document(update_data)}
         
         result = await collection.update_one(filter_dict, update_doc)
+        
+        # Rebuild the search tokens if a searchable field changed
+        if any(field in update_data for field in EMAIL_SEARCH_FIELDS):
+            doc = await collection.find_one(filter_dict)
+            if doc is not None:
+                await collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"search_tokens": search_tokens(doc, EMAIL_SEARCH_FIELDS)}}
+                )
+        
         return result.modified_count
 
+    async def backfill_search_tokens(self) -> int:
+        """Set search_tokens on emails stored before search indexing; returns the number updated"""
+        collection = await self.get_collection()
+        updated = 0
+        projection = {field: 1 for field in EMAIL_SEARCH_FIELDS}
+        async for doc in collection.find({"search_tokens": {"$exists": False}}, projection):
+            await collection.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"search_tokens": search_tokens(doc, EMAIL_SEARCH_FIELDS)}}
+            )
+            updated += 1
+        return updated
+
+    async def remove_duplicate_messages(self) -> int:
+        """
+        Delete the emails of a tenant repeating a message_id it already has,
+        keeping the first received (by created_at, then _id), so the unique
+        index can be built. Returns the number removed.
+        """
+        collection = await self.get_collection()
+        removed = 0
+        pipeline = [
+            {"$match": {"message_id": {"$type": "string"}}},
+            {"$sort": {"created_at": 1, "_id": 1}},
+            {"$group": {
+                "_id": {"tenant_id": "$tenant_id", "message_id": "$message_id"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        async for group in collection.aggregate(pipeline, allowDiskUse=True):
+            duplicates = group["ids"][1:]
+            result = await collection.delete_many({"_id": {"$in": duplicates}})
+            removed += result.deleted_count
+        return removed
+
     async def delete_one(self, filter_dict: Dict[str, Any]) -> int:
         collection = await self.get_collection()
         
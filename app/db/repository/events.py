@@ -1,13 +1,31 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.db.session import get_db
+from app.utils.search import search_tokens, search_pipeline
+from app.utils.pagination import paginate_query
+
+# Fields covered by the `search` query param
+EVENT_SEARCH_FIELDS = ("event_name", "institute_name", "location")
 
 class EventsRepository:
+    collection_name = "events"
+    indexes = [
+        IndexModel([("tenant_id", ASCENDING), ("created_at", DESCENDING)], name="tenant_id_created_at"),
+        IndexModel([("tenant_id", ASCENDING), ("search_tokens", ASCENDING)], name="tenant_id_search_tokens"),
+        IndexModel([("tenant_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="tenant_id_created_at_id"),
+    ]
+    canonical_queries = [
+        {"filter": {"tenant_id": "tenant"}},
+        {"filter": {"tenant_id": "tenant"}, "sort": [("created_at", 1), ("_id", 1)]},
+        {"filter": {"tenant_id": "tenant", "search_tokens": {"$regex": "^conf"}}},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["events"]
+        self.collection = get_db()[self.collection_name]
 
     async def find_one(self, query):
         return await self.collection.find_one(query)
 
-    async def find_many(self, query, skip=0, limit=100, sort=None):
+    async def find_many(self, query, skip=0, limit=100, sort=None, after=None):
         """
         Find many events with support for pagination
         
@@ -15,25 +33,86 @@ class EventsRepository:
             query: The MongoDB query to execute
             skip: Number of documents to skip (pagination offset)
             limit: Maximum number of documents to return
-            sort: Optional sorting criteria
+            sort: Optional sorting criteria (_id is always appended as a tie-breaker)
+            after: Decoded cursor; when given, resume after it instead of skipping
             
         Returns:
             List of documents matching the query with pagination applied
         """
-        cursor = self.collection.find(query)
+        query, sort = paginate_query(query, sort, after)
+        cursor = self.collection.find(query).sort(sort)
+        
+        if after is None:
+            cursor = cursor.skip(skip)
+        
+        cursor = cursor.limit(limit)
+        return [doc async for doc in cursor]
+
+    async def iter_many(self, query, projection=None, skip=0, limit=0, sort=None, batch_size=500):
+        """
+        Iterate over events matching the query without loading them all into memory
+        
+        Args:
+            query: The MongoDB query to execute
+            projection: Fields to include or exclude in the result
+            skip: Number of documents to skip
+            limit: Maximum number of documents to yield (0 for no limit)
+            sort: Optional sorting criteria
+            batch_size: Number of documents fetched per round-trip
+            
+        Yields:
+            Documents matching the query, one at a time
+        """
+        cursor = self.collection.find(query, projection, batch_size=batch_size)
         
         if sort:
             cursor = cursor.sort(sort)
         
         cursor = cursor.skip(skip).limit(limit)
-        return [doc async for doc in cursor]
+        async for doc in cursor:
+            yield doc
+
+    async def search(self, query, search, skip=0, limit=100, sort=None, after=None):
+        """
+        Find events matching query whose name, institute or location contain
+        words starting with each term of search, ranked by relevance unless
+        sort is given
+        """
+        pipeline = search_pipeline(query, search, "event_name", skip=skip, limit=limit, sort=sort, after=after)
+        return await self.aggregate(pipeline)
 
     async def insert_one(self, event):
+        # Copy so the caller's dict doesn't gain search_tokens (or an _id)
+        event = {**event, "search_tokens": search_tokens(event, EVENT_SEARCH_FIELDS)}
         result = await self.collection.insert_one(event)
         return result.inserted_id
 
     async def update_one(self, query, update_data):
-        return await self.collection.update_one(query, {"$set": update_data})
+        result = await self.collection.update_one(query, {"$set": update_data})
+
+        # Rebuild the search tokens if a searchable field changed
+        if any(field in update_data for field in EVENT_SEARCH_FIELDS):
+            projection = {field: 1 for field in EVENT_SEARCH_FIELDS}
+            event = await self.collection.find_one(query, projection)
+            if event is not None:
+                await self.collection.update_one(
+                    {"_id": event["_id"]},
+                    {"$set": {"search_tokens": search_tokens(event, EVENT_SEARCH_FIELDS)}}
+                )
+
+        return result
+
+    async def backfill_search_tokens(self, batch_size=500):
+        """Set search_tokens on events created before search indexing; returns the number updated"""
+        updated = 0
+        projection = {field: 1 for field in EVENT_SEARCH_FIELDS}
+        async for event in self.iter_many({"search_tokens": {"$exists": False}}, projection, batch_size=batch_size):
+            await self.collection.update_one(
+                {"_id": event["_id"]},
+                {"$set": {"search_tokens": search_tokens(event, EVENT_SEARCH_FIELDS)}}
+            )
+            updated += 1
+        return updated
 
     async def delete_one(self, query):
         return await self.collection.delete_one(query)
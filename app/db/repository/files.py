@@ -1,8 +1,28 @@
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
 from app.db.session import get_db
+from app.utils.pagination import paginate_query
 
 class FilesRepository:
+    collection_name = "files"
+    indexes = [
+        IndexModel([("tenant_id", ASCENDING), ("created_at", DESCENDING)], name="tenant_id_created_at"),
+        # Multikey index over the tag id array
+        IndexModel([("tenant_id", ASCENDING), ("tags", ASCENDING)], name="tenant_id_tags"),
+        # Type filter and newest-first order of files_with_tags_by_type
+        IndexModel(
+            [("tenant_id", ASCENDING), ("tag_types", ASCENDING), ("created_at", DESCENDING)],
+            name="tenant_id_tag_types_created_at"
+        ),
+    ]
+    canonical_queries = [
+        {"filter": {"tenant_id": "tenant"}, "sort": [("created_at", -1)]},
+        {"filter": {"tenant_id": "tenant", "tags": {"$all": ["tag"]}}},
+        {"filter": {"tenant_id": "tenant", "tag_types": "type"}, "sort": [("created_at", -1)]},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["files"]
+        self.collection = get_db()[self.collection_name]
 
     async def find_one(self, query):
         return await self.collection.find_one(query)
@@ -23,104 +43,120 @@ class FilesRepository:
     async def update_one(self, query, update_data):
         return await self.collection.update_one(query, {"$set": update_data})
 
+    @staticmethod
+    def tag_types_of(tags_by_type: Dict[str, List[str]]) -> List[str]:
+        """The `tag_types` stored on a file tagged with tags_by_type (type -> names)."""
+        return sorted(tag_type for tag_type, names in tags_by_type.items() if names)
+
+    async def backfill_tag_types(self, batch_size=500):
+        """Set tag_types on files tagged before it was stored; returns the number updated"""
+        tags_collection = get_db()["tags"]
+        updated = 0
+        batch = []
+        
+        async def flush():
+            tag_ids = list({tag_id for file in batch for tag_id in file.get("tags", [])})
+            types = {
+                tag["_id"]: tag.get("type", "default")
+                async for tag in tags_collection.find({"_id": {"$in": tag_ids}}, {"type": 1})
+            }
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"_id": file["_id"]},
+                    {"$set": {"tag_types": sorted({types[tag_id] for tag_id in file.get("tags", []) if tag_id in types})}}
+                )
+                for file in batch
+            ], ordered=False)
+        
+        cursor = self.collection.find({"tag_types": {"$exists": False}}, {"tags": 1}, batch_size=batch_size)
+        async for file in cursor:
+            batch.append(file)
+            if len(batch) >= batch_size:
+                await flush()
+                updated += len(batch)
+                batch = []
+        if batch:
+            await flush()
+            updated += len(batch)
+        return updated
+
     async def delete_one(self, query):
         return await self.collection.delete_one(query)
 
     async def aggregate(self, pipeline):
         return [doc async for doc in self.collection.aggregate(pipeline)]
 
-    async def files_with_tags(self, tenant_id, skip=0, limit=10, sort=None, id=None):
-        pipeline = []
+    async def files_with_tags(self, tenant_id, skip=0, limit=10, sort=None, id=None, after=None):
+        match = {"tenant_id": tenant_id}
         if id:
-            pipeline.append({"$match": {"_id": id}})
+            match["_id"] = id
         
-        # Match by tenant_id
-        pipeline.append({"$match": {"tenant_id": tenant_id}})
+        # Sort by created_at descending (newest first) by default, with _id as tie-breaker
+        query, sort = paginate_query(match, sort or {"created_at": -1}, after)
         
-        # Sort by created_at descending (newest first) by default
-        if sort:
-            pipeline.append({"$sort": sort})
-        else:
-            pipeline.append({"$sort": {"created_at": -1}})
-            
-        # Pagination
-        pipeline.append({"$skip": skip})
+        pipeline = [{"$match": query}, {"$sort": dict(sort)}]
+        
+        # Pagination, resuming after the cursor when one is given
+        if after is None:
+            pipeline.append({"$skip": skip})
         pipeline.append({"$limit": limit})
         
         # Lookup to get tag details
-        pipeline.append({
-            "$lookup": {
-                "from": "tags",
-                "localField": "tags",
-                "foreignField": "_id",
-                "as": "tag_details"
-            }
-        })
+        pipeline.append(self._tag_details_lookup())
         
         # Project the desired fields
-        pipeline.append({
-            "$project": {
-                "_id": 1,
-                "file_name": 1,
-                "created_at": 1,
-                "s3_key": 1,
-                "tags": {
-                    "$map": {
-                        "input": "$tag_details",
-                        "as": "tag",
-                        "in": {
-                            "id": "$$tag._id",
-                            "name": "$$tag.name",
-                            "type": "$$tag.type"
-                        }
-                    }
-                }
-            }
-        })
+        pipeline.append(self._tagged_file_projection())
         
         result = await self.aggregate(pipeline)
         return result[0] if id and result else result
 
-    async def files_with_tags_by_type(self, tenant_id, tag_type, skip=0, limit=10, id=None):
-        pipeline = []
-        
+    async def files_with_tags_by_type(self, tenant_id, tag_type, skip=0, limit=10, id=None, after=None):
+        # Filter on the denormalized tag_types through its index, so only the
+        # returned page needs its tags looked up
+        match = {"tenant_id": tenant_id, "tag_types": tag_type}
         if id:
-            pipeline.append({"$match": {"_id": id}})
-            
-        # Match by tenant_id
-        pipeline.append({"$match": {"tenant_id": tenant_id}})
+            match["_id"] = id
+        
+        # Sort by created_at descending (newest first)
+        query, sort = paginate_query(match, {"created_at": -1}, after)
+        
+        pipeline = [{"$match": query}, {"$sort": dict(sort)}]
+        
+        # Pagination
+        if after is None:
+            pipeline.append({"$skip": skip})
+        pipeline.append({"$limit": limit})
         
         # Lookup to get tag details
-        pipeline.append({
+        pipeline.append(self._tag_details_lookup())
+        
+        # Project the desired fields
+        pipeline.append(self._tagged_file_projection())
+        
+        result = await self.aggregate(pipeline)
+        return result[0] if id and result else result
+
+    @staticmethod
+    def _tag_details_lookup():
+        return {
             "$lookup": {
                 "from": "tags",
                 "localField": "tags",
                 "foreignField": "_id",
                 "as": "tag_details"
             }
-        })
-        
-        # Filter files that have at least one tag of the specified type
-        pipeline.append({
-            "$match": {
-                "tag_details.type": tag_type
-            }
-        })
-        
-        # Sort by created_at descending (newest first)
-        pipeline.append({"$sort": {"created_at": -1}})
-        
-        # Pagination
-        pipeline.append({"$skip": skip})
-        pipeline.append({"$limit": limit})
-        
-        # Project the desired fields
-        pipeline.append({
+        }
+
+    @staticmethod
+    def _tagged_file_projection():
+        return {
             "$project": {
                 "_id": 1,
                 "file_name": 1,
                 "created_at": 1,
                 "s3_key": 1,
+                "thumbnail_url": 1,
+                "renditions": 1,
                 "tags": {
                     "$map": {
                         "input": "$tag_details",
@@ -133,10 +169,7 @@ class FilesRepository:
                     }
                 }
             }
-        })
-        
-        result = await self.aggregate(pipeline)
-        return result[0] if id and result else result
+        }
 
     async def files_by_tag_ids(self, tenant_id, tag_ids, skip=0, limit=10, sort=None):
         pipeline = [
@@ -159,6 +192,8 @@ class FilesRepository:
                 "s3_key": 1,
                 "s3_url": 1,
                 "thumbnail_url": 1,
+                "thumbnail_status": 1,
+                "renditions": 1,
                 "tag_details": 1
             }}
         ]
@@ -1,12 +1,22 @@
 from app.db.session import get_db
 from typing import Optional, Dict, Any, List
+from pymongo import ASCENDING, IndexModel
+from app.utils.pagination import paginate_query
 
 
 class CountriesRepository:
+    collection_name = "countries"
+    indexes = [
+        IndexModel([("name", ASCENDING)], name="name"),
+    ]
+    canonical_queries = [
+        {"filter": {"name": {"$regex": "^ind", "$options": "i"}}, "sort": [("name", 1)]},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["countries"]
+        self.collection = get_db()[self.collection_name]
 
-    async def find_many(self, query: Dict[str, Any], skip: int = 0, limit: int = 100, sort=None, projection=None):
+    async def find_many(self, query: Dict[str, Any], skip: int = 0, limit: int = 100, sort=None, projection=None, after=None):
         """
         Find countries with support for pagination, sorting, and field projection
         
@@ -14,18 +24,20 @@ class CountriesRepository:
             query: The MongoDB query to execute
             skip: Number of documents to skip (pagination offset)
             limit: Maximum number of documents to return
-            sort: Optional sorting criteria
+            sort: Optional sorting criteria (_id is always appended as a tie-breaker)
             projection: Fields to include or exclude in the result
+            after: Decoded cursor; when given, resume after it instead of skipping
             
         Returns:
             List of documents matching the query with pagination applied
         """
-        cursor = self.collection.find(query, projection)
+        query, sort = paginate_query(query, sort, after)
+        cursor = self.collection.find(query, projection).sort(sort)
         
-        if sort:
-            cursor = cursor.sort(sort)
+        if after is None:
+            cursor = cursor.skip(skip)
         
-        cursor = cursor.skip(skip).limit(limit)
+        cursor = cursor.limit(limit)
         return [doc async for doc in cursor]
 
     async def count(self, query: Dict[str, Any]) -> int:
@@ -38,10 +50,18 @@ class CountriesRepository:
 
 
 class StatesRepository:
+    collection_name = "states"
+    indexes = [
+        IndexModel([("country_id", ASCENDING), ("name", ASCENDING)], name="country_id_name"),
+    ]
+    canonical_queries = [
+        {"filter": {"country_id": 1}, "sort": [("name", 1)]},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["states"]
+        self.collection = get_db()[self.collection_name]
 
-    async def find_many(self, query: Dict[str, Any], skip: int = 0, limit: int = 100, sort=None, projection=None):
+    async def find_many(self, query: Dict[str, Any], skip: int = 0, limit: int = 100, sort=None, projection=None, after=None):
         """
         Find states with support for pagination, sorting, and field projection
         
@@ -49,18 +69,20 @@ class StatesRepository:
             query: The MongoDB query to execute
             skip: Number of documents to skip (pagination offset)
             limit: Maximum number of documents to return
-            sort: Optional sorting criteria
+            sort: Optional sorting criteria (_id is always appended as a tie-breaker)
             projection: Fields to include or exclude in the result
+            after: Decoded cursor; when given, resume after it instead of skipping
             
         Returns:
             List of documents matching the query with pagination applied
         """
-        cursor = self.collection.find(query, projection)
+        query, sort = paginate_query(query, sort, after)
+        cursor = self.collection.find(query, projection).sort(sort)
         
-        if sort:
-            cursor = cursor.sort(sort)
+        if after is None:
+            cursor = cursor.skip(skip)
         
-        cursor = cursor.skip(skip).limit(limit)
+        cursor = cursor.limit(limit)
         return [doc async for doc in cursor]
 
     async def count(self, query: Dict[str, Any]) -> int:
@@ -73,10 +95,20 @@ class StatesRepository:
 
 
 class CitiesRepository:
+    collection_name = "cities"
+    indexes = [
+        IndexModel([("country_id", ASCENDING), ("name", ASCENDING)], name="country_id_name"),
+        IndexModel([("state_id", ASCENDING), ("name", ASCENDING)], name="state_id_name"),
+    ]
+    canonical_queries = [
+        {"filter": {"country_id": 1}, "sort": [("name", 1)]},
+        {"filter": {"state_id": 1}, "sort": [("name", 1)]},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["cities"]
+        self.collection = get_db()[self.collection_name]
 
-    async def find_many(self, query: Dict[str, Any], skip: int = 0, limit: int = 100, sort=None, projection=None):
+    async def find_many(self, query: Dict[str, Any], skip: int = 0, limit: int = 100, sort=None, projection=None, after=None):
         """
         Find cities with support for pagination, sorting, and field projection
         
@@ -84,18 +116,20 @@ class CitiesRepository:
             query: The MongoDB query to execute
             skip: Number of documents to skip (pagination offset)
             limit: Maximum number of documents to return
-            sort: Optional sorting criteria
+            sort: Optional sorting criteria (_id is always appended as a tie-breaker)
             projection: Fields to include or exclude in the result
+            after: Decoded cursor; when given, resume after it instead of skipping
             
         Returns:
             List of documents matching the query with pagination applied
         """
-        cursor = self.collection.find(query, projection)
+        query, sort = paginate_query(query, sort, after)
+        cursor = self.collection.find(query, projection).sort(sort)
         
-        if sort:
-            cursor = cursor.sort(sort)
+        if after is None:
+            cursor = cursor.skip(skip)
         
-        cursor = cursor.skip(skip).limit(limit)
+        cursor = cursor.limit(limit)
         return [doc async for doc in cursor]
 
     async def count(self, query: Dict[str, Any]) -> int:
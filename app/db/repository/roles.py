@@ -1,8 +1,64 @@
+import time
+from typing import Dict, Iterable, Optional
+from pymongo import ASCENDING, IndexModel
 from app.db.session import get_db
 
+# How long cached roles are trusted before being re-read, so other workers' edits show up
+ROLE_CACHE_TTL_SECONDS = 300
+
+
+class RoleCache:
+    """
+    In-process cache of role documents, grouped per tenant so a tenant's roles can
+    be dropped together when one of them changes.
+    """
+
+    def __init__(self, ttl_seconds: int = ROLE_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._by_tenant: Dict[str, Dict[str, dict]] = {}
+        self._tenant_of: Dict[str, str] = {}
+        self._loaded_at: Dict[str, float] = {}
+
+    def get(self, role_id: str) -> Optional[dict]:
+        tenant_id = self._tenant_of.get(role_id)
+        if tenant_id is None:
+            return None
+        if time.monotonic() - self._loaded_at.get(tenant_id, 0) > self.ttl_seconds:
+            self.invalidate_tenant(tenant_id)
+            return None
+        return self._by_tenant.get(tenant_id, {}).get(role_id)
+
+    def put(self, role: dict) -> None:
+        tenant_id = str(role.get("tenant_id"))
+        if tenant_id not in self._by_tenant:
+            self._by_tenant[tenant_id] = {}
+            self._loaded_at[tenant_id] = time.monotonic()
+        self._by_tenant[tenant_id][role["_id"]] = role
+        self._tenant_of[role["_id"]] = tenant_id
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        roles = self._by_tenant.pop(str(tenant_id), {})
+        self._loaded_at.pop(str(tenant_id), None)
+        for role_id in roles:
+            self._tenant_of.pop(role_id, None)
+
+
+# Shared by every RolesRepository instance in the process
+role_cache = RoleCache()
+
+
 class RolesRepository:
+    collection_name = "roles"
+    indexes = [
+        IndexModel([("tenant_id", ASCENDING), ("name", ASCENDING)], name="tenant_id_name"),
+    ]
+    canonical_queries = [
+        {"filter": {"tenant_id": "tenant"}},
+        {"filter": {"name": "user", "tenant_id": "tenant"}},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["roles"]
+        self.collection = get_db()[self.collection_name]
 
     async def find_one(self, query):
         return await self.collection.find_one(query)
@@ -22,3 +78,40 @@ class RolesRepository:
 
     async def aggregate(self, pipeline):
         return [doc async for doc in self.collection.aggregate(pipeline)]
+
+    async def get_roles_by_ids(self, role_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        Resolve many role ids at once.
+
+        Roles already in the cache are served from memory; the rest are loaded
+        with a single $in query and cached.
+
+        Returns:
+            Dict of role_id -> role document (ids that don't exist are omitted)
+        """
+        roles = {}
+        missing = []
+        for role_id in {str(r) for r in role_ids if r}:
+            cached = role_cache.get(role_id)
+            if cached is not None:
+                roles[role_id] = cached
+            else:
+                missing.append(role_id)
+
+        if missing:
+            async for role in self.collection.find({"_id": {"$in": missing}}):
+                role_cache.put(role)
+                roles[role["_id"]] = role
+
+        return roles
+
+    async def get_role(self, role_id: Optional[str]) -> Optional[dict]:
+        """Resolve a single role id through the cache; None if unset or not found."""
+        if not role_id:
+            return None
+        roles = await self.get_roles_by_ids([role_id])
+        return roles.get(str(role_id))
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        """Drop the cached roles of a tenant after one of them was created, changed or deleted."""
+        role_cache.invalidate_tenant(tenant_id)
@@ -1,8 +1,31 @@
+from typing import Dict, List, Tuple
+from uuid import uuid4
+from datetime import datetime
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError
 from app.db.session import get_db
 
+# Server error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
 class TagsRepository:
+    collection_name = "tags"
+    indexes = [
+        # Serves exact (name, type, tenant_id) lookups as well as listing a tenant's tags of a type,
+        # and makes concurrent upserts of the same tag converge on one document
+        IndexModel(
+            [("tenant_id", ASCENDING), ("type", ASCENDING), ("name", ASCENDING)],
+            name="tenant_id_type_name_unique",
+            unique=True
+        ),
+    ]
+    canonical_queries = [
+        {"filter": {"name": "example", "type": "default", "tenant_id": "tenant"}},
+        {"filter": {"type": "default", "tenant_id": "tenant"}},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["tags"]
+        self.collection = get_db()[self.collection_name]
 
     async def find_one(self, query):
         return await self.collection.find_one(query)
@@ -29,69 +52,100 @@ class TagsRepository:
     async def aggregate(self, pipeline):
         return [doc async for doc in self.collection.aggregate(pipeline)]
 
-    async def get_tag_suggestions(self, tenant_id, query, tag_ids=None, skip=0, limit=10):
+    async def _ids_by_pair(self, tenant_id, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+        """Look up the ids of (type, name) pairs with a single $in query."""
+        ids = {}
+        query = {
+            "tenant_id": tenant_id,
+            "type": {"$in": list({tag_type for tag_type, _ in pairs})},
+            "name": {"$in": list({name for _, name in pairs})}
+        }
+        wanted = set(pairs)
+        async for tag in self.collection.find(query, {"_id": 1, "type": 1, "name": 1}):
+            pair = (tag.get("type"), tag["name"])
+            if pair in wanted:
+                ids[pair] = tag["_id"]
+        return ids
+
+    async def bulk_upsert(self, tenant_id, tags_by_type: Dict[str, List[str]]) -> List[str]:
         """
-        Get tag suggestions using MongoDB aggregation.
+        Resolve tag names to ids, creating the tags that don't exist yet.
         
-        If tag_ids are provided:
-        1. Find files that have ALL the specified tag_ids
-        2. Extract ALL tag IDs from those files
-        3. Search for tags that match the query, but only from the extracted set
-        """
-        pipeline = []
+        Existing tags are found with one query and the missing ones created with
+        one unordered bulk write of upserts. The unique (tenant_id, type, name)
+        index makes concurrent requests creating the same tag end up with the
+        same id.
         
-        # If tag_ids are provided, get all unique tag IDs from files that contain ALL specified tags
-        if tag_ids and len(tag_ids) > 0:
-            # Get the files collection
-            files_collection = get_db()["files"]
+        Args:
+            tenant_id: Tenant owning the tags
+            tags_by_type: Mapping of tag type -> list of tag names
             
-            # First get all unique tag IDs from files that contain ALL specified tags
-            tag_ids_pipeline = [
-                {
-                    "$match": {
-                        "tenant_id": tenant_id,
-                        "tags": {"$all": tag_ids}
-                    }
-                },
-                {
-                    "$unwind": "$tags"
-                },
-                {
-                    "$group": {
-                        "_id": None,
-                        "all_tag_ids": {"$addToSet": "$tags"}
-                    }
-                }
+        Returns:
+            Tag ids in input order, without duplicates
+        """
+        # dict keys keep input order and drop repeats
+        pairs = list(dict.fromkeys(
+            (tag_type, name) for tag_type, names in tags_by_type.items() for name in names
+        ))
+        if not pairs:
+            return []
+        
+        ids = await self._ids_by_pair(tenant_id, pairs)
+        missing = [pair for pair in pairs if pair not in ids]
+        
+        if missing:
+            operations = [
+                UpdateOne(
+                    {"tenant_id": tenant_id, "type": tag_type, "name": name},
+                    {"$setOnInsert": {"_id": str(uuid4()), "created_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                for tag_type, name in missing
             ]
+            try:
+                result = await self.collection.bulk_write(operations, ordered=False)
+                upserted_ids = result.upserted_ids
+            except BulkWriteError as e:
+                # Lost a race with a concurrent insert of the same tag; it is read back below
+                if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+                    raise
+                upserted_ids = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
             
-            # Execute the pipeline to get all unique tag IDs
-            tag_ids_result = await files_collection.aggregate(tag_ids_pipeline).to_list(1)
+            for index, tag_id in upserted_ids.items():
+                ids[missing[index]] = tag_id
             
-            if tag_ids_result:
-                all_tag_ids = tag_ids_result[0]["all_tag_ids"]
-                # Add a match stage to filter by the extracted tag IDs
-                pipeline.append({
-                    "$match": {
-                        "_id": {"$in": all_tag_ids}
-                    }
-                })
-            else:
-                # No files found with all specified tags, return empty result
-                return []
+            # Tags another request created between our read and our write
+            unresolved = [pair for pair in missing if pair not in ids]
+            if unresolved:
+                ids.update(await self._ids_by_pair(tenant_id, unresolved))
         
-        # Add tenant filter and text search
-        pipeline.extend([
-            { "$match": { 
-                "tenant_id": tenant_id,
-                "name": { "$regex": query, "$options": "i" }
+        return [ids[pair] for pair in pairs]
+
+    async def merge_duplicates(self) -> int:
+        """
+        Merge tags sharing (tenant_id, type, name) into the oldest one, repointing
+        files at it, so the unique index can be built. Returns the number removed.
+
+        Age is created_at, which bulk_upsert sets on new tags. Older tags have
+        none and sort first, as they predate it; among those the lowest _id is
+        kept, which is deterministic but not creation order (ids are uuid4).
+        """
+        files_collection = get_db()["files"]
+        removed = 0
+        pipeline = [
+            {"$sort": {"created_at": 1, "_id": 1}},
+            {"$group": {
+                "_id": {"tenant_id": "$tenant_id", "type": "$type", "name": "$name"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1}
             }},
-            { "$skip": skip },
-            { "$limit": limit },
-            { "$project": {
-                "_id": 1,
-                "name": 1,
-                "type": 1
-            }}
-        ])
-        
-        return await self.aggregate(pipeline)
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        async for group in self.collection.aggregate(pipeline, allowDiskUse=True):
+            keep, duplicates = group["ids"][0], group["ids"][1:]
+            for duplicate in duplicates:
+                await files_collection.update_many({"tags": duplicate}, {"$addToSet": {"tags": keep}})
+                await files_collection.update_many({"tags": duplicate}, {"$pull": {"tags": duplicate}})
+            await self.collection.delete_many({"_id": {"$in": duplicates}})
+            removed += len(duplicates)
+        return removed
@@ -1,15 +1,22 @@
+from pymongo import ASCENDING, IndexModel
 from app.db.session import get_db
+from app.utils.pagination import paginate_query
 
 class TenantsRepository:
+    collection_name = "tenants"
+    indexes = [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+    ]
+    canonical_queries = [
+        {"filter": {}, "sort": [("created_at", 1), ("_id", 1)]},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["tenants"]
+        self.collection = get_db()[self.collection_name]
 
     async def find_one(self, query):
         return await self.collection.find_one(query)
 
-    async def find_many(self, query):
-        return [doc async for doc in self.collection.find(query)]
-
     async def insert_one(self, tenant):
         result = await self.collection.insert_one(tenant)
         return result.inserted_id
@@ -23,11 +30,12 @@ class TenantsRepository:
     async def aggregate(self, pipeline):
         return [doc async for doc in self.collection.aggregate(pipeline)]
     
-    async def find_many(self, query, limit=10, skip=0, sort=None):
-        cursor = self.collection.find(query)
+    async def find_many(self, query, limit=10, skip=0, sort=None, after=None):
+        query, sort = paginate_query(query, sort, after)
+        cursor = self.collection.find(query).sort(sort)
         
-        if sort:
-            cursor = cursor.sort(sort)
+        if after is None:
+            cursor = cursor.skip(skip)
         
-        cursor = cursor.skip(skip).limit(limit)
+        cursor = cursor.limit(limit)
         return [doc async for doc in cursor]
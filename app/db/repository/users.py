@@ -1,9 +1,23 @@
 import logging
+from pymongo import ASCENDING, IndexModel
 from app.db.session import get_db
+from app.utils.pagination import paginate_query
 
 class UsersRepository:
+    collection_name = "users"
+    indexes = [
+        IndexModel([("username", ASCENDING), ("tenant_id", ASCENDING)], name="username_tenant_id"),
+        IndexModel([("tenant_id", ASCENDING)], name="tenant_id"),
+        IndexModel([("tenant_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="tenant_id_created_at_id"),
+    ]
+    canonical_queries = [
+        {"filter": {"username": "example", "tenant_id": "tenant"}},
+        {"filter": {"tenant_id": "tenant"}},
+        {"filter": {"tenant_id": "tenant"}, "sort": [("created_at", 1), ("_id", 1)]},
+    ]
+
     def __init__(self):
-        self.collection = get_db()["users"]
+        self.collection = get_db()[self.collection_name]
 
     async def find_one(self, filter_dict):
         
@@ -44,13 +58,14 @@ class UsersRepository:
             # Regular query without ID conversion
             return await self.collection.find_one(filter_dict)
 
-    async def find_many(self, query, limit=10, skip=0, sort=None):
-        cursor = self.collection.find(query)
+    async def find_many(self, query, limit=10, skip=0, sort=None, after=None):
+        query, sort = paginate_query(query, sort, after)
+        cursor = self.collection.find(query).sort(sort)
         
-        if sort:
-            cursor = cursor.sort(sort)
+        if after is None:
+            cursor = cursor.skip(skip)
         
-        cursor = cursor.skip(skip).limit(limit)
+        cursor = cursor.limit(limit)
         return [doc async for doc in cursor]
 
     async def insert_one(self, user):
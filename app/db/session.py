@@ -1,4 +1,5 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
 from app.core.config import MONGO_URI, MONGO_DB_NAME
 
 client = AsyncIOMotorClient(MONGO_URI)  # Initialize the MongoDB client globally
@@ -26,4 +27,13 @@ async def ensure_collections_exist():
             print(f"Created collection: {collection}")
 
 def get_db():
-    return db
\ No newline at end of file
+    return db
+
+_sync_client = None
+
+def get_sync_db():
+    """Blocking database handle for Celery tasks, which run outside the app's event loop."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = MongoClient(MONGO_URI)
+    return _sync_client[MONGO_DB_NAME]
@@ -1,10 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 import app.models
 from app.api.v1.endpoints import appmodule as app_endpoint, auth, user, events, tenant, tasks, maps, emails
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import asyncio
 from typing import List
 from app.db.session import ensure_collections_exist
+from app.db.indexes import reconcile_indexes
+from app.utils.pagination import InvalidCursor, NEXT_CURSOR_HEADER
+from app.utils.s3 import s3_pool
+from app.utils.pdf_utils import shutdown_render_pool
+from app.utils.openai_api import gpt
+from app.utils.tag_index import tag_index
 from fastapi.openapi.models import SecurityScheme
 
 app = FastAPI(
@@ -19,12 +27,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    # Cursors are opaque to clients, so a bad one is a client error rather than a server fault
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 @app.on_event("startup")
 async def startup_event():
     # Ensure collections exist during application startup
     await ensure_collections_exist()
+    # Create any missing indexes declared by the repositories
+    await reconcile_indexes()
+    # Open the shared S3 client so requests reuse its connection pool
+    await s3_pool.start()
+    # Load tenants' tag indexes in the background; tenants used before it
+    # finishes are loaded on demand
+    asyncio.create_task(tag_index.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await s3_pool.close()
+    shutdown_render_pool()
+    await gpt.close()
 
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(user.router, prefix="/users", tags=["Users"])
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 from uuid import UUID
 
@@ -11,12 +11,30 @@ class TagOut(BaseModel):
     class Config:
         populate_by_name = True
 
+class TagFacetOut(TagOut):
+    count: int
+
+class TagTypeFacetOut(BaseModel):
+    type: str
+    # Files under the filter having at least one tag of this type
+    file_count: int
+    tag_count: int
+    tags: List[TagFacetOut]
+
+class TagFacetsOut(BaseModel):
+    total: int
+    types: List[TagTypeFacetOut]
+
 class FileOut(BaseModel):
     id: UUID
     file_name: str
     s3_key: str
     created_at: datetime
     tags: List[TagOut]
+    download_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    # Rendition name ("small", "medium") -> WebP URL
+    renditions: Optional[Dict[str, str]] = None
 
     class Config:
         populate_by_name = True
@@ -30,13 +30,16 @@ class CitySchema(BaseModel):
 class CountryResponse(BaseModel):
     items: List[CountrySchema]
     total: int
+    next_cursor: Optional[str] = None
 
 
 class StateResponse(BaseModel):
     items: List[StateSchema]
     total: int
+    next_cursor: Optional[str] = None
 
 
 class CityResponse(BaseModel):
     items: List[CitySchema]
     total: int
+    next_cursor: Optional[str] = None
@@ -1,9 +1,12 @@
 import csv
 from io import StringIO, BytesIO
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from fastapi.responses import StreamingResponse
 import asyncio
 
+# Size of the encoded chunks handed to StreamingResponse by stream_csv
+CSV_CHUNK_SIZE = 64 * 1024
+
 async def generate_csv_from_data(
     data: List[Dict[str, Any]], 
     headers: List[str],
@@ -33,6 +36,16 @@ async def generate_csv_from_data(
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+def _format_csv_value(value: Any) -> str:
+    # Handle lists by joining them
+    if isinstance(value, list):
+        try:
+            value = ",".join(str(v) for v in value)
+        except Exception:
+            value = str(value)
+    # Convert other types to string
+    return str(value) if value is not None else ""
+
 def _generate_csv_content(data: List[Dict[str, Any]], headers: List[str]) -> str:
     """
     Generate CSV content from data (synchronous helper function)
@@ -45,18 +58,7 @@ def _generate_csv_content(data: List[Dict[str, Any]], headers: List[str]) -> str
     
     # Write data rows
     for item in data:
-        row = []
-        for header in headers:
-            value = item.get(header, "")
-            # Handle lists by joining them
-            if isinstance(value, list):
-                try:
-                    value = ",".join(str(v) for v in value)
-                except Exception:
-                    value = str(value)
-            # Convert other types to string
-            row.append(str(value) if value is not None else "")
-        writer.writerow(row)
+        writer.writerow([_format_csv_value(item.get(header, "")) for header in headers])
     
     # Get the CSV content and close the StringIO
     content = output.getvalue()
@@ -64,6 +66,21 @@ def _generate_csv_content(data: List[Dict[str, Any]], headers: List[str]) -> str
     
     return content
 
+def _get_field(model: Any, attr_name: str) -> Any:
+    """
+    Read a field from a model, which may be a dict (MongoDB document) or an object.
+    Nested fields are addressed with dots.
+    """
+    value = model
+    for part in attr_name.split("."):
+        if value is None:
+            break
+        if isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = getattr(value, part, None)
+    return value
+
 async def generate_model_csv(
     models: List[Any], 
     headers: List[str],
@@ -71,10 +88,10 @@ async def generate_model_csv(
     filename: str = "export.csv"
 ) -> StreamingResponse:
     """
-    Generate a CSV file from a list of SQLAlchemy models
+    Generate a CSV file from a list of models (dicts or objects)
     
     Args:
-        models: List of SQLAlchemy model instances
+        models: List of MongoDB documents or model instances
         headers: List of header names to include in the CSV
         field_mapping: Optional mapping from header names to model attributes
         filename: Name of the CSV file to be downloaded
@@ -90,19 +107,63 @@ async def generate_model_csv(
             # Use field_mapping if provided, otherwise use header as attribute name
             attr_name = field_mapping.get(header, header) if field_mapping else header
             
-            # Get the attribute value, handling nested attributes with dots
-            if "." in attr_name:
-                parts = attr_name.split(".")
-                value = model
-                for part in parts:
-                    if value is None:
-                        break
-                    value = getattr(value, part, None)
-            else:
-                value = getattr(model, attr_name, None)
-            
-            item[header] = value
+            # Get the field value, handling nested fields with dots
+            item[header] = _get_field(model, attr_name)
         data.append(item)
     
     # Generate CSV from the data
-    return await generate_csv_from_data(data, headers, filename) 
\ No newline at end of file
+    return await generate_csv_from_data(data, headers, filename)
+
+async def stream_csv(
+    models: AsyncIterator[Any],
+    headers: List[str],
+    field_mapping: Optional[Dict[str, str]] = None,
+    chunk_size: int = CSV_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Encode rows from an async iterator as CSV, yielding UTF-8 chunks of about
+    chunk_size bytes so memory stays constant regardless of the number of rows.
+    """
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(headers)
+    
+    async for model in models:
+        row = []
+        for header in headers:
+            attr_name = field_mapping.get(header, header) if field_mapping else header
+            row.append(_format_csv_value(_get_field(model, attr_name)))
+        writer.writerow(row)
+        
+        if output.tell() >= chunk_size:
+            yield output.getvalue().encode("utf-8")
+            output.seek(0)
+            output.truncate(0)
+    
+    if output.tell():
+        yield output.getvalue().encode("utf-8")
+    output.close()
+
+def generate_streaming_csv(
+    models: AsyncIterator[Any],
+    headers: List[str],
+    field_mapping: Optional[Dict[str, str]] = None,
+    filename: str = "export.csv"
+) -> StreamingResponse:
+    """
+    Stream a CSV file built from an async iterator of models (e.g. a MongoDB cursor)
+    
+    Args:
+        models: Async iterator of MongoDB documents or model instances
+        headers: List of header names to include in the CSV
+        field_mapping: Optional mapping from header names to model fields
+        filename: Name of the CSV file to be downloaded
+        
+    Returns:
+        StreamingResponse: A FastAPI StreamingResponse writing rows as they are read
+    """
+    return StreamingResponse(
+        stream_csv(models, headers, field_mapping),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
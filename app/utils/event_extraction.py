@@ -0,0 +1,120 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.schemas.event import AIEventExtraction
+
+EVENT_EXTRACTION_PROMPT = """
+        You are an AI assistant that extracts event information from emails.
+        Extract the following fields from the email text:
+        - event_name: Name of the event
+        - description: Description of the event
+        - event_date: Date of the event in YYYY-MM-DD format
+        - location: Location where the event will be held
+        - institute_name: Name of the institute/organization hosting the event
+        - contact_name: Name of the contact person
+        - contact_number: Phone number of the contact person
+        - email: Email address for contact
+        - website: Website of the event or institute (as a valid URL)
+        - expected_audience: Expected number of attendees as a number
+        - is_paid_event: Whether it's a paid event (true or false)
+        - fees: Fee amount if it's a paid event as a number
+        - payment_status: Current payment status
+        - travel_accomodation: Travel and accommodation details
+        - status: Current status of the event planning
+        
+        For each field, provide the extracted value or null if you can't extract it
+        
+        Respond with a JSON object that follows the specified schema.
+        """
+
+# Tokens budgeted for the structured reply on top of the request
+EXTRACTION_REPLY_TOKENS = 1000
+
+
+def extraction_text(email: Dict[str, Any]) -> Optional[str]:
+    """The text sent to the model for an email, or None if it has no body."""
+    # Get the email body (plain text preferred, fallback to HTML)
+    email_text = email.get("body") if email.get("body") else email.get("html_body")
+    if not email_text:
+        return None
+    return f"Email subject: {email.get('subject')}\nEmail text: {email_text}"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of an extraction call (~4 characters per token)."""
+    return (len(EVENT_EXTRACTION_PROMPT) + len(text)) // 4 + EXTRACTION_REPLY_TOKENS
+
+
+class TokenRateLimiter:
+    """
+    Token bucket over model tokens per minute. acquire() waits until the
+    estimated tokens of a call fit in the budget, which refills continuously.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        # A single call larger than the whole budget waits for a full bucket
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+async def extract_event(
+    gpt,
+    text: str,
+    tenant_id: Optional[str] = None,
+    before_request: Callable[[], Awaitable[None]] = None
+) -> Dict[str, Any]:
+    """
+    Run the event extraction of one email text through the model, awaiting
+    before_request before every request it sends (retries and hedges included).
+    """
+    return await gpt.send_text(
+        text=text,
+        prompt=EVENT_EXTRACTION_PROMPT,
+        model=AIEventExtraction,
+        tenant_id=tenant_id,
+        before_request=before_request
+    )
+
+
+async def extract_events(
+    gpt,
+    emails: List[Dict[str, Any]],
+    concurrency: int,
+    tokens_per_minute: int
+) -> Dict[str, Any]:
+    """
+    Extract events from many emails concurrently, with at most concurrency
+    calls in flight and within tokens_per_minute. Every request sent to the
+    model is charged to the budget, so retries and hedges count too.
+
+    Returns:
+        Dict of email id -> extraction, or the exception its call raised
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = TokenRateLimiter(tokens_per_minute)
+
+    async def extract(email):
+        text = extraction_text(email)
+        if not text:
+            raise ValueError("No email body content available for extraction")
+        tokens = estimate_tokens(text)
+        async with semaphore:
+            return await extract_event(gpt, text, email.get("tenant_id"), lambda: limiter.acquire(tokens))
+
+    results = await asyncio.gather(*(extract(email) for email in emails), return_exceptions=True)
+    return {email["_id"]: result for email, result in zip(emails, results)}
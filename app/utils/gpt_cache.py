@@ -0,0 +1,149 @@
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import redis.asyncio as aioredis
+from pydantic import BaseModel
+from app.core.config import GPT_CACHE_TTL_SECONDS, GPT_CACHE_MAX_ENTRIES, GPT_CACHE_REDIS_URL
+
+# Bump when prompts or parsing change in a way that makes stored replies stale
+# (2: replies that didn't parse were cached by version 1)
+GPT_CACHE_VERSION = "2"
+GPT_CACHE_REDIS_PREFIX = "gpt-cache:"
+
+# After a Redis error the tier is skipped for this long instead of timing out on every call
+REDIS_RETRY_AFTER_SECONDS = 60
+
+
+def _describe_response_format(response_format: Any) -> Any:
+    if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+        return response_format.model_json_schema()
+    return response_format
+
+
+def is_cacheable_reply(content: Optional[str], response_format: Any = None) -> bool:
+    """
+    Whether a reply is worth reusing: it parses as JSON and, with a response
+    model, validates against it. Truncated, refused or empty replies are not.
+    """
+    if content is None:
+        return False
+    try:
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            response_format.model_validate_json(content)
+        else:
+            json.loads(content)
+    except ValueError:
+        return False
+    return True
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], response_format: Any = None, **options) -> str:
+    """
+    SHA-256 over everything that determines a completion: the model, the
+    messages (prompt, text and base64 image data included) and the reply format.
+    """
+    encoded = json.dumps(
+        {
+            "version": GPT_CACHE_VERSION,
+            "model": model,
+            "messages": messages,
+            "response_format": _describe_response_format(response_format),
+            "options": options
+        },
+        sort_keys=True
+    ).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class GPTResponseCache:
+    """
+    Two-tier cache of model replies (the raw message content).
+
+    An in-process LRU of max_entries answers repeats within a worker; Redis,
+    when redis_url is set, shares replies between workers and restarts. Both
+    tiers expire entries after ttl_seconds, and a Redis hit is copied into the
+    LRU. Redis being down only costs the misses.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, redis_url: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis = None
+        self._redis_loop = None
+        self._redis_down_until = 0.0
+        self.counters = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def _redis_client(self):
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        # redis.asyncio connections belong to the loop they were opened on
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+            self._redis_loop = loop
+        return self._redis
+
+    def _redis_failed(self, e: Exception) -> None:
+        print(f"GPT cache: Redis unavailable, skipping it for {REDIS_RETRY_AFTER_SECONDS}s: {str(e)}")
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+
+    def _remember(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return value
+            del self._entries[key]
+
+        redis = self._redis_client()
+        if redis is not None:
+            try:
+                value = await redis.get(GPT_CACHE_REDIS_PREFIX + key)
+            except Exception as e:
+                self._redis_failed(e)
+                value = None
+            if value is not None:
+                value = value.decode("utf-8")
+                self._remember(key, value)
+                self.counters["redis_hits"] += 1
+                return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Optional[str]) -> None:
+        if value is None:
+            return
+        self._remember(key, value)
+        redis = self._redis_client()
+        if redis is not None:
+            encoded = value.encode("utf-8")
+            try:
+                await redis.set(GPT_CACHE_REDIS_PREFIX + key, encoded, ex=self.ttl_seconds)
+            except Exception as e:
+                self._redis_failed(e)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counters["memory_hits"] + self.counters["redis_hits"]
+        total = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": hits / total if total else 0.0
+        }
+
+
+gpt_cache = GPTResponseCache(GPT_CACHE_TTL_SECONDS, GPT_CACHE_MAX_ENTRIES, GPT_CACHE_REDIS_URL)
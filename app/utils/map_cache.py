@@ -0,0 +1,191 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+import httpx
+import requests
+import urllib.parse
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from PIL import Image, ImageDraw
+from app.core.config import Google_maps_key, MAP_CACHE_DIR, MAP_CACHE_TTL_SECONDS, MAP_CACHE_MAX_BYTES, MAP_PROVIDER
+
+STATIC_MAPS_URL = "https://maps.googleapis.com/maps/api/staticmap"
+
+# Bump when the map post-processing changes so stale processed images are not served
+MAP_PROCESSING_VERSION = "1"
+
+
+class GoogleStaticMapProvider:
+    """Fetches map images from the Google Static Maps API."""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def url(self, params: Dict[str, str]) -> str:
+        query = urllib.parse.urlencode({**params, "key": self.api_key})
+        return f"{STATIC_MAPS_URL}?{query}"
+
+    def fetch_sync(self, params: Dict[str, str]) -> bytes:
+        response = requests.get(self.url(params))
+        response.raise_for_status()
+        return response.content
+
+    async def fetch(self, params: Dict[str, str], client: Optional[httpx.AsyncClient] = None) -> bytes:
+        if client is None:
+            async with httpx.AsyncClient() as own_client:
+                return await self.fetch(params, own_client)
+        response = await client.get(self.url(params))
+        response.raise_for_status()
+        return response.content
+
+
+class StubMapProvider:
+    """
+    Offline provider for tests and local development. Draws a flat image of the
+    requested size whose colour is derived from the center, with a dot when a
+    marker is requested, so no network access or API key is needed.
+    """
+
+    def fetch_sync(self, params: Dict[str, str]) -> bytes:
+        width, height = (int(v) for v in params.get("size", "600x400").split("x"))
+        digest = hashlib.sha256(params.get("center", "").encode("utf-8")).digest()
+        image = Image.new("RGB", (width, height), color=(digest[0], digest[1], digest[2]))
+        if params.get("markers"):
+            draw = ImageDraw.Draw(image)
+            draw.ellipse((width // 2 - 6, height // 2 - 6, width // 2 + 6, height // 2 + 6), fill=(255, 0, 0))
+        out_io = BytesIO()
+        image.save(out_io, format="PNG")
+        return out_io.getvalue()
+
+    async def fetch(self, params: Dict[str, str], client: Optional[httpx.AsyncClient] = None) -> bytes:
+        return self.fetch_sync(params)
+
+
+def get_map_provider(name: str):
+    if name == "stub":
+        return StubMapProvider()
+    return GoogleStaticMapProvider(Google_maps_key)
+
+
+def _normalize(value: str) -> str:
+    return " ".join(str(value).lower().split())
+
+
+class MapCache:
+    """
+    Persistent cache of processed static map images.
+
+    Entries are keyed by the normalized map parameters (center, zoom, size,
+    maptype, markers) and hold the image *after* processing, so hits skip both
+    the API call and the Pillow work. Each file's mtime records when it was
+    fetched (for the TTL) and its atime when it was last used (for LRU eviction
+    once the directory grows past max_bytes).
+    """
+
+    def __init__(self, provider, cache_dir: str, ttl_seconds: int, max_bytes: int):
+        self.provider = provider
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def cache_key(params: Dict[str, str]) -> str:
+        normalized = {name: _normalize(value) for name, value in params.items() if name != "key"}
+        normalized["version"] = MAP_PROCESSING_VERSION
+        encoded = json.dumps(normalized, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, params: Dict[str, str]) -> Path:
+        return self.cache_dir / f"{self.cache_key(params)}.png"
+
+    def _read(self, path: Path) -> Optional[bytes]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+
+        if time.time() - stat.st_mtime > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Record the hit in atime, leaving mtime (fetch time) untouched
+        os.utime(path, (time.time(), stat.st_mtime))
+        return data
+
+    def _write(self, path: Path, data: bytes) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove expired maps, then least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".png"):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime > self.ttl_seconds:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for atime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def get_sync(self, params: Dict[str, str], process: Callable[[bytes], BytesIO]) -> BytesIO:
+        """Return the processed map for params, fetching and processing it on a miss."""
+        path = self._path(params)
+        data = self._read(path)
+        if data is None:
+            data = process(self.provider.fetch_sync(params)).getvalue()
+            self._write(path, data)
+        return BytesIO(data)
+
+    async def get(
+        self,
+        params: Dict[str, str],
+        process: Callable[[bytes], BytesIO],
+        client: Optional[httpx.AsyncClient] = None,
+        executor=None
+    ) -> BytesIO:
+        """
+        Async variant of get_sync. Disk access and processing run in executor
+        (the default thread pool if None); the fetch can share an httpx client.
+        """
+        loop = asyncio.get_running_loop()
+        path = self._path(params)
+        data = await loop.run_in_executor(executor, self._read, path)
+        if data is None:
+            raw = await self.provider.fetch(params, client)
+            processed = await loop.run_in_executor(executor, process, raw)
+            data = processed.getvalue()
+            await loop.run_in_executor(executor, self._write, path, data)
+        return BytesIO(data)
+
+
+map_cache = MapCache(get_map_provider(MAP_PROVIDER), MAP_CACHE_DIR, MAP_CACHE_TTL_SECONDS, MAP_CACHE_MAX_BYTES)
@@ -1,9 +1,21 @@
 
 import json
+import random
+import contextlib
+from typing import Awaitable, Callable, Dict, Optional
 from fastapi import HTTPException
-from app.core.config import OPENAI_API_KEY
-import json
-import aiohttp
+from app.core.config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_TIMEOUT_SECONDS,
+    OPENAI_MAX_RETRIES,
+    OPENAI_HEDGE_AFTER_SECONDS,
+    OPENAI_TENANT_CONCURRENCY,
+    GPT_BACKEND
+)
+import httpx
+import openai
 import re
 import aiofiles
 import base64
@@ -13,23 +25,227 @@ from fastapi.exceptions import HTTPException
 from app.utils.image_encoder import image_encoder
 from pathlib import Path
 from pydantic import BaseModel
+from app.utils.gpt_cache import GPTResponseCache, gpt_cache, cache_key, is_cacheable_reply
+
+# Backoff before retry n is uniform in [0, min(cap, base * 2**n)) ("full jitter")
+RETRY_BACKOFF_BASE_SECONDS = 0.5
+RETRY_BACKOFF_CAP_SECONDS = 20.0
+
+
+def _is_retryable(e: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth another try."""
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def _retry_delay(attempt: int, e: Exception) -> float:
+    # Honour the server's Retry-After on 429s when it sends one
+    response = getattr(e, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_BACKOFF_CAP_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_BACKOFF_CAP_SECONDS, RETRY_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+@contextlib.asynccontextmanager
+async def _admit_always():
+    yield
+
+
+class OpenAIChatBackend:
+    """
+    Chat completions through the OpenAI API.
+
+    Retries rate limits, 5xx, timeouts and connection errors up to
+    max_retries times with jittered exponential backoff (the SDK's own
+    retries are turned off). With hedge_after set, a request still running
+    after that many seconds gets a duplicate and whichever answers first wins.
+
+    Every request sent, retries and hedges included, runs inside admit()
+    (e.g. a tenant's concurrency slot); backoff sleeps run outside it.
+    """
+
+    def __init__(
+        self,
+        get_client: Callable[[], AsyncOpenAI],
+        max_retries: int = OPENAI_MAX_RETRIES,
+        hedge_after: Optional[float] = OPENAI_HEDGE_AFTER_SECONDS
+    ):
+        self.get_client = get_client
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+
+    async def _request(self, model: str, messages: list, response_format, max_tokens: int = None) -> str:
+        options = {"max_tokens": max_tokens} if max_tokens else {}
+        response = await self.get_client().beta.chat.completions.parse(
+            messages=messages,
+            model=model,
+            response_format=response_format,
+            **options
+        )
+        response = response.to_dict()
+        return response['choices'][0]['message']['content']
+
+    async def _admitted_request(self, admit, *args) -> str:
+        async with admit():
+            return await self._request(*args)
+
+    async def _hedged_request(self, admit, *args) -> str:
+        if not self.hedge_after:
+            return await self._admitted_request(admit, *args)
+
+        first = asyncio.ensure_future(self._admitted_request(admit, *args))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(self._admitted_request(admit, *args))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both failed: surface the original request's error
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def complete(self, model: str, messages: list, response_format, max_tokens: int = None, admit=_admit_always) -> str:
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_request(admit, model, messages, response_format, max_tokens)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                delay = _retry_delay(attempt, e)
+                print(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+class FakeChatBackend:
+    """
+    Offline backend for tests and local development. Replies with the
+    defaults of the response model (an empty JSON object without one) and
+    counts its calls, so no network access or API key is needed.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, model: str, messages: list, response_format, max_tokens: int = None, admit=_admit_always) -> str:
+        async with admit():
+            self.calls += 1
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            try:
+                return response_format().model_dump_json()
+            except Exception:
+                # The model has required fields
+                pass
+        return "{}"
+
+def get_chat_backend(name: str, get_client: Callable[[], AsyncOpenAI]):
+    if name == "fake":
+        return FakeChatBackend()
+    return OpenAIChatBackend(get_client)
+
+class TenantQuotas:
+    """At most `limit` model calls in flight per tenant, so one tenant's burst can't take every connection."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, tenant_id: Optional[str]):
+        if not tenant_id or not self.limit:
+            yield
+            return
+        semaphore = self._semaphores.setdefault(tenant_id, asyncio.Semaphore(self.limit))
+        async with semaphore:
+            yield
 
 class GPT():
-    def __init__(self,API_KEY : str,model : str,voice_model : str):
-        self.client = AsyncOpenAI(api_key=API_KEY)
+    def __init__(self,API_KEY : str,model : str,voice_model : str, backend = None, cache: GPTResponseCache = gpt_cache):
         self.model = model
         self.__API_KEY = API_KEY
         self.voice_model = voice_model
-        self.http_client = None  # Will initialize later
+        # Created on first use and shared by every call until close()
+        self._client: Optional[AsyncOpenAI] = None
+        self.backend = backend or get_chat_backend(GPT_BACKEND, lambda: self.client)
+        # Replies to identical requests are reused; None disables caching
+        self.cache = cache
+        self.quotas = TenantQuotas(OPENAI_TENANT_CONCURRENCY)
 
-    async def get_http_client(self):
-        if self.http_client is None or self.http_client.closed:
-            self.http_client = aiohttp.ClientSession()
-        return self.http_client
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.__API_KEY,
+                base_url=OPENAI_BASE_URL,
+                # Retries are done by OpenAIChatBackend, with jitter
+                max_retries=0,
+                timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=10.0),
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+                    )
+                )
+            )
+        return self._client
+
+    async def close(self):
+        """Close the connection pool (e.g. on shutdown); the next call opens a new one."""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.close()
+
+    async def _complete(
+        self,
+        messages: list,
+        response_format,
+        max_tokens: int = None,
+        tenant_id: str = None,
+        before_request: Callable[[], Awaitable[None]] = None
+    ) -> str:
+        """
+        Message content of a completion, served from the cache when the same
+        request was made before. Only replies that parse are cached.
+
+        Every request that reaches the model, retries and hedges included,
+        first awaits before_request (e.g. a token rate limiter) and then holds
+        one of tenant_id's concurrency slots while it is in flight.
+        """
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.model, messages, response_format, max_tokens=max_tokens)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
 
-    async def send_text(self,text : str,prompt : str, model : BaseModel = None):
+        @contextlib.asynccontextmanager
+        async def admit():
+            if before_request is not None:
+                await before_request()
+            async with self.quotas.slot(tenant_id):
+                yield
+
+        content = await self.backend.complete(self.model, messages, response_format, max_tokens, admit=admit)
+        if key is not None and is_cacheable_reply(content, response_format):
+            await self.cache.set(key, content)
+        return content
+
+    async def send_text(self,text : str,prompt : str, model : BaseModel = None, tenant_id: str = None, before_request: Callable[[], Awaitable[None]] = None):
         try:
-            response = await self.client.beta.chat.completions.parse(
+            content = await self._complete(
             messages=[
                 {"role": "system", "content": "You are a helpful assistant designed to output JSON."},
                 {
@@ -37,19 +253,19 @@ class GPT():
                     "content": f"{prompt}.text - {text}",
                 }
             ],
-            model=self.model,
             max_tokens=16384,
-            response_format=model if model else {"type": "json_object" }
+            response_format=model if model else {"type": "json_object" },
+            tenant_id=tenant_id,
+            before_request=before_request
             )
         except Exception as e:
             print(e)
             raise HTTPException(status_code=500,detail=str(e))
-        response = response.to_dict()
 
-        return json.loads(response['choices'][0]['message']['content'])
+        return json.loads(content)
 
         
-    async def send_image(self, image_path: str, prompt: str,response_model:BaseModel = None):
+    async def send_image(self, image_path: str, prompt: str,response_model:BaseModel = None, tenant_id: str = None):
 
         try:
             encoded_image = None
@@ -60,8 +276,7 @@ class GPT():
             if not encoded_image:
                 raise HTTPException(status_code=500, detail="Error encoding image")
 
-            response_data = await self.client.beta.chat.completions.parse(
-                model=self.model,
+            content = await self._complete(
                 messages=[
                     {
                         "role": "system",
@@ -83,10 +298,10 @@ class GPT():
                 ],
                 max_tokens=16384,
                 response_format=response_model if response_model else {"type": "json_object"},
+                tenant_id=tenant_id
             )
 
-            response_data = response_data.to_dict()
-            return json.loads(response_data["choices"][0]["message"]["content"])
+            return json.loads(content)
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
@@ -94,12 +309,14 @@ class GPT():
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
-    async def send_images(self, image_paths: list[str], prompt: str, response_model:BaseModel = None):
+    async def send_images(self, image_paths: list[str] = None, prompt: str = "", response_model:BaseModel = None, images: list[bytes] = None, tenant_id: str = None):
+        """Send images from disk (image_paths) and/or in-memory JPEG bytes (images) with the prompt."""
         try:
             encoded_images = []
-            encoding_task = [image_encoder(image_path) for image_path in image_paths]
+            encoding_task = [image_encoder(image_path) for image_path in image_paths or []]
 
             encoded_images = await asyncio.gather(*encoding_task)
+            encoded_images.extend(base64.b64encode(image).decode("utf-8") for image in images or [])
             content = [{"type": "text", "text": f"{prompt}"}]
 
             for encoded_image in encoded_images:
@@ -113,15 +330,12 @@ class GPT():
                     }
                 )
 
-            response_data = await self.client.beta.chat.completions.parse(
-                model=self.model,
+            return await self._complete(
                 messages=[{"role": "user", "content": content}],
                 response_format= response_model if response_model else {"type": "json_object"},
+                tenant_id=tenant_id
             )
 
-            response_data = response_data.to_dict()
-            return response_data["choices"][0]["message"]["content"]
-
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
         
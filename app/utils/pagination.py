@@ -0,0 +1,108 @@
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+
+# Response header carrying the cursor of the next page on list endpoints
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# Order of listings that don't ask for one: oldest first. _id alone is no
+# order at all, since ids are random uuid4 strings
+DEFAULT_SORT = [("created_at", 1), ("_id", 1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def keyset_sort(sort) -> List[Tuple[str, int]]:
+    """
+    Normalize a sort spec (list of pairs or dict), falling back to DEFAULT_SORT,
+    and append _id as a tie-breaker so every document has a unique position to
+    resume from.
+    """
+    if isinstance(sort, dict):
+        sort = list(sort.items())
+    sort = list(sort or DEFAULT_SORT)
+    if not any(field == "_id" for field, _ in sort):
+        sort.append(("_id", 1))
+    return sort
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    """
+    Match the documents that come strictly after `values` in `sort` order:
+    (a > x) or (a == x and b > y) or ..., flipping $gt to $lt for descending keys.
+
+    MongoDB sorts null and missing values before everything else, so after a
+    null comes any value when ascending and nothing when descending, and after
+    a value comes null when descending.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        value = values[i]
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        if value is None:
+            if direction != 1:
+                continue
+            clause[field] = {"$ne": None}
+        elif direction == 1:
+            clause[field] = {"$gt": value}
+        else:
+            clause["$or"] = [{field: {"$lt": value}}, {field: None}]
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def paginate_query(query: Dict[str, Any], sort, after: Optional[List[Any]] = None):
+    """
+    Return (query, sort) for a keyset page: the sort gets its _id tie-breaker and,
+    when resuming from a cursor, the query is restricted to documents after it.
+    """
+    sort = keyset_sort(sort)
+    if after is not None:
+        if len(after) != len(sort):
+            raise InvalidCursor("Cursor does not match the requested sort")
+        query = {"$and": [query, keyset_filter(sort, after)]}
+    return query, sort
+
+
+def _field_value(doc: Dict[str, Any], field: str) -> Any:
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def encode_cursor(doc: Dict[str, Any], sort: List[Tuple[str, int]]) -> str:
+    """Opaque cursor holding the sort key values of doc."""
+    values = [_field_value(doc, field) for field, _ in sort]
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(values, list):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def next_cursor(docs: List[Dict[str, Any]], sort, limit: int) -> Optional[str]:
+    """Cursor of the page after docs, or None when docs was the last page."""
+    if not docs or len(docs) < limit:
+        return None
+    return encode_cursor(docs[-1], keyset_sort(sort))
+
+
+def set_next_cursor(response, docs: List[Dict[str, Any]], sort, limit: int) -> None:
+    """Expose the cursor of the next page in the X-Next-Cursor response header."""
+    cursor = next_cursor(docs, sort, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,208 @@
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional
+from app.core.config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES, PDF_CACHE_S3_BUCKET
+from app.utils.pdf_generator import render_event_pdf
+from app.utils.s3 import s3_pool
+
+# Event fields that end up on the brochure; anything else can change without a re-render
+PDF_EVENT_FIELDS = ("event_name", "institute_name", "event_date", "description", "location")
+
+# Bump when the brochure layout changes so previously cached PDFs are not served
+PDF_LAYOUT_VERSION = "1"
+
+# Size of the reads when streaming a cached PDF to the client
+PDF_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def iter_file(file: BinaryIO, chunk_size: int = PDF_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Read an open file in chunks for a StreamingResponse, closing it at the end."""
+    try:
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+class PdfCache:
+    """
+    Content-addressed cache of rendered event brochures.
+
+    PDFs are stored on local disk as "<event_id>_<hash>.pdf" where the hash covers
+    the event fields used by generate_event_pdf plus the attachment URL list.
+    The directory is kept under max_bytes by evicting the least recently used
+    files (by mtime, which is bumped on every hit). If an S3 bucket is
+    configured, rendered PDFs are also stored there and used to refill the
+    local disk on a miss.
+
+    Hits are returned as open files, so eviction or invalidation unlinking
+    the PDF while it is being sent doesn't cut the response short.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, s3_bucket: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.s3_bucket = s3_bucket
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Requests holding or waiting on each lock; it is dropped when the last one leaves
+        self._lock_users: Dict[str, int] = {}
+
+    @staticmethod
+    def cache_key(event: dict, attachments: list) -> str:
+        payload = {field: event.get(field) for field in PDF_EVENT_FIELDS}
+        payload["attachments"] = list(attachments)
+        payload["version"] = PDF_LAYOUT_VERSION
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, event_id: str, key: str) -> Path:
+        return self.cache_dir / f"{event_id}_{key}.pdf"
+
+    def _s3_key(self, event_id: str, key: str) -> str:
+        return f"pdf-cache/{event_id}/{key}.pdf"
+
+    def _open(self, path: Path) -> Optional[BinaryIO]:
+        """Open a cached PDF and mark it as recently used, or None if it isn't cached."""
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(file.fileno())
+        except OSError:
+            pass
+        return file
+
+    def _tmp_path(self) -> Path:
+        # Unique per call, so concurrent writers never share a temporary file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        return Path(tmp_path)
+
+    def _evict(self) -> None:
+        """Remove least recently used PDFs until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".pdf"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    async def _fetch_from_s3(self, event_id: str, key: str, path: Path) -> bool:
+        try:
+            async with s3_pool.client() as s3:
+                response = await s3.get_object(Bucket=self.s3_bucket, Key=self._s3_key(event_id, key))
+                async with response["Body"] as stream:
+                    data = await stream.read()
+        except Exception:
+            return False
+
+        tmp_path = self._tmp_path()
+        try:
+            await asyncio.to_thread(tmp_path.write_bytes, data)
+            os.replace(tmp_path, path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return True
+
+    async def _store_in_s3(self, event_id: str, key: str, path: Path) -> None:
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+            async with s3_pool.client() as s3:
+                await s3.put_object(
+                    Bucket=self.s3_bucket,
+                    Key=self._s3_key(event_id, key),
+                    Body=data,
+                    ContentType="application/pdf"
+                )
+        except Exception as e:
+            print(f"Error storing brochure PDF in S3 cache: {str(e)}")
+
+    async def get_or_render(self, event: dict, attachments: list) -> BinaryIO:
+        """
+        Return the brochure PDF for the event as an open file, rendering it
+        only when neither the local disk nor the S3 tier has it. The caller
+        closes the file (iter_file does once it has been read).
+        """
+        event_id = str(event["_id"])
+        key = self.cache_key(event, attachments)
+        path = self._path(event_id, key)
+
+        file = await asyncio.to_thread(self._open, path)
+        if file is not None:
+            return file
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                # Another request may have rendered it while we waited
+                file = await asyncio.to_thread(self._open, path)
+                if file is not None:
+                    return file
+
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+                if not (self.s3_bucket and await self._fetch_from_s3(event_id, key, path)):
+                    tmp_path = self._tmp_path()
+                    try:
+                        await render_event_pdf(event, attachments, str(tmp_path))
+                        if self.s3_bucket:
+                            await self._store_in_s3(event_id, key, tmp_path)
+                        os.replace(tmp_path, path)
+                    except Exception:
+                        tmp_path.unlink(missing_ok=True)
+                        raise
+
+                # Opened before evicting, which may pick this very file
+                file = open(path, "rb")
+                await asyncio.to_thread(self._evict)
+                return file
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                self._locks.pop(key, None)
+
+    async def invalidate(self, event_id: str) -> None:
+        """Drop every cached brochure of an event, locally and in S3."""
+        event_id = str(event_id)
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob(f"{event_id}_*.pdf"):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+        if self.s3_bucket:
+            try:
+                async with s3_pool.client() as s3:
+                    response = await s3.list_objects_v2(Bucket=self.s3_bucket, Prefix=f"pdf-cache/{event_id}/")
+                    objects = [{"Key": obj["Key"]} for obj in response.get("Contents", [])]
+                    if objects:
+                        await s3.delete_objects(Bucket=self.s3_bucket, Delete={"Objects": objects})
+            except Exception as e:
+                print(f"Error invalidating brochure PDFs in S3 cache: {str(e)}")
+
+
+pdf_cache = PdfCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES, PDF_CACHE_S3_BUCKET)
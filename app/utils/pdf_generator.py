@@ -1,7 +1,10 @@
 import os
+import asyncio
+import httpx
 import requests
-import urllib.parse
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from PIL import Image, ImageDraw
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
@@ -12,7 +15,7 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import Paragraph
 from reportlab.lib.styles import ParagraphStyle
-from app.core.config import Google_maps_key
+from app.utils.map_cache import map_cache
 from pathlib import Path
 
 
@@ -25,16 +28,23 @@ black_font_path = base_dir / "fonts" / "Poppins-SemiBold.ttf"
 pdfmetrics.registerFont(TTFont("Poppins-SemiBold", str(semibold_font_path)))
 pdfmetrics.registerFont(TTFont("Poppins-Regular", str(black_font_path)))
 
+# Bounds for the prefetch stage of generate_event_pdf
+IMAGE_FETCH_CONCURRENCY = 8
+IMAGE_FETCH_TIMEOUT = 20.0
+image_executor = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 2))
+
 def download_image(url: str) -> BytesIO:
     response = requests.get(url)
     response.raise_for_status()
     return BytesIO(response.content)
 
-def crop_image_to_fit(image_data: BytesIO, target_width: int, target_height: int) -> BytesIO:
-    """
-    Open the image, center-crop it to match target aspect ratio, then resize using LANCZOS.
-    """
-    image = Image.open(image_data)
+def _to_png(image: Image.Image) -> BytesIO:
+    out_io = BytesIO()
+    image.save(out_io, format="PNG")
+    out_io.seek(0)
+    return out_io
+
+def _fit_image(image: Image.Image, target_width: int, target_height: int) -> Image.Image:
     img_width, img_height = image.size
     target_ratio = target_width / target_height
     img_ratio = img_width / img_height
@@ -48,17 +58,10 @@ def crop_image_to_fit(image_data: BytesIO, target_width: int, target_height: int
         top = (img_height - new_height) // 2
         box = (0, top, img_width, top + new_height)
     cropped = image.crop(box)
-    resized = cropped.resize((target_width, target_height), resample=Image.Resampling.LANCZOS)
-    out_io = BytesIO()
-    resized.save(out_io, format="PNG")
-    out_io.seek(0)
-    return out_io
+    return cropped.resize((target_width, target_height), resample=Image.Resampling.LANCZOS)
 
-def apply_fade_bottom(image_io: BytesIO, fade_height: int = 100) -> BytesIO:
-    """
-    Applies a fade-out effect at the bottom of the image.
-    """
-    image = Image.open(image_io).convert("RGBA")
+def _fade_bottom(image: Image.Image, fade_height: int = 100) -> Image.Image:
+    image = image.convert("RGBA")
     width, height = image.size
 
     gradient = Image.new("L", (1, fade_height), color=0xFF)
@@ -71,76 +74,75 @@ def apply_fade_bottom(image_io: BytesIO, fade_height: int = 100) -> BytesIO:
     alpha_mask.paste(alpha_gradient, (0, height - fade_height))
     
     image.putalpha(alpha_mask)
-    out_io = BytesIO()
-    image.save(out_io, format="PNG")
-    out_io.seek(0)
-    return out_io
+    return image
 
-def crop_image_20px(image_data: BytesIO) -> BytesIO:
-    """
-    Crop 20px from each side of the given image.
-    """
-    image = Image.open(image_data)
+def _crop_20px(image: Image.Image) -> Image.Image:
     width, height = image.size
-    cropped = image.crop((20, 20, width - 20, height - 20))
-    out_io = BytesIO()
-    cropped.save(out_io, format="PNG")
-    out_io.seek(0)
-    return out_io
+    return image.crop((20, 20, width - 20, height - 20))
 
-def apply_rounded_corners(image_data: BytesIO, radius: int = 20) -> BytesIO:
-    """
-    Apply rounded corners to an image with a specified radius.
-    """
-    image = Image.open(image_data).convert("RGBA")
+def _round_corners(image: Image.Image, radius: int = 20) -> Image.Image:
+    image = image.convert("RGBA")
     width, height = image.size
     mask = Image.new("L", (width, height), 0)
     draw = ImageDraw.Draw(mask)
     draw.rounded_rectangle((0, 0, width, height), radius=radius, fill=255)
     image.putalpha(mask)
-    out_io = BytesIO()
-    image.save(out_io, format="PNG")
-    out_io.seek(0)
-    return out_io
+    return image
 
-def get_static_map(location: str) -> BytesIO:
+def crop_image_to_fit(image_data: BytesIO, target_width: int, target_height: int) -> BytesIO:
     """
-    Fetch a satellite view static map image from Google Static Maps API.
+    Open the image, center-crop it to match target aspect ratio, then resize using LANCZOS.
     """
-    api_key = Google_maps_key
-    base_url = "https://maps.googleapis.com/maps/api/staticmap"
-    params = {
+    return _to_png(_fit_image(Image.open(image_data), target_width, target_height))
+
+def apply_fade_bottom(image_io: BytesIO, fade_height: int = 100) -> BytesIO:
+    """
+    Applies a fade-out effect at the bottom of the image.
+    """
+    return _to_png(_fade_bottom(Image.open(image_io), fade_height))
+
+def crop_image_20px(image_data: BytesIO) -> BytesIO:
+    """
+    Crop 20px from each side of the given image.
+    """
+    return _to_png(_crop_20px(Image.open(image_data)))
+
+def apply_rounded_corners(image_data: BytesIO, radius: int = 20) -> BytesIO:
+    """
+    Apply rounded corners to an image with a specified radius.
+    """
+    return _to_png(_round_corners(Image.open(image_data), radius))
+
+def static_map_params(location: str) -> dict:
+    return {
         "center": location,
         "zoom": "13",
         "size": "600x400",
         "maptype": "satellite",
-        "key": api_key,
     }
-    query = urllib.parse.urlencode(params)
-    url = f"{base_url}?{query}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return BytesIO(response.content)
 
-def get_india_map(location: str) -> BytesIO:
-    """
-    Fetch a satellite view static map showing the given location on the scale of India.
-    """
-    api_key = Google_maps_key
-    base_url = "https://maps.googleapis.com/maps/api/staticmap"
-    params = {
+def india_map_params(location: str) -> dict:
+    return {
         "center": "India",
         "zoom": "4",
         "size": "600x400",
         "maptype": "satellite",
-        "key": api_key,
         "markers": f"color:red|{location}"
     }
-    query = urllib.parse.urlencode(params)
-    url = f"{base_url}?{query}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return BytesIO(response.content)
+
+def get_static_map(location: str) -> BytesIO:
+    """
+    Get a satellite view static map of the location, already cropped and rounded
+    for the brochure. Served from map_cache, hitting the map provider only on a miss.
+    """
+    return map_cache.get_sync(static_map_params(location), prepare_map_image)
+
+def get_india_map(location: str) -> BytesIO:
+    """
+    Get a satellite view static map showing the given location on the scale of India,
+    already cropped and rounded for the brochure. Served from map_cache.
+    """
+    return map_cache.get_sync(india_map_params(location), prepare_map_image)
 
 def filter_image_links(attachments: list) -> list:
     allowed_extensions = (".png", ".jpg", ".jpeg", ".gif")
@@ -160,9 +162,164 @@ detail_style = ParagraphStyle(
     textColor=black,
 )
 
-def generate_event_pdf(event: dict, attachments: list, output):
+def gallery_layout(gallery_images: list, page_width: float, page_height: float) -> list:
+    """
+    Split gallery images into pages of up to five and compute where each one goes.
+
+    Returns a list of pages, each a list of (url, x, y, width, height, error_x, error_y)
+    slots, where error_x/error_y is where "Error" is written if the image fails.
+    """
+    pages = []
+    num_images = len(gallery_images)
+    index = 0
+    while index < num_images:
+        remaining = num_images - index
+        group_size = 5 if remaining >= 5 else remaining
+        group = gallery_images[index:index+group_size]
+        slots = []
+        
+        if group_size == 1:
+            slots.append((group[0], 0, 0, page_width, page_height, 50, page_height/2))
+        elif group_size == 2:
+            for i in range(2):
+                y_pos = page_height/2 if i == 0 else 0
+                slots.append((group[i], 0, y_pos, page_width, page_height/2, 50, page_height/2 if i==0 else 50))
+        elif group_size == 3:
+            each_h = page_height / 3
+            for i in range(3):
+                y_pos = page_height - (i+1)*each_h
+                slots.append((group[i], 0, y_pos, page_width, each_h, 50, y_pos + each_h/2))
+        elif group_size == 4:
+            each_w = page_width / 2
+            each_h = page_height / 2
+            positions = [
+                (0, each_h),
+                (each_w, each_h),
+                (0, 0),
+                (each_w, 0)
+            ]
+            for i in range(4):
+                x, y = positions[i]
+                slots.append((group[i], x, y, each_w, each_h, 50, 50))
+        elif group_size == 5:
+            left_width = 0.6 * page_width
+            right_width = 0.4 * page_width
+            each_left_h = page_height / 2
+            for i in range(2):
+                y_pos = page_height - (i+1)*each_left_h
+                slots.append((group[i], 0, y_pos, left_width, each_left_h, 50, y_pos + each_left_h/2))
+            each_right_h = page_height / 3
+            for i in range(3):
+                y_pos = page_height - (i+1)*each_right_h
+                slots.append((group[2+i], left_width, y_pos, right_width, each_right_h, left_width + 50, y_pos + each_right_h/2))
+        
+        pages.append(slots)
+        index += group_size
+    return pages
+
+def prepare_fitted_image(width: int, height: int, data: bytes) -> BytesIO:
+    return _to_png(_fit_image(Image.open(BytesIO(data)), width, height))
+
+def prepare_featured_image(width: int, height: int, data: bytes) -> BytesIO:
+    return _to_png(_fade_bottom(_fit_image(Image.open(BytesIO(data)), width, height), fade_height=100))
+
+def prepare_map_image(data: bytes) -> BytesIO:
+    # Round the map image more (radius=20) than the border drawn around it (radius=12).
+    return _to_png(_round_corners(_crop_20px(Image.open(BytesIO(data))), radius=20))
+
+def _image_jobs(sorted_attachments: list) -> dict:
+    """
+    Map every attachment slot of the brochure to the URL it comes from and the
+    transform that turns the downloaded bytes into a ready PNG buffer.
+    """
+    page_width, page_height = A4
+    jobs = {}
+    
+    if sorted_attachments:
+        jobs["featured"] = (
+            sorted_attachments[0],
+            partial(prepare_featured_image, int(page_width), int(page_height // 2))
+        )
+    
+    for page in gallery_layout(sorted_attachments[1:], page_width, page_height):
+        for url, x, y, width, height, error_x, error_y in page:
+            jobs[(url, int(width), int(height))] = (url, partial(prepare_fitted_image, int(width), int(height)))
+    
+    return jobs
+
+async def _fetch_image(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str) -> bytes:
+    async with semaphore:
+        response = await client.get(url)
+        response.raise_for_status()
+        return response.content
+
+async def prefetch_event_images(event: dict, attachments: list) -> dict:
+    """
+    Download every image the brochure needs (attachments and both static maps)
+    concurrently, then run the Pillow transforms in image_executor. Maps come
+    from map_cache already processed, so only misses are fetched.
+    
+    Returns a dict of slot key -> ready PNG BytesIO, or the exception raised
+    while fetching/processing that slot.
+    """
+    filtered_attachments = filter_image_links(attachments)
+    sorted_attachments = sorted(filtered_attachments) if filtered_attachments else []
+    jobs = _image_jobs(sorted_attachments)
+    
+    # Each distinct URL is downloaded once even if several slots use it
+    urls = list({url for url, transform in jobs.values()})
+    location = event.get("location", "New York")
+    semaphore = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
+    limits = httpx.Limits(max_connections=IMAGE_FETCH_CONCURRENCY)
+    async with httpx.AsyncClient(limits=limits, timeout=IMAGE_FETCH_TIMEOUT, follow_redirects=True) as client:
+        results = await asyncio.gather(
+            map_cache.get(static_map_params(location), prepare_map_image, client, image_executor),
+            map_cache.get(india_map_params(location), prepare_map_image, client, image_executor),
+            *(_fetch_image(client, semaphore, url) for url in urls),
+            return_exceptions=True
+        )
+    prepared = {"static_map": results[0], "india_map": results[1]}
+    downloads = dict(zip(urls, results[2:]))
+    
+    loop = asyncio.get_running_loop()
+    pending = {}
+    for key, (url, transform) in jobs.items():
+        data = downloads[url]
+        if isinstance(data, BaseException):
+            prepared[key] = data
+        else:
+            pending[key] = loop.run_in_executor(image_executor, transform, data)
+    
+    processed = await asyncio.gather(*pending.values(), return_exceptions=True)
+    prepared.update(zip(pending.keys(), processed))
+    return prepared
+
+def _slot_image(images, key, build) -> BytesIO:
+    """
+    Return the ready buffer for a slot, calling build() to fetch and process it
+    inline when generate_event_pdf was called without prefetched images.
+    """
+    if images is None:
+        return build()
+    
+    value = images.get(key)
+    if isinstance(value, BaseException):
+        raise value
+    if value is None:
+        raise ValueError(f"No prefetched image for {key}")
+    value.seek(0)
+    return value
+
+def generate_event_pdf(event: dict, attachments: list, output, images: dict = None):
+    """
+    Lay out the event brochure on the canvas.
+    
+    If images (from prefetch_event_images) is given, every picture is drawn from
+    those ready buffers; otherwise each one is downloaded and processed inline.
+    """
     filtered_attachments = filter_image_links(attachments)
     sorted_attachments = sorted(filtered_attachments) if filtered_attachments else []
+    jobs = _image_jobs(sorted_attachments)
     c = canvas.Canvas(output, pagesize=A4)
     page_width, page_height = A4  # approx 595 x 842 pts
 
@@ -171,10 +328,8 @@ def generate_event_pdf(event: dict, attachments: list, output):
 
     if sorted_attachments:
         try:
-            featured_url = sorted_attachments[0]
-            img_data = download_image(featured_url)
-            cropped_img = crop_image_to_fit(img_data, int(page_width), int(featured_area_height))
-            faded_img = apply_fade_bottom(cropped_img, fade_height=100)
+            featured_url, transform = jobs["featured"]
+            faded_img = _slot_image(images, "featured", lambda: transform(download_image(featured_url).getvalue()))
             featured_image = ImageReader(faded_img)
             c.drawImage(featured_image, 0, page_height - featured_area_height, width=page_width, height=featured_area_height, mask='auto')
         except Exception as e:
@@ -217,10 +372,7 @@ def generate_event_pdf(event: dict, attachments: list, output):
     top_map_x = margin
     top_map_y = bottom_half_height - margin - map_height
     try:
-        map_img_io = get_static_map(event.get("location", "New York"))
-        map_img_io = crop_image_20px(map_img_io)
-        # Round the map image more (radius=20) but draw border with radius=12.
-        map_img_io = apply_rounded_corners(map_img_io, radius=20)
+        map_img_io = _slot_image(images, "static_map", lambda: get_static_map(event.get("location", "New York")))
         map_image = ImageReader(map_img_io)
         c.drawImage(map_image, top_map_x, top_map_y, width=map_width, height=map_height, mask='auto')
         c.setLineWidth(1)
@@ -244,9 +396,7 @@ def generate_event_pdf(event: dict, attachments: list, output):
     bottom_map_x = margin
     bottom_map_y = margin
     try:
-        india_map_io = get_india_map(event.get("location", "New York"))
-        india_map_io = crop_image_20px(india_map_io)
-        india_map_io = apply_rounded_corners(india_map_io, radius=20)
+        india_map_io = _slot_image(images, "india_map", lambda: get_india_map(event.get("location", "New York")))
         india_map_image = ImageReader(india_map_io)
         c.drawImage(india_map_image, bottom_map_x, bottom_map_y, width=map_width, height=map_height, mask='auto')
         c.setLineWidth(1)
@@ -280,93 +430,25 @@ def generate_event_pdf(event: dict, attachments: list, output):
     c.showPage()
 
     # -------- PAGE 2+: Gallery Layout --------
-    gallery_images = sorted_attachments[1:]
-    num_images = len(gallery_images)
-    index = 0
-    while index < num_images:
-        remaining = num_images - index
-        group_size = 5 if remaining >= 5 else remaining
-        group = gallery_images[index:index+group_size]
-        
-        if group_size == 1:
+    for page in gallery_layout(sorted_attachments[1:], page_width, page_height):
+        for url, x, y, width, height, error_x, error_y in page:
+            key = (url, int(width), int(height))
+            transform = jobs[key][1]
             try:
-                img_io = download_image(group[0])
-                cropped = crop_image_to_fit(img_io, int(page_width), int(page_height))
+                cropped = _slot_image(images, key, lambda: transform(download_image(url).getvalue()))
                 img_reader = ImageReader(cropped)
-                c.drawImage(img_reader, 0, 0, width=page_width, height=page_height, mask='auto')
+                c.drawImage(img_reader, x, y, width=width, height=height, mask='auto')
             except Exception as e:
                 c.setFillColor(black)
-                c.drawString(50, page_height/2, "Error")
-        elif group_size == 2:
-            for i in range(2):
-                try:
-                    img_io = download_image(group[i])
-                    cropped = crop_image_to_fit(img_io, int(page_width), int(page_height/2))
-                    img_reader = ImageReader(cropped)
-                    y_pos = page_height/2 if i == 0 else 0
-                    c.drawImage(img_reader, 0, y_pos, width=page_width, height=page_height/2, mask='auto')
-                except Exception as e:
-                    c.setFillColor(black)
-                    c.drawString(50, page_height/2 if i==0 else 50, "Error")
-        elif group_size == 3:
-            each_h = page_height / 3
-            for i in range(3):
-                try:
-                    img_io = download_image(group[i])
-                    cropped = crop_image_to_fit(img_io, int(page_width), int(each_h))
-                    img_reader = ImageReader(cropped)
-                    y_pos = page_height - (i+1)*each_h
-                    c.drawImage(img_reader, 0, y_pos, width=page_width, height=each_h, mask='auto')
-                except Exception as e:
-                    c.setFillColor(black)
-                    c.drawString(50, page_height - (i+1)*each_h + each_h/2, "Error")
-        elif group_size == 4:
-            each_w = page_width / 2
-            each_h = page_height / 2
-            positions = [
-                (0, each_h),
-                (each_w, each_h),
-                (0, 0),
-                (each_w, 0)
-            ]
-            for i in range(4):
-                try:
-                    img_io = download_image(group[i])
-                    cropped = crop_image_to_fit(img_io, int(each_w), int(each_h))
-                    img_reader = ImageReader(cropped)
-                    x, y = positions[i]
-                    c.drawImage(img_reader, x, y, width=each_w, height=each_h, mask='auto')
-                except Exception as e:
-                    c.setFillColor(black)
-                    c.drawString(50, 50, "Error")
-        elif group_size == 5:
-            left_width = 0.6 * page_width
-            right_width = 0.4 * page_width
-            each_left_h = page_height / 2
-            for i in range(2):
-                try:
-                    img_io = download_image(group[i])
-                    cropped = crop_image_to_fit(img_io, int(left_width), int(each_left_h))
-                    img_reader = ImageReader(cropped)
-                    y_pos = page_height - (i+1)*each_left_h
-                    c.drawImage(img_reader, 0, y_pos, width=left_width, height=each_left_h, mask='auto')
-                except Exception as e:
-                    c.setFillColor(black)
-                    c.drawString(50, page_height - (i+1)*each_left_h + each_left_h/2, "Error")
-            each_right_h = page_height / 3
-            for i in range(3):
-                try:
-                    img_io = download_image(group[2+i])
-                    cropped = crop_image_to_fit(img_io, int(right_width), int(each_right_h))
-                    img_reader = ImageReader(cropped)
-                    y_pos = page_height - (i+1)*each_right_h
-                    c.drawImage(img_reader, left_width, y_pos, width=right_width, height=each_right_h, mask='auto')
-                except Exception as e:
-                    c.setFillColor(black)
-                    c.drawString(left_width + 50, page_height - (i+1)*each_right_h + each_right_h/2, "Error")
-        index += group_size
+                c.drawString(error_x, error_y, "Error")
         c.showPage()
         
     c.save()
 
-
+async def render_event_pdf(event: dict, attachments: list, output):
+    """
+    Render the event brochure without blocking the event loop: images are
+    prefetched and processed concurrently, then the canvas is laid out in a thread.
+    """
+    images = await prefetch_event_images(event, attachments)
+    await asyncio.to_thread(generate_event_pdf, event, attachments, output, images)
@@ -1,46 +1,148 @@
 import fitz  # PyMuPDF
 import os
-from typing import List
-import tempfile
-from fastapi import UploadFile
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from PIL import Image
 
-async def convert_pdf_to_images(pdf_file: UploadFile, dpi: int = 200) -> List[str]:
+# Processes rendering PDF pages; PyMuPDF holds the GIL while rasterizing
+PDF_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+# Pages handed to one render job, so early pages stream back before late ones
+PDF_RENDER_CHUNK_PAGES = 2
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        # spawn: forking a process running an event loop and client threads isn't safe
+        _render_pool = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _render_pool
+
+def shutdown_render_pool() -> None:
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+def pdf_text_layers(pdf_content: bytes, min_chars: int) -> Tuple[Dict[int, str], List[int]]:
     """
-    Convert a PDF file to a list of temporary image files.
+    Split a PDF's pages into those with a usable text layer and those that
+    need to be looked at.
     
-    Args:
-        pdf_file: FastAPI UploadFile containing the PDF
-        dpi: Resolution for rendering (default 200)
-        
     Returns:
-        List of temporary image file paths
+        (page number -> text for pages with at least min_chars of text,
+         numbers of the other pages)
     """
-    # Create a temporary directory for images
-    temp_dir = tempfile.mkdtemp()
-    image_paths = []
+    texts = {}
+    scans = []
+    with fitz.open(stream=pdf_content, filetype="pdf") as pdf:
+        for number, page in enumerate(pdf):
+            text = page.get_text().strip()
+            if len(text) >= min_chars:
+                texts[number] = text
+            else:
+                scans.append(number)
+    return texts, scans
+
+def _page_count(pdf_content: bytes) -> int:
+    with fitz.open(stream=pdf_content, filetype="pdf") as pdf:
+        return pdf.page_count
+
+def _render_pages_jpeg(pdf_content: bytes, page_numbers: List[int], max_side: int, min_side: Optional[int], quality: int) -> List[bytes]:
+    """Render pages of a PDF as JPEG bytes (runs in the render pool)."""
+    rendered = []
+    with fitz.open(stream=pdf_content, filetype="pdf") as pdf:
+        for number in page_numbers:
+            page = pdf[number]
+            zoom = pdf_page_scale(page, max_side, min_side)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            rendered.append(pix.tobytes("jpeg", jpg_quality=quality))
+    return rendered
+
+async def iter_pdf_page_jpegs(
+    pdf_content: bytes,
+    max_side: int,
+    min_side: Optional[int] = None,
+    quality: int = 85,
+    pages: Optional[List[int]] = None
+) -> AsyncIterator[bytes]:
+    """
+    Yield the pages of a PDF as in-memory JPEG bytes, in page order.
+    
+    Pages are rasterized directly at the target size (see pdf_page_scale) in
+    the render process pool, a few pages per job, so a long document renders
+    in parallel while the first pages are already being consumed. Nothing
+    touches the disk.
     
+    Args:
+        pdf_content: The PDF bytes
+        max_side: Longest side of each page image in pixels
+        min_side: Optional cap on the shortest side in pixels
+        quality: JPEG quality
+        pages: Page numbers (0-based) to render, all pages if None
+    """
+    if pages is None:
+        pages = list(range(await asyncio.to_thread(_page_count, pdf_content)))
+    if not pages:
+        return
+    
+    # Every job gets its own copy of the PDF, so long documents use fewer, larger jobs
+    chunk = max(PDF_RENDER_CHUNK_PAGES, -(-len(pages) // (PDF_RENDER_WORKERS * 2)))
+    loop = asyncio.get_running_loop()
+    pool = _get_render_pool()
+    jobs = [
+        loop.run_in_executor(
+            pool,
+            _render_pages_jpeg,
+            pdf_content,
+            pages[i:i + chunk],
+            max_side,
+            min_side,
+            quality
+        )
+        for i in range(0, len(pages), chunk)
+    ]
     try:
-        # Read the PDF content
-        pdf_content = await pdf_file.read()
-        
-        # Open the PDF with PyMuPDF
-        with fitz.open(stream=pdf_content, filetype="pdf") as pdf:
-            for i, page in enumerate(pdf):
-                # Render page to an image with specified DPI
-                pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72))
-                
-                # Create a temporary file path for this image
-                temp_path = os.path.join(temp_dir, f"page_{i+1}.png")
-                
-                # Save the image
-                pix.save(temp_path)
-                image_paths.append(temp_path)
+        for job in jobs:
+            for image in await job:
+                yield image
+    finally:
+        # The consumer stopped early: drop the jobs that haven't started
+        for job in jobs:
+            job.cancel()
+
+def pdf_page_scale(page, max_side: int, min_side: int = None) -> float:
+    """
+    Zoom factor rendering a page with its longer side at most max_side and,
+    when min_side is given, its shorter side at most min_side.
+    """
+    zoom = max_side / max(page.rect.width, page.rect.height)
+    if min_side:
+        zoom = min(zoom, min_side / min(page.rect.width, page.rect.height))
+    return zoom
+
+def render_pdf_first_page(pdf_content: bytes, max_size: int) -> Image.Image:
+    """
+    Render the first page of a PDF as an image whose longer side is about max_size.
     
-    except Exception as e:
-        # Clean up any created files if there's an error
-        for path in image_paths:
-            if os.path.exists(path):
-                os.remove(path)
-        raise Exception(f"Error converting PDF to images: {str(e)}")
+    The page is rasterized directly at the target scale instead of at a fixed DPI
+    and downscaled afterwards.
     
-    return image_paths
+    Args:
+        pdf_content: The PDF bytes
+        max_size: Longest side of the resulting image in pixels
+        
+    Returns:
+        PIL image of the first page
+    """
+    with fitz.open(stream=pdf_content, filetype="pdf") as pdf:
+        page = pdf[0]
+        zoom = pdf_page_scale(page, max_size)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
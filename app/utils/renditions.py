@@ -0,0 +1,84 @@
+import os
+import mimetypes
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional
+from PIL import Image, ImageOps
+from app.utils.pdf_utils import render_pdf_first_page
+from app.utils.video_utils import extract_keyframe_thumbnail
+
+# Rendition name -> longest side in pixels
+RENDITION_SIZES = {
+    "small": 256,
+    "medium": 1024,
+}
+RENDITION_WEBP_QUALITY = 80
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv']
+# Formats Pillow decodes
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff']
+
+# Content types that say nothing about the file, e.g. the /upload/stream default
+GENERIC_CONTENT_TYPES = {"application/octet-stream", "binary/octet-stream"}
+
+
+def media_kind(file_name: str, content_type: Optional[str] = None) -> Optional[str]:
+    """
+    Classify a file as "image", "pdf" or "video", or None if it gets no renditions.
+    A missing or generic content type is guessed from the file name.
+    """
+    if not content_type or content_type in GENERIC_CONTENT_TYPES:
+        content_type = mimetypes.guess_type(file_name)[0] or ""
+    extension = os.path.splitext(file_name)[1].lower()
+
+    if content_type.startswith("video/") or extension in VIDEO_EXTENSIONS:
+        return "video"
+    if content_type == "application/pdf" or extension == ".pdf":
+        return "pdf"
+    if content_type.startswith("image/") or extension in IMAGE_EXTENSIONS:
+        return "image"
+    return None
+
+
+def rendition_key(tenant_id: str, file_id: str, name: str, extension: str = "webp") -> str:
+    """Deterministic S3 key of a rendition, so re-running the pipeline overwrites it."""
+    return f"{tenant_id}/renditions/{file_id}/{name}.{extension}"
+
+
+def load_source_image(kind: str, source: BinaryIO) -> Optional[Image.Image]:
+    """
+    Decode the image renditions are made from: the image itself, the first
+    page of a PDF or a keyframe of a video.
+    """
+    largest = max(RENDITION_SIZES.values())
+
+    if kind == "image":
+        image = Image.open(source)
+        # Let JPEG decode at a reduced scale when the original is much larger
+        image.draft("RGB", (largest, largest))
+        return ImageOps.exif_transpose(image)
+
+    if kind == "pdf":
+        return render_pdf_first_page(source.read(), largest)
+
+    if kind == "video":
+        frame = extract_keyframe_thumbnail(source)
+        return Image.open(BytesIO(frame)) if frame else None
+
+    return None
+
+
+def render_renditions(image: Image.Image) -> Dict[str, bytes]:
+    """Encode the image as WebP at every size of RENDITION_SIZES, largest first."""
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "P") else "RGB")
+
+    renditions = {}
+    current = image
+    for name, size in sorted(RENDITION_SIZES.items(), key=lambda item: -item[1]):
+        # Each size is resized from the previous, larger rendition rather than the original
+        current = current.copy()
+        current.thumbnail((size, size), Image.LANCZOS)
+        out_io = BytesIO()
+        current.save(out_io, format="WEBP", quality=RENDITION_WEBP_QUALITY, method=4)
+        renditions[name] = out_io.getvalue()
+    return renditions
@@ -3,12 +3,17 @@ import boto3
 import aioboto3
 import re
 import json
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
 from uuid import uuid4
 from fastapi import UploadFile
 from app.core.config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Tuple
 from botocore.config import Config
+from botocore.exceptions import ClientError
 
 # Create a configuration with the correct signature version
 s3_config = Config(
@@ -32,6 +37,67 @@ async_session = aioboto3.Session(
 
 AWS_REGION = "ap-south-1"
 
+# Connections kept open by the shared async client
+S3_MAX_POOL_CONNECTIONS = 50
+
+# Uploads larger than this go through a multipart upload
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# Parts uploaded at once; bounds memory per upload to this many parts
+MULTIPART_CONCURRENCY = 4
+
+
+class S3ClientPool:
+    """
+    Long-lived async S3 client with its own connection pool.
+
+    Started and closed with the application. Code running outside the app's
+    event loop (Celery tasks, scripts) transparently gets a short-lived client
+    instead, since aiobotocore clients are bound to the loop that created them.
+    """
+
+    def __init__(self, session, config: Config):
+        self.session = session
+        self.config = config
+        self._client = None
+        self._loop = None
+        self._stack: Optional[AsyncExitStack] = None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        self._stack = AsyncExitStack()
+        self._client = await self._stack.enter_async_context(self.session.client("s3", config=self.config))
+        self._loop = asyncio.get_running_loop()
+
+    async def close(self) -> None:
+        if self._stack is not None:
+            await self._stack.aclose()
+        self._client = None
+        self._loop = None
+        self._stack = None
+
+    @asynccontextmanager
+    async def client(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            yield self._client
+        else:
+            async with self.session.client("s3", config=self.config) as s3:
+                yield s3
+
+
+s3_pool = S3ClientPool(
+    async_session,
+    s3_config.merge(Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS))
+)
+
+# Buckets that reject object ACLs (ObjectOwnership = BucketOwnerEnforced)
+_buckets_without_acls = set()
+
+# Buckets this process has already created/configured, see ensure_s3_bucket
+_provisioned_buckets = set()
+_bucket_locks: Dict[str, asyncio.Lock] = {}
+
 def get_valid_bucket_name(tenant_id: str) -> str:
     """
     Convert a tenant ID to a valid S3 bucket name.
@@ -64,10 +130,124 @@ def get_valid_bucket_name(tenant_id: str) -> str:
     
     return bucket_name
 
+async def _put_with_acl(bucket: str, put):
+    """
+    Run put(extra_args) with a public-read ACL in the same request, retrying
+    without it on buckets that do not support ACLs.
+    """
+    if bucket not in _buckets_without_acls:
+        try:
+            return await put({"ACL": "public-read"})
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "AccessControlListNotSupported":
+                raise
+            print(f"Bucket {bucket} does not accept ACLs, objects rely on the bucket policy")
+            _buckets_without_acls.add(bucket)
+    return await put({})
+
+
+class _ChunkedReader:
+    """Regroups an async stream of arbitrarily sized chunks into parts of part_size bytes."""
+
+    def __init__(self, chunks: AsyncIterator[bytes], part_size: int):
+        self._chunks = chunks.__aiter__()
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._exhausted = False
+
+    async def read(self) -> bytes:
+        while len(self._buffer) < self._part_size and not self._exhausted:
+            try:
+                self._buffer.extend(await self._chunks.__anext__())
+            except StopAsyncIteration:
+                self._exhausted = True
+        part = bytes(self._buffer[:self._part_size])
+        del self._buffer[:self._part_size]
+        return part
+
+    def unread(self, part: bytes) -> None:
+        self._buffer[:0] = part
+
+
+async def _multipart_upload(
+    s3,
+    read_part: Callable[[], Awaitable[bytes]],
+    bucket: str,
+    key: str,
+    extra_args: Dict[str, Any]
+) -> None:
+    """
+    Upload the parts returned by read_part (until it returns b"") with at most
+    MULTIPART_CONCURRENCY in flight. The first failed part stops the reading,
+    and the upload is aborted once the parts still in flight are cancelled.
+    """
+    upload = await s3.create_multipart_upload(Bucket=bucket, Key=key, **extra_args)
+    upload_id = upload["UploadId"]
+    semaphore = asyncio.Semaphore(MULTIPART_CONCURRENCY)
+
+    async def upload_part(part_number: int, body: bytes) -> Dict[str, Any]:
+        try:
+            response = await s3.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        finally:
+            semaphore.release()
+
+    tasks = []
+    try:
+        part_number = 1
+        while True:
+            # Wait for a free slot before reading, so only in-flight parts are held in memory
+            await semaphore.acquire()
+            if any(task.done() and not task.cancelled() and task.exception() for task in tasks):
+                # No point reading the rest; gather below raises the failure
+                semaphore.release()
+                break
+            body = await read_part()
+            if not body:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(upload_part(part_number, body)))
+            part_number += 1
+
+        parts = await asyncio.gather(*tasks)
+        await s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": list(parts)}
+        )
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # Parts still being sent would otherwise land after the abort
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+def _file_size(fileobj) -> Optional[int]:
+    try:
+        position = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(position)
+        return size
+    except Exception:
+        return None
+
+
 async def upload_file_to_s3(file: UploadFile, key:str = None, bucket: str = None) -> str:
     """
-    Upload a file to S3 and ensure it's publicly accessible.
-    Uses multiple approaches to maximize the chance of public access.
+    Upload a file to S3 as a publicly readable object.
+    
+    The ACL is sent with the upload itself; files above MULTIPART_THRESHOLD
+    are uploaded in parts concurrently.
     
     Args:
         file: The file to upload
@@ -84,37 +264,32 @@ async def upload_file_to_s3(file: UploadFile, key:str = None, bucket: str = None
     key = unique_filename if not key else key
     
     # Get content type
-    content_type = getattr(file, 'content_type', 'application/octet-stream')
-    
-    # Use standard boto3 for better error handling
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-        region_name="ap-south-1"
-    )
+    content_type = getattr(file, 'content_type', None) or 'application/octet-stream'
     
     try:
-        # Upload the file
         file.file.seek(0)
-        s3.upload_fileobj(
-            file.file,
-            valid_bucket,
-            key,
-            ExtraArgs={'ContentDisposition': 'attachment'}
-
-        )
+        size = _file_size(file.file)
         
-        # Try to make the object public via ACL
-        try:
-            s3.put_object_acl(
-                Bucket=valid_bucket,
-                Key=key,
-                ACL='public-read'
-            )
-            print(f"Set object ACL to public-read for {key}")
-        except Exception as e:
-            print(f"Could not set object ACL, it might still be private: {str(e)}")
+        async with s3_pool.client() as s3:
+            async def put(acl_args):
+                extra_args = {
+                    'ContentDisposition': 'attachment',
+                    'ContentType': content_type,
+                    **acl_args
+                }
+                file.file.seek(0)
+                if size is not None and size <= MULTIPART_THRESHOLD:
+                    body = await asyncio.to_thread(file.file.read)
+                    return await s3.put_object(Bucket=valid_bucket, Key=key, Body=body, **extra_args)
+                return await _multipart_upload(
+                    s3,
+                    lambda: asyncio.to_thread(file.file.read, MULTIPART_PART_SIZE),
+                    valid_bucket,
+                    key,
+                    extra_args
+                )
+            
+            await _put_with_acl(valid_bucket, put)
         
         # Generate direct URL for the object
         url = f"https://{valid_bucket}.s3.{AWS_REGION}.amazonaws.com/{key}"
@@ -125,21 +300,153 @@ async def upload_file_to_s3(file: UploadFile, key:str = None, bucket: str = None
     except Exception as e:
         raise Exception(f"Failed to upload file: {str(e)}")
 
-async def generate_presigned_url(bucket: str, key: str, expires_in: int = 3600) -> str:
+async def upload_stream_to_s3(
+    chunks: AsyncIterator[bytes],
+    key: str,
+    bucket: str,
+    content_type: Optional[str] = None
+) -> str:
     """
-    Generate a presigned URL for an S3 object
+    Upload an async stream of bytes (e.g. a request body) to S3 as a publicly
+    readable object without holding more than a few parts in memory.
+    
+    Streams that fit in one part are sent with a single put_object; longer
+    ones are piped into a multipart upload as they arrive.
+    
+    Returns:
+        URL of the uploaded file
+    """
+    valid_bucket = get_valid_bucket_name(bucket) if bucket else bucket
+    reader = _ChunkedReader(chunks, MULTIPART_PART_SIZE)
+    
+    # Look at the first part to decide between a single PUT and a multipart upload
+    first_part = await reader.read()
+    reader.unread(first_part)
+    single_part = len(first_part) < MULTIPART_PART_SIZE
+    
+    try:
+        async with s3_pool.client() as s3:
+            async def put(acl_args):
+                extra_args = {
+                    'ContentDisposition': 'attachment',
+                    'ContentType': content_type or 'application/octet-stream',
+                    **acl_args
+                }
+                if single_part:
+                    return await s3.put_object(Bucket=valid_bucket, Key=key, Body=first_part, **extra_args)
+                return await _multipart_upload(s3, reader.read, valid_bucket, key, extra_args)
+            
+            await _put_with_acl(valid_bucket, put)
+        
+        return f"https://{valid_bucket}.s3.{AWS_REGION}.amazonaws.com/{key}"
+        
+    except Exception as e:
+        raise Exception(f"Failed to upload file: {str(e)}")
+
+
+def upload_bytes_to_s3_sync(
+    data: bytes,
+    key: str,
+    bucket: str,
+    content_type: str,
+    content_disposition: Optional[str] = None
+) -> str:
+    """
+    Blocking upload of an in-memory object as a publicly readable file, for
+    Celery tasks. The bucket name is sanitized like upload_file_to_s3.
+    
+    Returns:
+        URL of the uploaded file
     """
-    # Convert tenant bucket name if needed
     valid_bucket = get_valid_bucket_name(bucket) if bucket else bucket
+    extra_args = {'ContentType': content_type}
+    if content_disposition:
+        extra_args['ContentDisposition'] = content_disposition
     
-    async with async_session.client("s3", config=s3_config) as s3:
-        url = await s3.generate_presigned_url(
+    if valid_bucket not in _buckets_without_acls:
+        extra_args['ACL'] = 'public-read'
+    try:
+        s3_client.put_object(Bucket=valid_bucket, Key=key, Body=data, **extra_args)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "AccessControlListNotSupported":
+            raise
+        _buckets_without_acls.add(valid_bucket)
+        extra_args.pop('ACL')
+        s3_client.put_object(Bucket=valid_bucket, Key=key, Body=data, **extra_args)
+    
+    return f"https://{valid_bucket}.s3.{AWS_REGION}.amazonaws.com/{key}"
+
+
+def download_from_s3_sync(bucket: str, key: str, fileobj) -> None:
+    """Blocking download of an object into fileobj, for Celery tasks."""
+    valid_bucket = get_valid_bucket_name(bucket) if bucket else bucket
+    s3_client.download_fileobj(valid_bucket, key, fileobj)
+
+
+class PresignedUrlCache:
+    """
+    Signs GET URLs locally and reuses them until shortly before they expire.
+
+    Presigning is a local SigV4 computation, so it uses the module-level boto3
+    client (credentials resolved once) rather than opening a client per call.
+    A URL is handed out again while it has at least refresh_margin seconds of
+    validity left, so callers always get at least that long to use it.
+    """
+
+    def __init__(self, client, max_entries: int = 10000, refresh_margin: int = 300):
+        self.client = client
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self._urls: "OrderedDict[Tuple[str, str, int], Tuple[str, float]]" = OrderedDict()
+
+    def sign(self, bucket: str, key: str, expires_in: int = 3600) -> str:
+        cache_key = (bucket, key, expires_in)
+        now = time.time()
+        cached = self._urls.get(cache_key)
+        if cached is not None and cached[1] - now > min(self.refresh_margin, expires_in / 2):
+            self._urls.move_to_end(cache_key)
+            return cached[0]
+
+        url = self.client.generate_presigned_url(
             "get_object",
-            Params={"Bucket": valid_bucket, "Key": key},
+            Params={"Bucket": bucket, "Key": key},
             ExpiresIn=expires_in
         )
+        self._urls[cache_key] = (url, now + expires_in)
+        self._urls.move_to_end(cache_key)
+        while len(self._urls) > self.max_entries:
+            self._urls.popitem(last=False)
+        return url
+
+    def sign_many(self, bucket: str, keys: Iterable[str], expires_in: int = 3600) -> Dict[str, str]:
+        """Sign every key of one bucket in a single pass; returns key -> URL."""
+        return {key: self.sign(bucket, key, expires_in) for key in keys}
+
+    def invalidate(self, bucket: str, key: str) -> None:
+        for cache_key in [k for k in self._urls if k[0] == bucket and k[1] == key]:
+            self._urls.pop(cache_key, None)
+
+
+presigned_urls = PresignedUrlCache(s3_client)
+
+
+async def generate_presigned_url(bucket: str, key: str, expires_in: int = 3600) -> str:
+    """
+    Generate a presigned URL for an S3 object
+    """
+    # Convert tenant bucket name if needed
+    valid_bucket = get_valid_bucket_name(bucket) if bucket else bucket
+    
+    return presigned_urls.sign(valid_bucket, key, expires_in)
+
+
+def generate_presigned_urls(bucket: str, keys: Iterable[str], expires_in: int = 3600) -> Dict[str, str]:
+    """
+    Generate presigned URLs for many objects of one bucket, e.g. a page of files
+    """
+    valid_bucket = get_valid_bucket_name(bucket) if bucket else bucket
     
-    return url
+    return presigned_urls.sign_many(valid_bucket, keys, expires_in)
 
 async def delete_object(bucket: str, key: str) -> None:
     """
@@ -148,26 +455,20 @@ async def delete_object(bucket: str, key: str) -> None:
     # Convert tenant bucket name if needed
     valid_bucket = get_valid_bucket_name(bucket) if bucket else bucket
     
-    async with async_session.client("s3", config=s3_config) as s3:
+    async with s3_pool.client() as s3:
         try:
             await s3.delete_object(Bucket=valid_bucket, Key=key)
         except Exception as e:
             raise Exception(f"Failed to delete object: {str(e)}")
+    
+    presigned_urls.invalidate(valid_bucket, key)
 
-async def create_s3_bucket(bucket_name: str) -> str:
+def _provision_bucket(valid_bucket: str) -> None:
     """
-    Create a new S3 bucket in ap-south-1 if it doesn't already exist and
-    configure it for maximum public accessibility.
-    
-    Args:
-        bucket_name: Desired bucket name (will be sanitized)
-        
-    Returns:
-        The actual (valid) bucket name created
+    Blocking: create the bucket in ap-south-1 if it doesn't already exist and
+    configure it for maximum public accessibility. Raises if the bucket can't
+    be created or opened up; ownership controls and the bucket ACL are best effort.
     """
-    # Sanitize bucket name to meet S3 requirements
-    valid_bucket = get_valid_bucket_name(bucket_name)
-    
     # Use standard boto3 client for better error handling
     s3 = boto3.client(
         "s3",
@@ -176,87 +477,131 @@ async def create_s3_bucket(bucket_name: str) -> str:
         region_name="ap-south-1"
     )
     
+    # Check if bucket exists first
     try:
-        # Check if bucket exists first
-        try:
-            s3.head_bucket(Bucket=valid_bucket)
-            print(f"Bucket {valid_bucket} already exists")
-        except:
-            # Create the bucket without any custom settings first
-            s3.create_bucket(
-                Bucket=valid_bucket,
-                CreateBucketConfiguration={"LocationConstraint": "ap-south-1"}
-            )
-            print(f"Created bucket: {valid_bucket}")
-        
-        # Remove all bucket public access blocks
-        s3.put_public_access_block(
+        s3.head_bucket(Bucket=valid_bucket)
+        print(f"Bucket {valid_bucket} already exists")
+    except:
+        # Create the bucket without any custom settings first
+        s3.create_bucket(
             Bucket=valid_bucket,
-            PublicAccessBlockConfiguration={
-                'BlockPublicAcls': False,
-                'IgnorePublicAcls': False,
-                'BlockPublicPolicy': False,
-                'RestrictPublicBuckets': False
-            }
+            CreateBucketConfiguration={"LocationConstraint": "ap-south-1"}
         )
-        print(f"Removed public access blocks on bucket: {valid_bucket}")
-        
-        # Set the bucket policy to allow public read
-        bucket_policy = {
-            "Version": "2012-10-17",
-            "Statement": [
-                {
-                    "Sid": "PublicReadGetObject",
-                    "Effect": "Allow",
-                    "Principal": "*",
-                    "Action": ["s3:GetObject", "s3:ListBucket"],
-                    "Resource": [
-                        f"arn:aws:s3:::{valid_bucket}",
-                        f"arn:aws:s3:::{valid_bucket}/*"
-                    ]
-                }
-            ]
+        print(f"Created bucket: {valid_bucket}")
+    
+    # Remove all bucket public access blocks
+    s3.put_public_access_block(
+        Bucket=valid_bucket,
+        PublicAccessBlockConfiguration={
+            'BlockPublicAcls': False,
+            'IgnorePublicAcls': False,
+            'BlockPublicPolicy': False,
+            'RestrictPublicBuckets': False
         }
+    )
+    print(f"Removed public access blocks on bucket: {valid_bucket}")
+    
+    # Set the bucket policy to allow public read
+    bucket_policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Sid": "PublicReadGetObject",
+                "Effect": "Allow",
+                "Principal": "*",
+                "Action": ["s3:GetObject", "s3:ListBucket"],
+                "Resource": [
+                    f"arn:aws:s3:::{valid_bucket}",
+                    f"arn:aws:s3:::{valid_bucket}/*"
+                ]
+            }
+        ]
+    }
+    
+    # Set the bucket policy
+    s3.put_bucket_policy(
+        Bucket=valid_bucket,
+        Policy=json.dumps(bucket_policy)
+    )
+    print(f"Set bucket policy for {valid_bucket}")
+    
+    # Try to set the ownership to allow ACLs
+    try:
+        s3.put_bucket_ownership_controls(
+            Bucket=valid_bucket,
+            OwnershipControls={
+                'Rules': [{'ObjectOwnership': 'ObjectWriter'}]
+            }
+        )
+        print(f"Set ownership controls for {valid_bucket}")
+    except Exception as e:
+        print(f"Could not set ownership controls, objects might still be private: {str(e)}")
         
-        # Set the bucket policy
-        s3.put_bucket_policy(
+    # Try to set the ACL to public-read
+    try:
+        s3.put_bucket_acl(
             Bucket=valid_bucket,
-            Policy=json.dumps(bucket_policy)
+            ACL='public-read'
         )
-        print(f"Set bucket policy for {valid_bucket}")
+        print(f"Set bucket ACL to public-read for {valid_bucket}")
+    except Exception as e:
+        print(f"Could not set bucket ACL: {str(e)}")
         
-        # Try to set the ownership to allow ACLs
-        try:
-            s3.put_bucket_ownership_controls(
-                Bucket=valid_bucket,
-                OwnershipControls={
-                    'Rules': [{'ObjectOwnership': 'ObjectWriter'}]
-                }
-            )
-            print(f"Set ownership controls for {valid_bucket}")
-        except Exception as e:
-            print(f"Could not set ownership controls, objects might still be private: {str(e)}")
-            
-        # Try to set the ACL to public-read
-        try:
-            s3.put_bucket_acl(
-                Bucket=valid_bucket,
-                ACL='public-read'
-            )
-            print(f"Set bucket ACL to public-read for {valid_bucket}")
-        except Exception as e:
-            print(f"Could not set bucket ACL: {str(e)}")
-            
-        # Generate a direct public URL for testing
-        url = f"https://{valid_bucket}.s3.{AWS_REGION}.amazonaws.com/"
-        print(f"Bucket public URL: {url}")
-            
+    # Generate a direct public URL for testing
+    url = f"https://{valid_bucket}.s3.{AWS_REGION}.amazonaws.com/"
+    print(f"Bucket public URL: {url}")
+
+async def create_s3_bucket(bucket_name: str) -> str:
+    """
+    Create a new S3 bucket in ap-south-1 if it doesn't already exist and
+    configure it for maximum public accessibility.
+    
+    Failures are logged, not raised.
+    
+    Args:
+        bucket_name: Desired bucket name (will be sanitized)
+        
+    Returns:
+        The actual (valid) bucket name created
+    """
+    # Sanitize bucket name to meet S3 requirements
+    valid_bucket = get_valid_bucket_name(bucket_name)
+    
+    try:
+        # boto3 blocks, keep it off the event loop
+        await asyncio.to_thread(_provision_bucket, valid_bucket)
     except Exception as e:
         print(f"Error creating/configuring bucket: {str(e)}")
         # Still return the bucket name for further operations
     
     return valid_bucket
 
+async def ensure_s3_bucket(bucket_name: str) -> str:
+    """
+    create_s3_bucket, run until it succeeds once per bucket per process.
+    
+    For hot paths that only need the bucket to exist (e.g. every incoming
+    email): concurrent callers wait on the same provisioning and later calls
+    return immediately. A failed provisioning is logged and not remembered,
+    so the next call tries again.
+    
+    Returns:
+        The actual (valid) bucket name
+    """
+    valid_bucket = get_valid_bucket_name(bucket_name)
+    if valid_bucket in _provisioned_buckets:
+        return valid_bucket
+    
+    lock = _bucket_locks.setdefault(valid_bucket, asyncio.Lock())
+    async with lock:
+        if valid_bucket not in _provisioned_buckets:
+            try:
+                await asyncio.to_thread(_provision_bucket, valid_bucket)
+                _provisioned_buckets.add(valid_bucket)
+            except Exception as e:
+                print(f"Error creating/configuring bucket: {str(e)}")
+    return valid_bucket
+
 async def set_public_bucket_policy(bucket_name: str) -> None:
     """
     Set a bucket policy that allows public read access to all objects.
@@ -282,7 +627,7 @@ async def set_public_bucket_policy(bucket_name: str) -> None:
     bucket_policy_json = json.dumps(bucket_policy)
     
     # Apply the policy to the bucket
-    async with async_session.client("s3", config=s3_config) as s3:
+    async with s3_pool.client() as s3:
         try:
             await s3.put_bucket_policy(
                 Bucket=bucket_name,
@@ -0,0 +1,110 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.utils.pagination import InvalidCursor, keyset_filter, keyset_sort
+
+# Longest search input considered; anything beyond is ignored
+MAX_SEARCH_TERMS = 8
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Any) -> List[str]:
+    """Split text into lowercase word tokens, in order, duplicates kept."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def search_tokens(doc: Dict[str, Any], fields: Sequence[str]) -> List[str]:
+    """
+    Unique tokens of the searchable fields of a document, stored on it as
+    `search_tokens` so searches can use a multikey index instead of a regex
+    over the raw fields.
+    """
+    tokens = set()
+    for field in fields:
+        tokens.update(tokenize(doc.get(field)))
+    return sorted(tokens)
+
+
+def search_terms(search: str) -> List[str]:
+    """Distinct query terms in the order the user typed them."""
+    terms = []
+    for token in tokenize(search):
+        if token not in terms:
+            terms.append(token)
+    return terms[:MAX_SEARCH_TERMS]
+
+
+def search_filter(terms: List[str]) -> Dict[str, Any]:
+    """
+    Every term must prefix a token of the document. The regexes are anchored,
+    case-sensitive and built from escaped input, so they turn into index range
+    scans over `search_tokens` rather than collection scans.
+    """
+    return {"$and": [{"search_tokens": {"$regex": f"^{re.escape(term)}"}} for term in terms]}
+
+
+def relevance_score(terms: List[str], primary_field: str) -> Dict[str, Any]:
+    """
+    Aggregation expression ranking a matched document: each term counts 1 for a
+    prefix match, 2 when it is a whole word, and 1 more when it appears in the
+    primary field (event name, email subject).
+    """
+    parts = []
+    for term in terms:
+        parts.append({"$cond": [{"$in": [term, "$search_tokens"]}, 2, 1]})
+        parts.append({"$cond": [
+            {"$regexMatch": {
+                "input": {"$toString": {"$ifNull": [f"${primary_field}", ""]}},
+                "regex": f"(^|\\W){re.escape(term)}",
+                "options": "i"
+            }},
+            1,
+            0
+        ]})
+    return {"$add": parts}
+
+
+def search_sort(search: str, sort=None) -> List[Tuple[str, int]]:
+    """Effective order of a search: the explicit sort, or relevance when there are terms."""
+    if not sort and search_terms(search):
+        sort = [("_score", -1)]
+    return keyset_sort(sort)
+
+
+def search_pipeline(
+    base_query: Dict[str, Any],
+    search: str,
+    primary_field: str,
+    skip: int = 0,
+    limit: int = 100,
+    sort=None,
+    after: Optional[List[Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build the aggregation for a ranked search. Results are ordered by relevance
+    (kept on each document as `_score`) unless an explicit sort is given, and
+    resume after the cursor values `after` when given instead of skipping.
+    """
+    terms = search_terms(search)
+    if not terms:
+        match = base_query
+    else:
+        match = {"$and": [base_query, search_filter(terms)]}
+
+    pipeline = [{"$match": match}]
+    if terms and not sort:
+        pipeline.append({"$addFields": {"_score": relevance_score(terms, primary_field)}})
+
+    sort = search_sort(search, sort)
+    if after is not None:
+        if len(after) != len(sort):
+            raise InvalidCursor("Cursor does not match the requested sort")
+        pipeline.append({"$match": keyset_filter(sort, after)})
+    pipeline.append({"$sort": dict(sort)})
+
+    if after is None:
+        pipeline.append({"$skip": skip})
+    pipeline.append({"$limit": limit})
+    return pipeline
@@ -0,0 +1,356 @@
+import time
+import asyncio
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pymongo import ReturnDocument
+from rapidfuzz import fuzz, process, utils
+from app.db.session import get_db
+from app.utils.search import tokenize
+
+# How often a worker checks whether another worker changed a tenant's tags
+TAG_INDEX_CHECK_SECONDS = 5
+
+# A tenant's index is rebuilt at least this often, to pick up changes made
+# outside the endpoints that report them (backfills, scripts, the shell)
+TAG_INDEX_MAX_AGE_SECONDS = 300
+
+# Per-tenant counter bumped on every reported write, in Mongo so that all
+# workers see it
+TAG_INDEX_VERSIONS_COLLECTION = "tag_index_versions"
+
+# Minimum rapidfuzz score (0-100) for a tag to be a fuzzy suggestion
+FUZZY_SCORE_CUTOFF = 70
+
+# Longest query scored against the vocabulary; the rest is ignored, since
+# scoring costs grow with the query length for every tag name
+FUZZY_MAX_QUERY_CHARS = 64
+
+# Tag filters whose facet counts are remembered per tenant until the next write
+FACET_CACHE_SIZE = 256
+
+
+class TenantTagIndex:
+    """
+    In-memory postings of one tenant's tags.
+
+    Keeps tag -> set of file ids and file id -> set of tag ids, so the files
+    having every selected tag are one set intersection (smallest set first)
+    and the tags co-occurring with them are counted from just those files.
+    Tag names are indexed by word in a sorted list for prefix lookups, and
+    kept pre-processed in a flat vocabulary for fuzzy matching.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.file_tags: Dict[str, Set[str]] = {}
+        self.tags: Dict[str, Tuple[str, str]] = {}
+        self._words: List[Tuple[str, str]] = []
+        self._vocabulary: List[str] = []
+        self._vocabulary_ids: List[str] = []
+        self._facet_cache: Dict[Tuple[frozenset, int], dict] = {}
+        # Tenant version (see TagIndex) the index reflects
+        self.version = 0
+        self.loaded_at = time.monotonic()
+        self.checked_at = self.loaded_at
+
+    def add_tags(self, tags: Iterable[Tuple[str, str, str]]) -> None:
+        """Add (tag_id, name, type) triples, sorting the word list once for the whole batch."""
+        added = False
+        for tag_id, name, tag_type in tags:
+            if tag_id in self.tags:
+                continue
+            added = True
+            self.tags[tag_id] = (name, tag_type)
+            self.postings.setdefault(tag_id, set())
+            self._words.extend((word, tag_id) for word in set(tokenize(name)))
+            # Processed once here rather than for every choice on every query
+            self._vocabulary.append(utils.default_process(name))
+            self._vocabulary_ids.append(tag_id)
+        if added:
+            self._facet_cache.clear()
+            self._words.sort()
+
+    def add_tag(self, tag_id: str, name: str, tag_type: str) -> None:
+        self.add_tags([(tag_id, name, tag_type)])
+
+    def set_file_tags(self, file_id: str, tag_ids: Iterable[str]) -> None:
+        self.remove_file(file_id)
+        self._facet_cache.clear()
+        tag_ids = set(tag_ids)
+        self.file_tags[file_id] = tag_ids
+        for tag_id in tag_ids:
+            self.postings.setdefault(tag_id, set()).add(file_id)
+
+    def remove_file(self, file_id: str) -> None:
+        self._facet_cache.clear()
+        for tag_id in self.file_tags.pop(file_id, ()):
+            files = self.postings.get(tag_id)
+            if files is not None:
+                files.discard(file_id)
+
+    def files_with_all(self, tag_ids: Iterable[str]) -> Set[str]:
+        """Ids of the files carrying every tag in tag_ids."""
+        sets = sorted((self.postings.get(tag_id, set()) for tag_id in set(tag_ids)), key=len)
+        if not sets:
+            return set(self.file_tags)
+        return sets[0].intersection(*sets[1:])
+
+    def co_occurring(self, selected: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Count, for every tag, the files that carry it together with all the
+        selected tags. Without a selection, the number of files per tag.
+        """
+        selected = list(selected or [])
+        if not selected:
+            return {tag_id: len(files) for tag_id, files in self.postings.items() if files}
+        counts = Counter()
+        for file_id in self.files_with_all(selected):
+            counts.update(self.file_tags[file_id])
+        return dict(counts)
+
+    def facets(self, selected: Optional[Iterable[str]] = None, top_n: int = 10) -> dict:
+        """
+        Counts under a tag filter: the files carrying all the selected tags,
+        and per tag type how many of them have a tag of that type, how many
+        tags of that type they use and the top_n of those tags by file count.
+        Cached until the index next changes.
+        """
+        selected = frozenset(selected or ())
+        key = (selected, top_n)
+        cached = self._facet_cache.get(key)
+        if cached is not None:
+            return cached
+
+        files = self.files_with_all(selected)
+        file_counts = Counter()
+        for file_id in files:
+            file_counts.update({self.tags[tag_id][1] for tag_id in self.file_tags[file_id] if tag_id in self.tags})
+
+        tags_by_type: Dict[str, List[Tuple[str, int]]] = {}
+        for tag_id, count in self.co_occurring(selected).items():
+            if tag_id in self.tags:
+                tags_by_type.setdefault(self.tags[tag_id][1], []).append((tag_id, count))
+
+        types = []
+        for tag_type, tags in tags_by_type.items():
+            tags.sort(key=lambda item: (-item[1], self.tags[item[0]][0].lower()))
+            types.append({
+                "type": tag_type,
+                "file_count": file_counts[tag_type],
+                "tag_count": len(tags),
+                "tags": [
+                    {"_id": tag_id, "name": self.tags[tag_id][0], "type": tag_type, "count": count}
+                    for tag_id, count in tags[:top_n]
+                ]
+            })
+        types.sort(key=lambda facet: (-facet["file_count"], facet["type"]))
+
+        result = {"total": len(files), "types": types}
+        if len(self._facet_cache) >= FACET_CACHE_SIZE:
+            # Drop the oldest filter
+            self._facet_cache.pop(next(iter(self._facet_cache)))
+        self._facet_cache[key] = result
+        return result
+
+    def _prefix_matches(self, term: str) -> Set[str]:
+        matches = set()
+        i = bisect_left(self._words, (term, ""))
+        while i < len(self._words) and self._words[i][0].startswith(term):
+            matches.add(self._words[i][1])
+            i += 1
+        return matches
+
+    def matching_tags(self, query: str) -> Set[str]:
+        """Tags with a word starting with each term of query (all tags for an empty query)."""
+        terms = tokenize(query)
+        if not terms:
+            return set(self.tags)
+        matches = self._prefix_matches(terms[0])
+        for term in terms[1:]:
+            matches &= self._prefix_matches(term)
+        return matches
+
+    def fuzzy_matching_tags(self, query: str, score_cutoff: float = FUZZY_SCORE_CUTOFF) -> Dict[str, float]:
+        """
+        Tags whose name is similar to query (typos included) -> rapidfuzz score.
+        Only the first FUZZY_MAX_QUERY_CHARS characters of query are scored.
+        """
+        processed = utils.default_process(query[:FUZZY_MAX_QUERY_CHARS])
+        if not processed:
+            return {tag_id: 100.0 for tag_id in self.tags}
+        matches = process.extract(
+            processed,
+            self._vocabulary,
+            scorer=fuzz.WRatio,
+            processor=None,
+            score_cutoff=score_cutoff,
+            limit=None
+        )
+        return {self._vocabulary_ids[i]: score for _, score, i in matches}
+
+    def suggest(
+        self,
+        query: str,
+        selected: Optional[List[str]] = None,
+        skip: int = 0,
+        limit: int = 10,
+        fuzzy: bool = False
+    ) -> List[dict]:
+        """
+        Tags matching query, restricted to those co-occurring with the selected
+        tags when given, most used (together with the selection) first. With
+        fuzzy, names only need to be similar to query and the closest come first.
+        """
+        counts = self.co_occurring(selected)
+        scores = self.fuzzy_matching_tags(query) if fuzzy else {}
+        candidates = set(scores) if fuzzy else self.matching_tags(query)
+        if selected:
+            candidates &= counts.keys()
+
+        ranked = sorted(
+            candidates,
+            key=lambda tag_id: (-scores.get(tag_id, 0), -counts.get(tag_id, 0), self.tags[tag_id][0].lower())
+        )
+        return [
+            {"_id": tag_id, "name": self.tags[tag_id][0], "type": self.tags[tag_id][1]}
+            for tag_id in ranked[skip:skip + limit]
+        ]
+
+
+class TagIndex:
+    """
+    Per-tenant TenantTagIndex registry.
+
+    A tenant is loaded from Mongo the first time it is used. After that the
+    upload, tag update and delete endpoints keep it current and bump the
+    tenant's version in Mongo. Every check_interval a request compares that
+    version with the one the index reflects; when another worker has written
+    since, or the index is older than max_age, the index is rebuilt in the
+    background while the current one keeps serving. Writes made during a
+    rebuild are replayed onto the new index before it replaces the old one.
+    """
+
+    def __init__(self, check_interval: int = TAG_INDEX_CHECK_SECONDS, max_age: int = TAG_INDEX_MAX_AGE_SECONDS):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._tenants: Dict[str, TenantTagIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._rebuilds: Dict[str, asyncio.Task] = {}
+        # Writes reported while a tenant is being rebuilt: (file id, tag ids or None once removed, version)
+        self._pending: Dict[str, List[Tuple[str, Optional[List[str]], int]]] = {}
+
+    async def _version(self, tenant_id: str) -> int:
+        doc = await get_db()[TAG_INDEX_VERSIONS_COLLECTION].find_one({"_id": tenant_id})
+        return doc.get("version", 0) if doc else 0
+
+    async def _bump_version(self, tenant_id: str) -> int:
+        doc = await get_db()[TAG_INDEX_VERSIONS_COLLECTION].find_one_and_update(
+            {"_id": tenant_id},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["version"]
+
+    async def _build(self, tenant_id: str) -> TenantTagIndex:
+        db = get_db()
+        index = TenantTagIndex()
+        # Read before the data, so a write racing the build shows up as a newer version
+        index.version = await self._version(tenant_id)
+        index.add_tags([
+            (tag["_id"], tag["name"], tag.get("type", "default"))
+            async for tag in db["tags"].find({"tenant_id": tenant_id}, {"name": 1, "type": 1})
+        ])
+        async for file in db["files"].find({"tenant_id": tenant_id}, {"tags": 1}, batch_size=2000):
+            if file.get("tags"):
+                index.set_file_tags(file["_id"], file["tags"])
+        return index
+
+    async def _apply(self, index: TenantTagIndex, file_id: str, tag_ids: Optional[List[str]], version: int) -> None:
+        if tag_ids is None:
+            index.remove_file(file_id)
+        else:
+            unknown = [tag_id for tag_id in tag_ids if tag_id not in index.tags]
+            if unknown:
+                index.add_tags([
+                    (tag["_id"], tag["name"], tag.get("type", "default"))
+                    async for tag in get_db()["tags"].find({"_id": {"$in": unknown}}, {"name": 1, "type": 1})
+                ])
+            index.set_file_tags(file_id, tag_ids)
+        # Nobody else wrote in between, so the index is still current
+        if version == index.version + 1:
+            index.version = version
+
+    async def _rebuild(self, tenant_id: str) -> None:
+        pending = self._pending[tenant_id] = []
+        try:
+            index = await self._build(tenant_id)
+            # Iterating by position also picks up writes reported during the replay itself
+            for file_id, tag_ids, version in pending:
+                await self._apply(index, file_id, tag_ids, version)
+            self._tenants[tenant_id] = index
+        except Exception as e:
+            print(f"Error rebuilding tag index for tenant {tenant_id}: {str(e)}")
+        finally:
+            self._pending.pop(tenant_id, None)
+            self._rebuilds.pop(tenant_id, None)
+
+    async def _is_stale(self, index: TenantTagIndex, tenant_id: str) -> bool:
+        if time.monotonic() - index.loaded_at > self.max_age:
+            return True
+        try:
+            return await self._version(tenant_id) != index.version
+        except Exception as e:
+            print(f"Error checking tag index version for tenant {tenant_id}: {str(e)}")
+            return False
+
+    async def get(self, tenant_id: str) -> TenantTagIndex:
+        index = self._tenants.get(tenant_id)
+        if index is None:
+            lock = self._locks.setdefault(tenant_id, asyncio.Lock())
+            async with lock:
+                # Another request may have loaded it while we waited
+                index = self._tenants.get(tenant_id)
+                if index is None:
+                    index = await self._build(tenant_id)
+                    self._tenants[tenant_id] = index
+            return index
+
+        now = time.monotonic()
+        if now - index.checked_at >= self.check_interval and tenant_id not in self._rebuilds:
+            index.checked_at = now
+            if await self._is_stale(index, tenant_id) and tenant_id not in self._rebuilds:
+                # Keep serving the current index until the new one is ready
+                self._rebuilds[tenant_id] = asyncio.create_task(self._rebuild(tenant_id))
+        return index
+
+    async def warm_up(self) -> None:
+        """Build the index of every tenant that has tags, e.g. at startup."""
+        for tenant_id in await get_db()["tags"].distinct("tenant_id"):
+            try:
+                await self.get(tenant_id)
+            except Exception as e:
+                print(f"Error building tag index for tenant {tenant_id}: {str(e)}")
+
+    async def _file_changed(self, tenant_id: str, file_id: str, tag_ids: Optional[List[str]]) -> None:
+        version = await self._bump_version(tenant_id)
+        pending = self._pending.get(tenant_id)
+        if pending is not None:
+            pending.append((file_id, tag_ids, version))
+        index = self._tenants.get(tenant_id)
+        if index is not None:
+            await self._apply(index, file_id, tag_ids, version)
+        # Not loaded yet: the first use reads the file from Mongo
+
+    async def file_tagged(self, tenant_id: str, file_id: str, tag_ids: List[str]) -> None:
+        """Record a file's (new) tags, learning names of tags the index hasn't seen."""
+        await self._file_changed(tenant_id, file_id, list(tag_ids))
+
+    async def file_removed(self, tenant_id: str, file_id: str) -> None:
+        await self._file_changed(tenant_id, file_id, None)
+
+
+# Shared by every request in the process
+tag_index = TagIndex()
+
@@ -1,57 +1,35 @@
 import av
 import io
-import asyncio
-from fastapi import UploadFile
-from typing import Optional, Tuple
+from typing import Optional
 
-async def generate_video_thumbnail(
-    file: UploadFile, 
-    timestamp: float = 1.0  # timestamp in seconds
-) -> Optional[Tuple[bytes, str]]:
+def extract_keyframe_thumbnail(source, timestamp: float = 1.0) -> Optional[bytes]:
     """
-    Generate a thumbnail from video bytes using PyAV.
-    
+    Grab a JPEG of the keyframe at or before timestamp.
+
+    Only keyframes are decoded, so the cost does not depend on how far into the
+    video the timestamp is or on the GOP length.
+
     Args:
-        file: An UploadFile object with the video content.
-        timestamp: The time in seconds to capture the thumbnail (default: 1.0).
-        
+        source: A path or seekable file object with the video.
+        timestamp: The time in seconds to capture the thumbnail.
+
     Returns:
-        A tuple (thumbnail_bytes, content_type) or None if extraction fails.
+        The JPEG bytes, or None if no frame could be decoded.
     """
-    try:
-        # Read the video content from the UploadFile
-        file_content = await file.read()
-        
-        # Wrap the synchronous PyAV thumbnail extraction in a thread
-        def extract_thumbnail() -> Optional[bytes]:
-            try:
-                # Open the video stream from in-memory bytes
-                container = av.open(io.BytesIO(file_content))
-                # Seek to the desired timestamp (converted to microseconds)
-                container.seek(int(timestamp * 1_000_000))
-                
-                # Decode video frames and return the first available frame
-                for frame in container.decode(video=0):
-                    # Convert the frame to a PIL image
-                    image = frame.to_image()
-                    # Save the image to a BytesIO buffer as JPEG
-                    buf = io.BytesIO()
-                    image.save(buf, format="JPEG")
-                    return buf.getvalue()
-                # No frame was decoded
-                return None
-            except Exception as inner_e:
-                print(f"PyAV extraction error: {inner_e}")
-                return None
+    with av.open(source) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = "NONKEY"
 
-        thumbnail_data = await asyncio.to_thread(extract_thumbnail)
-        
-        if thumbnail_data:
-            return thumbnail_data, "image/jpeg"
-        else:
-            print("No thumbnail generated using PyAV.")
-            return None
+        try:
+            # Seek in stream time units; lands on the preceding keyframe
+            container.seek(int(timestamp / stream.time_base), stream=stream, backward=True, any_frame=False)
+        except Exception:
+            # Shorter than timestamp or not seekable: use the first keyframe
+            container.seek(0)
 
-    except Exception as e:
-        print(f"Error generating thumbnail with PyAV: {e}")
-        return None
+        for frame in container.decode(stream):
+            image = frame.to_image()
+            buf = io.BytesIO()
+            image.save(buf, format="JPEG")
+            return buf.getvalue()
+    return None
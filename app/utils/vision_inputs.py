@@ -0,0 +1,171 @@
+import asyncio
+from io import BytesIO
+from dataclasses import dataclass, field
+from typing import List, Optional
+from PIL import Image, ImageOps, ImageStat
+from app.utils.pdf_utils import pdf_text_layers, iter_pdf_page_jpegs
+
+# The vision model fits "high" detail images within 2048x2048 and then scales
+# the shorter side down to 768, so anything larger is only extra upload
+VISION_MAX_SIDE = 2048
+VISION_MIN_SIDE = 768
+VISION_JPEG_QUALITY = 85
+
+# Images sent with one extraction, after blank and duplicate pages are dropped
+VISION_MAX_IMAGES = 8
+
+# Scanned PDF pages rendered per document; later ones are ignored
+VISION_MAX_RENDERED_PAGES = 20
+
+# Pages with at least this much text are sent as text instead of a scan
+MIN_PAGE_TEXT_CHARS = 200
+
+# Text sent with one extraction, across all PDFs; later pages are dropped
+VISION_MAX_TEXT_CHARS = 20_000
+
+# Difference hashes this close (bits out of 64) are treated as the same page.
+# Different pages of dense text can be only ~10 bits apart, while a rescan of
+# the same page is 1-2 bits away, so only consecutive images are compared.
+DUPLICATE_HASH_DISTANCE = 3
+
+# Grayscale standard deviation below which a page is blank
+BLANK_PAGE_STDDEV = 4.0
+
+
+@dataclass
+class VisionInputs:
+    """What is sent to the model for a set of attachments."""
+    # JPEG bytes, at most VISION_MAX_IMAGES
+    images: List[bytes] = field(default_factory=list)
+    # Text layers of PDF pages that didn't need to be sent as images, at most VISION_MAX_TEXT_CHARS
+    text: str = ""
+
+
+def fit_for_vision(image: Image.Image) -> Image.Image:
+    """Downscale an image to the largest size the vision model makes use of."""
+    scale = min(1.0, VISION_MAX_SIDE / max(image.size), VISION_MIN_SIDE / min(image.size))
+    if scale < 1.0:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+    return image
+
+
+def difference_hash(image: Image.Image) -> int:
+    """64-bit perceptual hash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour."""
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def is_blank(image: Image.Image) -> bool:
+    return ImageStat.Stat(image.convert("L")).stddev[0] < BLANK_PAGE_STDDEV
+
+
+def encode_jpeg(image: Image.Image) -> bytes:
+    out_io = BytesIO()
+    image.convert("RGB").save(out_io, format="JPEG", quality=VISION_JPEG_QUALITY, optimize=True)
+    return out_io.getvalue()
+
+
+def _open_image(data: bytes) -> Optional[Image.Image]:
+    try:
+        image = Image.open(BytesIO(data))
+        # Let JPEG decode at a reduced scale when the original is much larger
+        image.draft("RGB", (VISION_MAX_SIDE, VISION_MAX_SIDE))
+        return ImageOps.exif_transpose(image)
+    except Exception as e:
+        print(f"Error decoding uploaded image: {str(e)}")
+        return None
+
+
+class _ImageSelector:
+    """Keeps images that are neither blank nor near-duplicates of the previous kept one, up to VISION_MAX_IMAGES."""
+
+    def __init__(self, inputs: VisionInputs):
+        self.inputs = inputs
+        self.last_hash: Optional[int] = None
+
+    @property
+    def full(self) -> bool:
+        return len(self.inputs.images) >= VISION_MAX_IMAGES
+
+    def offer(self, image: Image.Image, jpeg: Optional[bytes] = None) -> None:
+        """Keep image, sent as jpeg when given (already encoded) or encoded here."""
+        if self.full or is_blank(image):
+            return
+        image_hash = difference_hash(image)
+        if self.last_hash is not None and bin(image_hash ^ self.last_hash).count("1") <= DUPLICATE_HASH_DISTANCE:
+            return
+        self.last_hash = image_hash
+        self.inputs.images.append(jpeg if jpeg is not None else encode_jpeg(image))
+
+
+def _join_text(texts: List[str]) -> str:
+    """Join page texts in order, cutting off at VISION_MAX_TEXT_CHARS."""
+    kept = []
+    remaining = VISION_MAX_TEXT_CHARS
+    for text in texts:
+        if remaining <= 0:
+            break
+        kept.append(text[:remaining])
+        remaining -= len(text) + 2
+    return "\n\n".join(kept)
+
+
+def _offer_upload(selector: _ImageSelector, data: bytes) -> None:
+    image = _open_image(data)
+    if image is not None:
+        selector.offer(fit_for_vision(image))
+
+
+def _offer_page(selector: _ImageSelector, jpeg: bytes) -> None:
+    # Blank and duplicate checks only need a thumbnail: let JPEG decode at 1/8 scale
+    image = Image.open(BytesIO(jpeg))
+    image.draft("L", (image.width // 8, image.height // 8))
+    selector.offer(image, jpeg)
+
+
+async def prepare_vision_inputs(images: List[bytes], pdfs: List[bytes]) -> VisionInputs:
+    """
+    Turn uploaded images and PDFs into what the extraction sends to the model.
+
+    PDF pages with a text layer contribute their text, up to
+    VISION_MAX_TEXT_CHARS in total; the others are
+    rendered straight to JPEG at the vision size by the PDF render pool and
+    streamed in page order. Uploaded images are downscaled to the same size.
+    Blank images and near-duplicates of the previous one (by difference hash)
+    are dropped and at most VISION_MAX_IMAGES are kept, in upload order.
+    Nothing touches the disk.
+    """
+    inputs = VisionInputs()
+    selector = _ImageSelector(inputs)
+    texts: List[str] = []
+
+    for data in images:
+        await asyncio.to_thread(_offer_upload, selector, data)
+
+    for pdf_content in pdfs:
+        try:
+            page_texts, scans = await asyncio.to_thread(pdf_text_layers, pdf_content, MIN_PAGE_TEXT_CHARS)
+            texts.extend(page_texts[number] for number in sorted(page_texts))
+            if selector.full:
+                continue
+            pages = iter_pdf_page_jpegs(
+                pdf_content,
+                VISION_MAX_SIDE,
+                VISION_MIN_SIDE,
+                quality=VISION_JPEG_QUALITY,
+                pages=scans[:VISION_MAX_RENDERED_PAGES]
+            )
+            async for jpeg in pages:
+                await asyncio.to_thread(_offer_page, selector, jpeg)
+                if selector.full:
+                    await pages.aclose()
+                    break
+        except Exception as e:
+            print(f"Error processing PDF file: {str(e)}")
+
+    inputs.text = _join_text(texts)
+    return inputs
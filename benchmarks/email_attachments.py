@@ -0,0 +1,92 @@
+"""
+Time storing the attachments of incoming emails against a local moto S3
+server, with an optional round-trip delay added to every S3 request.
+
+Compares the previous path (create_s3_bucket on every email, one attachment
+uploaded at a time) with the current one (ensure_s3_bucket, uploads running
+ATTACHMENT_UPLOAD_CONCURRENCY at a time). Needs moto[server]:
+
+    python -m benchmarks.email_attachments [--emails 5] [--attachments 20] [--size 200000] [--latency 0.03]
+"""
+import os
+import time
+import base64
+import asyncio
+import logging
+import argparse
+import threading
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+def start_moto(latency: float) -> str:
+    from moto.server import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    app = DomainDispatcherApplication(create_backend_app)
+
+    def delayed(environ, start_response):
+        time.sleep(latency)
+        return app(environ, start_response)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, delayed, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def make_email(attachments: int, size: int) -> list:
+    content = base64.b64encode(os.urandom(size)).decode("ascii")
+    return [{"filename": f"scan-{i}.jpg", "content": content} for i in range(attachments)]
+
+
+async def run(emails: int, attachments: int, size: int) -> None:
+    from app.utils import s3
+    from app.utils.s3 import create_s3_bucket, ensure_s3_bucket
+    from app.api.v1.endpoints.emails import _upload_attachment
+    from app.celery_worker.tasks.emails import ATTACHMENT_UPLOAD_CONCURRENCY
+
+    async def previous(tenant_id: str) -> None:
+        bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
+        await create_s3_bucket(bucket_name)
+        one_at_a_time = asyncio.Semaphore(1)
+        for attachment in make_email(attachments, size):
+            await _upload_attachment(attachment, tenant_id, bucket_name, one_at_a_time)
+
+    async def current(tenant_id: str) -> None:
+        bucket_name = f"AWS_S3_BUCKET_{tenant_id}"
+        await ensure_s3_bucket(bucket_name)
+        semaphore = asyncio.Semaphore(ATTACHMENT_UPLOAD_CONCURRENCY)
+        await asyncio.gather(*(
+            _upload_attachment(attachment, tenant_id, bucket_name, semaphore)
+            for attachment in make_email(attachments, size)
+        ))
+
+    await s3.s3_pool.start()
+    try:
+        for name, receive in (("previous", previous), ("current", current)):
+            tenant_id = f"bench-{name}"
+            timings = []
+            for _ in range(emails):
+                started = time.perf_counter()
+                await receive(tenant_id)
+                timings.append(time.perf_counter() - started)
+            first, rest = timings[0], timings[1:]
+            average = sum(rest) / len(rest) if rest else first
+            print(f"{name}: first email {first * 1000:.0f}ms, then {average * 1000:.0f}ms per email ({attachments} attachments of {size} bytes)")
+    finally:
+        await s3.s3_pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark storing email attachments against moto.")
+    parser.add_argument("--emails", type=int, default=5)
+    parser.add_argument("--attachments", type=int, default=20)
+    parser.add_argument("--size", type=int, default=200_000, help="bytes per attachment")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every S3 request")
+    args = parser.parse_args()
+
+    # Picked up by every boto3 and aioboto3 client created from here on
+    os.environ["AWS_ENDPOINT_URL"] = start_moto(args.latency)
+    asyncio.run(run(args.emails, args.attachments, args.size))
@@ -0,0 +1,120 @@
+"""
+Time rendering an event brochure whose attachments are served by a local
+HTTP server, with an optional delay added to every image request.
+
+Compares the previous path (generate_event_pdf downloading and processing
+each image inline, on the event loop) with the current one (render_event_pdf:
+prefetch_event_images, then the layout in a thread). Maps come from the stub
+provider, through an empty cache for each run. Also reports the longest time
+the event loop went without running another task.
+
+    python -m benchmarks.event_pdf [--images 30] [--runs 3] [--latency 0.05]
+"""
+import os
+import time
+import asyncio
+import tempfile
+import argparse
+import threading
+from io import BytesIO
+from pathlib import Path
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("MAP_PROVIDER", "stub")
+
+
+def make_fixtures(directory: str, count: int) -> list:
+    from PIL import Image
+
+    names = []
+    for i in range(count):
+        image = Image.merge("RGB", [
+            Image.effect_noise((1600, 1200), 40 + i),
+            Image.linear_gradient("L").resize((1600, 1200)),
+            Image.radial_gradient("L").resize((1600, 1200)),
+        ])
+        name = f"photo-{i:02d}.jpg"
+        image.save(os.path.join(directory, name), format="JPEG", quality=90)
+        names.append(name)
+    return names
+
+
+def start_image_server(directory: str, latency: float) -> str:
+    class DelayedHandler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            super().do_GET()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(DelayedHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+async def longest_stall(done: asyncio.Event, interval: float = 0.005) -> float:
+    """Longest gap between wake-ups of a task that sleeps for interval at a time."""
+    longest = 0.0
+    last = time.perf_counter()
+    while not done.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        longest = max(longest, now - last - interval)
+        last = now
+    return longest
+
+
+async def run(attachments: list, runs: int) -> None:
+    from app.utils.pdf_generator import generate_event_pdf, render_event_pdf
+    from app.utils.map_cache import map_cache
+
+    event = {
+        "event_name": "Annual Science Fair",
+        "institute_name": "Benchmark Institute",
+        "event_date": "2026-01-15",
+        "description": "Projects, talks and a gallery of the day.",
+        "location": "Pune, Maharashtra",
+    }
+
+    async def previous(output) -> None:
+        generate_event_pdf(event, attachments, output)
+
+    async def current(output) -> None:
+        await render_event_pdf(event, attachments, output)
+
+    for name, render in (("previous", previous), ("current", current)):
+        timings = []
+        stalls = []
+        size = 0
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                map_cache.cache_dir = Path(cache_dir)
+                output = BytesIO()
+                done = asyncio.Event()
+                watcher = asyncio.create_task(longest_stall(done))
+                await asyncio.sleep(0)
+                started = time.perf_counter()
+                await render(output)
+                timings.append(time.perf_counter() - started)
+                done.set()
+                stalls.append(await watcher)
+                size = len(output.getvalue())
+        print(
+            f"{name}: {min(timings) * 1000:.0f}ms best, {sum(timings) / len(timings) * 1000:.0f}ms average, "
+            f"event loop blocked up to {max(stalls) * 1000:.0f}ms ({len(attachments)} images, {size} byte PDF)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rendering an event brochure from local images.")
+    parser.add_argument("--images", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every image request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        base_url = start_image_server(fixtures_dir, args.latency)
+        attachments = [f"{base_url}/{name}" for name in make_fixtures(fixtures_dir, args.images)]
+        asyncio.run(run(attachments, args.runs))
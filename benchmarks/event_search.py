@@ -0,0 +1,167 @@
+"""
+Compare event search queries over synthetic events of one tenant:
+
+- previous: the unanchored, case-insensitive $regex of the raw input over
+  event_name, institute_name and location;
+- current: anchored prefix terms over the indexed `search_tokens`, the
+  $match of EventsRepository.search.
+
+Reports p50/p95 latency of fetching every match of each filter, and with a
+real MongoDB (--mongo-uri) also of the whole ranked EventsRepository.search
+and the explain() plan of both filters: the stages of the winning plan and
+the keys and documents examined.
+
+Without --mongo-uri the events go to an in-memory mongomock-motor database.
+It has no query planner (and so no explain()): every query is a scan there,
+and only the cost of evaluating each filter is compared. The ranked search is
+skipped, since mongomock's aggregate() copies the whole collection first,
+which would time mongomock rather than the query.
+
+    python -m benchmarks.event_search [--events 100000] [--queries 20] [--mongo-uri mongodb://localhost:27017]
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from statistics import quantiles
+from uuid import uuid4
+
+TOPICS = ["science", "robotics", "music", "drama", "coding", "design", "finance", "medicine", "sports", "literature",
+          "astronomy", "chemistry", "history", "poetry", "startup", "climate", "photography", "dance", "chess", "debate"]
+KINDS = ["fair", "fest", "summit", "workshop", "conference", "hackathon", "olympiad", "meetup", "symposium", "expo"]
+INSTITUTES = ["national institute of technology", "st xavier college", "delhi public school", "city engineering college",
+              "kendriya vidyalaya", "institute of management", "government medical college", "fine arts academy"]
+CITIES = ["pune", "mumbai", "delhi", "bengaluru", "chennai", "hyderabad", "kolkata", "jaipur", "lucknow", "kochi",
+          "indore", "nagpur", "surat", "bhopal", "patna", "guwahati", "mysuru", "goa", "shimla", "dehradun"]
+
+# Searches as typed: a prefix, a whole word, two words, a rare term
+SEARCHES = ["conf", "robotics", "music fest", "chess olympiad pune", "hack", "xavier", "kochi", "astro", "design expo", "dehra"]
+
+TENANT_ID = "benchmark-tenant"
+
+
+def make_events(count: int) -> list:
+    from app.db.repository.events import EVENT_SEARCH_FIELDS
+    from app.utils.search import search_tokens
+
+    rng = random.Random(0)
+    created_at = datetime(2026, 1, 1)
+    events = []
+    for i in range(count):
+        event = {
+            "_id": str(uuid4()),
+            "tenant_id": TENANT_ID,
+            "event_name": f"{rng.choice(TOPICS).title()} {rng.choice(KINDS).title()} {rng.randint(2015, 2026)}",
+            "institute_name": rng.choice(INSTITUTES).title(),
+            "location": f"{rng.choice(CITIES).title()}, India",
+            "created_at": created_at + timedelta(seconds=i),
+        }
+        # As EventsRepository.insert_one stores it
+        event["search_tokens"] = search_tokens(event, EVENT_SEARCH_FIELDS)
+        events.append(event)
+    return events
+
+
+def previous_filter(search: str) -> dict:
+    return {
+        "$and": [
+            {"tenant_id": TENANT_ID},
+            {"$or": [
+                {"event_name": {"$regex": search, "$options": "i"}},
+                {"institute_name": {"$regex": search, "$options": "i"}},
+                {"location": {"$regex": search, "$options": "i"}}
+            ]}
+        ]
+    }
+
+
+def current_filter(search: str) -> dict:
+    from app.utils.search import search_filter, search_terms
+
+    return {"$and": [{"tenant_id": TENANT_ID}, search_filter(search_terms(search))]}
+
+
+def percentiles(timings: list) -> str:
+    cuts = quantiles(timings, n=20)
+    return f"p50 {cuts[9]:.1f}ms, p95 {cuts[18]:.1f}ms"
+
+
+async def explain(collection, query: dict) -> str:
+    from app.db.indexes import _plan_stages
+
+    explanation = await collection.find(query).explain()
+    stages = " > ".join(_plan_stages(explanation["queryPlanner"]["winningPlan"]))
+    stats = explanation.get("executionStats", {})
+    return f"{stages} ({stats.get('totalKeysExamined', '?')} keys, {stats.get('totalDocsExamined', '?')} docs examined)"
+
+
+async def run(event_count: int, query_count: int, mongo_uri: str) -> None:
+    from app.db import session
+
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        db = AsyncIOMotorClient(mongo_uri)["search_benchmark"]
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        db = AsyncMongoMockClient()["search_benchmark"]
+    session.db = db
+
+    from app.db.repository.events import EventsRepository
+
+    events_repo = EventsRepository()
+    collection = db[EventsRepository.collection_name]
+    await collection.drop()
+    try:
+        if mongo_uri:
+            await collection.create_indexes(EventsRepository.indexes)
+        started = time.perf_counter()
+        await collection.insert_many(make_events(event_count))
+        print(f"Inserted {event_count} events in {time.perf_counter() - started:.1f}s")
+
+        searches = [SEARCHES[i % len(SEARCHES)] for i in range(query_count)]
+
+        async def previous(search: str) -> list:
+            return await collection.find(previous_filter(search)).to_list(length=None)
+
+        async def current(search: str) -> list:
+            return await collection.find(current_filter(search)).to_list(length=None)
+
+        async def ranked(search: str) -> list:
+            return await events_repo.search({"tenant_id": TENANT_ID}, search, limit=100)
+
+        queries = [("previous", previous), ("current", current)]
+        if mongo_uri:
+            queries.append(("current, ranked first 100", ranked))
+        for name, query in queries:
+            timings = []
+            for search in searches:
+                started = time.perf_counter()
+                await query(search)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{name}: {percentiles(timings)} over {query_count} searches")
+
+        for search in SEARCHES[:4]:
+            if mongo_uri:
+                print(f"explain {search!r}:")
+                print(f"  previous: {await explain(collection, previous_filter(search))}")
+                print(f"  current:  {await explain(collection, current_filter(search))}")
+            else:
+                matches = await collection.count_documents(current_filter(search))
+                print(f"{search!r}: {matches} matching events (no explain() on mongomock)")
+    finally:
+        await collection.drop()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("MONGO_DB_NAME", "benchmark")
+
+    parser = argparse.ArgumentParser(description="Benchmark event search queries.")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20, help="searches timed per query kind")
+    parser.add_argument("--mongo-uri", default=None, help="a MongoDB to run against instead of mongomock (its search_benchmark database is used)")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.events, args.queries, args.mongo_uri))
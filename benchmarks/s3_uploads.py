@@ -0,0 +1,74 @@
+"""
+Time upload_file_to_s3 against a local moto S3 server, with an optional
+round-trip delay added to every S3 request.
+
+Each size is uploaded --uploads times, one after the other, once through the
+shared s3_pool client and once with the pool stopped, so that every call
+opens (and closes) a client of its own. The default sizes are a small file,
+exactly MULTIPART_THRESHOLD (still a single PUT) and above it (multipart).
+Needs moto[server]:
+
+    python -m benchmarks.s3_uploads [--uploads 10] [--sizes 100000,16777216,25165824] [--latency 0.03]
+"""
+import os
+import io
+import time
+import asyncio
+import argparse
+from contextlib import redirect_stdout
+from statistics import quantiles
+from uuid import uuid4
+
+from benchmarks.email_attachments import start_moto
+
+
+def percentiles(timings: list) -> str:
+    cuts = quantiles(timings, n=20)
+    return f"p50 {cuts[9]:.0f}ms, p95 {cuts[18]:.0f}ms"
+
+
+async def run(uploads: int, sizes: list) -> None:
+    from fastapi import UploadFile
+    from starlette.datastructures import Headers
+    from app.utils import s3
+    from app.utils.s3 import get_valid_bucket_name, upload_file_to_s3
+
+    bucket_name = f"AWS_S3_BUCKET_bench{uuid4().hex[:8]}"
+    async with s3.async_session.client("s3", config=s3.s3_config) as client:
+        await client.create_bucket(
+            Bucket=get_valid_bucket_name(bucket_name),
+            CreateBucketConfiguration={"LocationConstraint": s3.AWS_REGION}
+        )
+
+    async def time_uploads(data: bytes) -> list:
+        timings = []
+        for _ in range(uploads):
+            file = UploadFile(file=io.BytesIO(data), filename="upload.bin", headers=Headers({"content-type": "application/octet-stream"}))
+            started = time.perf_counter()
+            # upload_file_to_s3 prints every URL
+            with redirect_stdout(io.StringIO()):
+                await upload_file_to_s3(file, bucket=bucket_name)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    for size in sizes:
+        data = os.urandom(size)
+        await s3.s3_pool.start()
+        try:
+            pooled = await time_uploads(data)
+        finally:
+            await s3.s3_pool.close()
+        fresh = await time_uploads(data)
+        print(f"{size} bytes: pooled client {percentiles(pooled)}; client per call {percentiles(fresh)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark upload_file_to_s3 against moto.")
+    parser.add_argument("--uploads", type=int, default=10, help="uploads timed per size and client")
+    parser.add_argument("--sizes", default=f"100000,{16 * 1024 * 1024},{24 * 1024 * 1024}", help="comma-separated bytes per upload")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every S3 request")
+    args = parser.parse_args()
+
+    # Picked up by every boto3 and aioboto3 client created from here on
+    os.environ["AWS_ENDPOINT_URL"] = start_moto(args.latency)
+    asyncio.run(run(args.uploads, [int(size) for size in args.sizes.split(",")]))
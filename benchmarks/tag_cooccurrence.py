@@ -0,0 +1,103 @@
+"""
+Time a TenantTagIndex holding many synthetic files: the build, co-occurrence
+counts and prefix suggestions under 1, 2 and 3 selected tags, and the memory
+taken by the file id sets.
+
+Tag popularity is skewed (a few tags are on many files, most on few), and the
+selections are taken from the tags of a random file so that they always match
+at least one file:
+
+    python -m benchmarks.tag_cooccurrence [--files 1000000] [--tags 5000] [--queries 100]
+"""
+import sys
+import time
+import random
+import string
+import resource
+import argparse
+from itertools import accumulate
+from statistics import quantiles
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+def percentiles(timings: list) -> str:
+    cuts = quantiles(timings, n=20)
+    return f"p50 {cuts[9]:.2f}ms, p95 {cuts[18]:.2f}ms"
+
+
+def set_bytes(sets) -> int:
+    """Bytes of the set objects themselves (hash tables), not of the ids they point to."""
+    return sum(sys.getsizeof(members) for members in sets)
+
+
+def run(file_count: int, tag_count: int, query_count: int) -> None:
+    from app.utils.tag_index import TenantTagIndex
+
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(tag_count // 2)]
+    tag_ids = [f"tag-{i}" for i in range(tag_count)]
+    # Zipf-like popularity: tag i is picked with weight 1 / (i + 1)
+    cum_weights = list(accumulate(1 / (i + 1) for i in range(tag_count)))
+
+    index = TenantTagIndex()
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    index.add_tags(
+        (tag_id, " ".join(rng.sample(words, rng.randint(1, 3))), rng.choice(("topic", "place", "person")))
+        for tag_id in tag_ids
+    )
+    for i in range(file_count):
+        index.set_file_tags(f"file-{i}", rng.choices(tag_ids, cum_weights=cum_weights, k=rng.randint(2, 5)))
+    build_seconds = time.perf_counter() - started
+    rss_after = rss_mb()
+
+    postings_bytes = set_bytes(index.postings.values())
+    file_tags_bytes = set_bytes(index.file_tags.values())
+    print(f"Built {file_count} files over {tag_count} tags in {build_seconds:.1f}s")
+    print(
+        f"Memory: tag -> files sets {postings_bytes / 1024 / 1024:.0f}MB, "
+        f"file -> tags sets {file_tags_bytes / 1024 / 1024:.0f}MB, "
+        f"process grew by {rss_after - rss_before:.0f}MB"
+    )
+
+    file_ids = list(index.file_tags)
+    for selected_count in (1, 2, 3):
+        selections = []
+        while len(selections) < query_count:
+            tags = list(index.file_tags[rng.choice(file_ids)])
+            if len(tags) >= selected_count:
+                selections.append(rng.sample(tags, selected_count))
+        prefixes = [rng.choice(words)[:2] for _ in range(query_count)]
+
+        co_occurring = []
+        suggest = []
+        matched = []
+        for selected, prefix in zip(selections, prefixes):
+            # Compare the uncached path: suggest doesn't use the facet cache
+            started = time.perf_counter()
+            index.co_occurring(selected)
+            co_occurring.append((time.perf_counter() - started) * 1000)
+            matched.append(len(index.files_with_all(selected)))
+
+            started = time.perf_counter()
+            index.suggest(prefix, selected=selected)
+            suggest.append((time.perf_counter() - started) * 1000)
+
+        print(
+            f"{selected_count} selected (median {sorted(matched)[len(matched) // 2]} matching files): "
+            f"co-occurrence {percentiles(co_occurring)}; prefix suggestion {percentiles(suggest)}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark co-occurrence counts over many tagged files.")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--tags", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100, help="queries timed per number of selected tags")
+    args = parser.parse_args()
+    run(args.files, args.tags, args.queries)
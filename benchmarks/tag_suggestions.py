@@ -0,0 +1,50 @@
+"""
+Time prefix and fuzzy tag suggestions of a TenantTagIndex over a synthetic
+vocabulary, with one typo in every query:
+
+    python -m benchmarks.tag_suggestions [--tags 50000] [--queries 200]
+"""
+import time
+import random
+import string
+import argparse
+from statistics import quantiles
+
+
+def run(tag_count: int, query_count: int) -> None:
+    from app.utils.tag_index import TenantTagIndex
+
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(tag_count // 4)]
+    index = TenantTagIndex()
+    started = time.perf_counter()
+    index.add_tags(
+        (f"tag-{i}", " ".join(rng.sample(words, rng.randint(1, 3))), "default")
+        for i in range(tag_count)
+    )
+    print(f"Indexed {tag_count} tags in {time.perf_counter() - started:.2f}s")
+
+    queries = []
+    for _ in range(query_count):
+        word = list(rng.choice(words))
+        # One typo per query: a replaced character
+        word[rng.randrange(len(word))] = rng.choice(string.ascii_lowercase)
+        queries.append("".join(word))
+
+    for fuzzy in (False, True):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.suggest(query, fuzzy=fuzzy)
+            timings.append((time.perf_counter() - started) * 1000)
+        cuts = quantiles(timings, n=20)
+        p50, p95 = cuts[9], cuts[18]
+        print(f"{'fuzzy' if fuzzy else 'prefix'}: p50 {p50:.2f}ms, p95 {p95:.2f}ms over {query_count} queries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tag suggestions over a synthetic vocabulary.")
+    parser.add_argument("--tags", type=int, default=50000, help="vocabulary size")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries to time")
+    args = parser.parse_args()
+    run(args.tags, args.queries)
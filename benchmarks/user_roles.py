@@ -0,0 +1,114 @@
+"""
+Count the MongoDB round-trips a page of GET /users makes, against an
+in-memory database (mongomock-motor) seeded with one tenant.
+
+Compares the previous path (roles_repo.find_one for every user of the page)
+with the current one (get_users, which resolves the page's roles through
+RolesRepository.get_roles_by_ids and the role cache), for a cold cache and
+for the pages after it. Needs mongomock-motor:
+
+    python -m benchmarks.user_roles [--users 100] [--roles 5] [--pages 3]
+"""
+import os
+import asyncio
+import argparse
+from collections import Counter
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+
+class CountingCollection:
+    """Wraps a motor collection, counting the calls that reach the database."""
+
+    def __init__(self, collection, counts: Counter):
+        self._collection = collection
+        self._counts = counts
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def find_one(self, *args, **kwargs):
+        self._counts[self._collection.name] += 1
+        return await self._collection.find_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        self._counts[self._collection.name] += 1
+        return self._collection.find(*args, **kwargs)
+
+
+class CountingDatabase:
+    def __init__(self, db, counts: Counter):
+        self._db = db
+        self._counts = counts
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self._counts)
+
+
+async def seed(db, tenant_id: str, users: int, roles: int) -> None:
+    role_ids = [str(uuid4()) for _ in range(roles)]
+    await db["roles"].insert_many([
+        {"_id": role_id, "name": f"role-{i}", "tenant_id": tenant_id, "permissions": []}
+        for i, role_id in enumerate(role_ids)
+    ])
+    created_at = datetime(2026, 1, 1)
+    await db["users"].insert_many([
+        {
+            "_id": str(uuid4()),
+            "username": f"user-{i}",
+            "email": f"user-{i}@example.com",
+            "tenant_id": tenant_id,
+            "role_id": role_ids[i % roles],
+            "created_at": created_at + timedelta(seconds=i),
+        }
+        for i in range(users)
+    ])
+
+
+async def run(users: int, roles: int, pages: int) -> None:
+    from mongomock_motor import AsyncMongoMockClient
+    from fastapi import Response
+    from app.db import session
+
+    counts = Counter()
+    raw_db = AsyncMongoMockClient()["benchmark"]
+    session.db = CountingDatabase(raw_db, counts)
+
+    from app.db.repository.roles import role_cache
+    from app.api.v1.endpoints.user import get_users, users_repo, roles_repo
+
+    tenant_id = str(uuid4())
+    await seed(raw_db, tenant_id, users, roles)
+    current_user = {"tenant_id": tenant_id}
+
+    async def previous() -> None:
+        page = await users_repo.find_many({"tenant_id": tenant_id}, limit=users)
+        for user in page:
+            await roles_repo.find_one({"_id": user.get("role_id")})
+
+    async def current() -> None:
+        await get_users(Response(), offset=0, limit=users, cursor=None, current_user=current_user)
+
+    for name, list_page in (("previous", previous), ("current", current)):
+        role_cache.invalidate_tenant(tenant_id)
+        per_page = []
+        for _ in range(pages):
+            counts.clear()
+            await list_page()
+            per_page.append(dict(counts))
+        for number, page_counts in enumerate(per_page, start=1):
+            total = sum(page_counts.values())
+            print(f"{name} page {number}: {total} round-trips ({page_counts.get('users', 0)} users, {page_counts.get('roles', 0)} roles)")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("MONGO_DB_NAME", "benchmark")
+
+    parser = argparse.ArgumentParser(description="Count MongoDB round-trips of a user listing page.")
+    parser.add_argument("--users", type=int, default=100, help="users on the page")
+    parser.add_argument("--roles", type=int, default=5, help="distinct roles among them")
+    parser.add_argument("--pages", type=int, default=3, help="times the page is listed")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.users, args.roles, args.pages))
@@ -8,5 +8,5 @@ import os
 from app.celery_worker.celery_app import celery_app
 
 if __name__ == "__main__":
-    # This will start the Celery worker
-    celery_app.worker_main(["worker", "--loglevel=info"]) 
\ No newline at end of file
+    # This will start the Celery worker, consuming the queue app tasks are routed to
+    celery_app.worker_main(["worker", "--loglevel=info", "-Q", "main-queue,celery"]) 
\ No newline at end of file
@@ -0,0 +1,37 @@
+import os
+import socket
+import pytest
+
+# app.core.settings reads these at import time; the tests only talk to local stand-ins
+for name, value in {
+    "SECRET_KEY": "test-secret",
+    "DATABASE_URL": "sqlite://",
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_S3_BUCKET": "test-bucket",
+    "Google_maps_key": "test-key",
+    "FILE_AWS_S3_BUCKET": "test-files",
+    "TASKS_FILE_AWS_S3_BUCKET": "test-tasks",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "MONGO_DB_NAME": "test",
+    "OPENAI_API_KEY": "test-key",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def moto_endpoint():
+    """URL of an in-process moto S3 server, shared by the whole session."""
+    from moto.server import ThreadedMotoServer
+
+    port = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
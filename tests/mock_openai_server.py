@@ -0,0 +1,135 @@
+"""
+Local stand-in for the OpenAI chat completions API, for tests and load
+checks of the client layer without network access or an API key.
+
+Run with:
+    python tests/mock_openai_server.py --port 8089 [--delay 0.2] [--fail-rate 0.1] [--slow-rate 0.05]
+
+and point the app at it with OPENAI_BASE_URL=http://localhost:8089/v1.
+Replies to /v1/chat/completions with every property of the requested JSON
+schema set to null ({} without a schema). --fail-rate answers that share of
+requests with a 429 or 503, and --slow-rate delays that share by ten times
+--delay, to exercise retries and hedging.
+
+Tests use start_server(), whose handler can be given a script: the outcome
+("ok", "slow", "429" or "503") of each request in arrival order, after which
+the random rates apply again.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from typing import List, Optional
+from uuid import uuid4
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _reply_content(request: dict) -> str:
+    response_format = request.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema") or {}
+    return json.dumps({name: None for name in schema.get("properties", {})})
+
+
+def make_handler(delay: float, fail_rate: float, slow_rate: float, script: Optional[List[str]] = None):
+    lock = threading.Lock()
+
+    class MockOpenAIHandler(BaseHTTPRequestHandler):
+        # Shared by every request to the server
+        received = 0
+        in_flight = 0
+        max_in_flight = 0
+        outcomes = list(script or [])
+
+        def _send_json(self, status: int, body: dict, headers: dict = None) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _next_outcome(self) -> str:
+            cls = type(self)
+            with lock:
+                cls.received += 1
+                if cls.outcomes:
+                    return cls.outcomes.pop(0)
+            if random.random() < fail_rate:
+                return "429" if random.random() < 0.5 else "503"
+            return "slow" if random.random() < slow_rate else "ok"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+
+            cls = type(self)
+            with lock:
+                cls.in_flight += 1
+                cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            try:
+                self._respond(request, self._next_outcome())
+            finally:
+                with lock:
+                    cls.in_flight -= 1
+
+        def _respond(self, request: dict, outcome: str) -> None:
+            if outcome == "429":
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {"Retry-After": "0.1"})
+                return
+            if outcome == "503":
+                self._send_json(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+                return
+
+            time.sleep(delay * 10 if outcome == "slow" else delay)
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": _reply_content(request), "refusal": None},
+                    "finish_reason": "stop",
+                    "logprobs": None
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockOpenAIHandler
+
+
+def start_server(
+    port: int = 0,
+    delay: float = 0.0,
+    fail_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    script: Optional[List[str]] = None
+) -> ThreadingHTTPServer:
+    """Serve the mock API from a background thread; the handler class is server.RequestHandlerClass."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, fail_rate, slow_rate, script))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat completions API.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429/503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed ten times longer")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.delay, args.fail_rate, args.slow_rate))
+    print(f"Mock OpenAI API on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,121 @@
+from typing import Optional
+import pytest
+from pydantic import BaseModel
+from app.utils import gpt_cache as gpt_cache_module
+from app.utils.gpt_cache import GPTResponseCache, is_cacheable_reply
+from app.utils.openai_api import GPT, FakeChatBackend
+
+
+class Extraction(BaseModel):
+    event_name: Optional[str] = None
+
+
+class ScriptedBackend(FakeChatBackend):
+    """FakeChatBackend that replies with the given contents in turn."""
+
+    def __init__(self, *replies):
+        super().__init__()
+        self.replies = list(replies)
+
+    async def complete(self, model, messages, response_format, max_tokens=None, admit=None):
+        self.calls += 1
+        return self.replies.pop(0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(gpt_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def make_gpt(backend, ttl_seconds=60, max_entries=10) -> GPT:
+    return GPT("test-key", "test-model", "test-voice", backend=backend, cache=GPTResponseCache(ttl_seconds, max_entries))
+
+
+def messages(text: str) -> list:
+    return [{"role": "user", "content": text}]
+
+
+@pytest.mark.asyncio
+async def test_repeated_request_is_served_from_the_cache(clock):
+    backend = FakeChatBackend()
+    gpt = make_gpt(backend)
+
+    first = await gpt._complete(messages("a"), Extraction)
+    second = await gpt._complete(messages("a"), Extraction)
+    await gpt._complete(messages("b"), Extraction)
+
+    assert first == second
+    assert backend.calls == 2
+    assert gpt.cache.counters == {"memory_hits": 1, "redis_hits": 0, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_the_ttl(clock):
+    backend = FakeChatBackend()
+    gpt = make_gpt(backend, ttl_seconds=60)
+
+    await gpt._complete(messages("a"), Extraction)
+    clock.now += 59
+    await gpt._complete(messages("a"), Extraction)
+    assert backend.calls == 1
+
+    clock.now += 2
+    await gpt._complete(messages("a"), Extraction)
+    assert backend.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted(clock):
+    backend = FakeChatBackend()
+    gpt = make_gpt(backend, max_entries=2)
+
+    await gpt._complete(messages("a"), Extraction)
+    await gpt._complete(messages("b"), Extraction)
+    # Touch "a" so that "b" is the least recently used
+    await gpt._complete(messages("a"), Extraction)
+    await gpt._complete(messages("c"), Extraction)
+    assert backend.calls == 3
+
+    await gpt._complete(messages("a"), Extraction)
+    assert backend.calls == 3
+    await gpt._complete(messages("b"), Extraction)
+    assert backend.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_replies_that_do_not_parse_are_not_cached(clock):
+    backend = ScriptedBackend('{"event_name": "Exp', None, '{"event_name": 5}', '{"event_name": "Expo"}')
+    gpt = make_gpt(backend)
+
+    assert await gpt._complete(messages("a"), Extraction) == '{"event_name": "Exp'
+    assert await gpt._complete(messages("a"), Extraction) is None
+    assert await gpt._complete(messages("a"), Extraction) == '{"event_name": 5}'
+    assert await gpt._complete(messages("a"), Extraction) == '{"event_name": "Expo"}'
+    assert await gpt._complete(messages("a"), Extraction) == '{"event_name": "Expo"}'
+    assert backend.calls == 4
+
+
+def test_is_cacheable_reply():
+    assert is_cacheable_reply('{"a": 1}')
+    assert is_cacheable_reply('{"event_name": null}', Extraction)
+    assert not is_cacheable_reply(None)
+    assert not is_cacheable_reply('{"a": ')
+    assert not is_cacheable_reply('{"event_name": 5}', Extraction)
+
+
+@pytest.mark.asyncio
+async def test_none_is_never_stored(clock):
+    cache = GPTResponseCache(60, 10)
+    await cache.set("key", None)
+    assert await cache.get("key") is None
+    assert cache.stats()["entries"] == 0
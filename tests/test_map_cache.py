@@ -0,0 +1,107 @@
+import os
+import time
+import pytest
+from app.utils.map_cache import MapCache, StubMapProvider
+from app.utils.pdf_generator import prepare_map_image, static_map_params
+
+
+class CountingProvider(StubMapProvider):
+    def __init__(self):
+        self.fetches = []
+
+    def fetch_sync(self, params):
+        self.fetches.append(params["center"])
+        return super().fetch_sync(params)
+
+
+class CountingProcess:
+    """prepare_map_image (the crop and rounding), counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        return prepare_map_image(data)
+
+
+@pytest.fixture
+def provider():
+    return CountingProvider()
+
+
+@pytest.fixture
+def make_cache(tmp_path, provider):
+    def make(ttl_seconds: int = 3600, max_bytes: int = 100 * 1024 * 1024) -> MapCache:
+        return MapCache(provider, str(tmp_path), ttl_seconds, max_bytes)
+    return make
+
+
+def test_hit_skips_the_provider_and_processing(make_cache, provider):
+    cache = make_cache()
+    process = CountingProcess()
+
+    first = cache.get_sync(static_map_params("Pune"), process).getvalue()
+    second = cache.get_sync(static_map_params("Pune"), process).getvalue()
+
+    assert first == second
+    assert provider.fetches == ["Pune"]
+    assert process.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_async_hit_skips_the_provider_and_processing(make_cache, provider):
+    cache = make_cache()
+    process = CountingProcess()
+
+    await cache.get(static_map_params("Pune"), process)
+    cache.get_sync(static_map_params("Pune"), process)
+    await cache.get(static_map_params("Pune"), process)
+
+    assert provider.fetches == ["Pune"]
+    assert process.calls == 1
+
+
+def test_key_normalises_the_map_parameters():
+    params = {"center": "Pune, Maharashtra", "zoom": "13", "size": "600x400", "maptype": "satellite"}
+    same = {"center": "  pune,   MAHARASHTRA ", "zoom": 13, "size": "600X400", "maptype": "Satellite", "key": "secret"}
+
+    assert MapCache.cache_key(params) == MapCache.cache_key(same)
+    for name, value in (("center", "Mumbai"), ("zoom", "4"), ("size", "300x200"), ("maptype", "roadmap")):
+        assert MapCache.cache_key(params) != MapCache.cache_key({**params, name: value})
+
+
+def test_expired_entry_is_fetched_again(make_cache, provider):
+    cache = make_cache(ttl_seconds=60)
+    process = CountingProcess()
+    params = static_map_params("Pune")
+
+    cache.get_sync(params, process)
+    path = cache._path(params)
+    fetched_at = time.time() - 61
+    os.utime(path, (fetched_at, fetched_at))
+    cache.get_sync(params, process)
+
+    assert provider.fetches == ["Pune", "Pune"]
+    assert process.calls == 2
+    assert time.time() - path.stat().st_mtime < 60
+
+
+def test_least_recently_used_entry_is_evicted(make_cache, provider):
+    cache = make_cache()
+    process = CountingProcess()
+
+    cache.get_sync(static_map_params("Pune"), process)
+    # Room for two maps (the stub's maps are all about the same size)
+    cache.max_bytes = int(cache._path(static_map_params("Pune")).stat().st_size * 2.5)
+    cache.get_sync(static_map_params("Delhi"), process)
+    # Use Pune again so that Delhi is the least recently used
+    cache.get_sync(static_map_params("Pune"), process)
+    cache.get_sync(static_map_params("Kochi"), process)
+
+    assert not cache._path(static_map_params("Delhi")).exists()
+    assert cache._path(static_map_params("Pune")).exists()
+    assert cache._path(static_map_params("Kochi")).exists()
+
+    cache.get_sync(static_map_params("Delhi"), process)
+    assert provider.fetches == ["Pune", "Delhi", "Kochi", "Delhi"]
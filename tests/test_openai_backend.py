@@ -0,0 +1,120 @@
+import time
+import asyncio
+from typing import Optional
+import openai
+import pytest
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from app.utils import openai_api
+from app.utils.openai_api import GPT, OpenAIChatBackend, TenantQuotas
+from mock_openai_server import start_server
+
+
+class Extraction(BaseModel):
+    event_name: Optional[str] = None
+
+
+@pytest.fixture
+def mock_openai():
+    """Start a mock API server: mock_openai(delay=..., script=[...]) -> (server, GPT factory)."""
+    servers = []
+
+    def start(delay: float = 0.0, script: list = None):
+        server = start_server(delay=delay, script=script)
+        servers.append(server)
+        client = AsyncOpenAI(api_key="test-key", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+
+        def make_gpt(max_retries: int = 3, hedge_after: float = None, tenant_concurrency: int = 0) -> GPT:
+            backend = OpenAIChatBackend(lambda: client, max_retries=max_retries, hedge_after=hedge_after)
+            gpt = GPT("test-key", "test-model", "test-voice", backend=backend, cache=None)
+            gpt.quotas = TenantQuotas(tenant_concurrency)
+            return gpt
+
+        return server.RequestHandlerClass, make_gpt
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(openai_api, "RETRY_BACKOFF_BASE_SECONDS", 0.01)
+
+
+def messages(text: str = "a") -> list:
+    return [{"role": "user", "content": text}]
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_and_server_errors_are_retried(mock_openai, fast_backoff):
+    handler, make_gpt = mock_openai(script=["429", "503"])
+    gpt = make_gpt(max_retries=3)
+
+    assert await gpt._complete(messages(), Extraction) == '{"event_name": null}'
+    assert handler.received == 3
+
+
+@pytest.mark.asyncio
+async def test_retries_give_up_after_max_retries(mock_openai, fast_backoff):
+    handler, make_gpt = mock_openai(script=["503", "503", "503"])
+    gpt = make_gpt(max_retries=1)
+
+    with pytest.raises(openai.InternalServerError):
+        await gpt._complete(messages(), Extraction)
+    assert handler.received == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged(mock_openai):
+    # The first request takes 1s, its duplicate 0.1s
+    handler, make_gpt = mock_openai(delay=0.1, script=["slow", "ok"])
+    gpt = make_gpt(hedge_after=0.2)
+
+    started = time.perf_counter()
+    assert await gpt._complete(messages(), Extraction) == '{"event_name": null}'
+    assert time.perf_counter() - started < 0.8
+    assert handler.received == 2
+
+
+@pytest.mark.asyncio
+async def test_hedge_waits_for_a_tenant_slot(mock_openai):
+    handler, make_gpt = mock_openai(delay=0.05, script=["slow"])
+    gpt = make_gpt(hedge_after=0.1, tenant_concurrency=1)
+
+    await gpt._complete(messages(), Extraction, tenant_id="tenant")
+    # The duplicate never ran alongside the original: the tenant has one slot
+    assert handler.max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_and_hedges_go_through_before_request(mock_openai, fast_backoff):
+    handler, make_gpt = mock_openai(delay=0.1, script=["503", "slow", "ok"])
+    gpt = make_gpt(hedge_after=0.2)
+    charged = []
+
+    async def before_request():
+        charged.append(time.perf_counter())
+
+    await gpt._complete(messages(), Extraction, before_request=before_request)
+    # The failed request, the retry and its hedge
+    assert len(charged) == handler.received == 3
+
+
+@pytest.mark.asyncio
+async def test_backoff_does_not_hold_the_tenant_slot(mock_openai, monkeypatch):
+    monkeypatch.setattr(openai_api, "_retry_delay", lambda attempt, e: 0.5)
+    handler, make_gpt = mock_openai(script=["503", "ok", "ok"])
+    gpt = make_gpt(tenant_concurrency=1)
+
+    retried = asyncio.create_task(gpt._complete(messages("a"), Extraction, tenant_id="tenant"))
+    while handler.received < 1:
+        await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await gpt._complete(messages("b"), Extraction, tenant_id="tenant")
+
+    # Served while the first call was backing off, not after it
+    assert time.perf_counter() - started < 0.4
+    assert not retried.done()
+    await retried
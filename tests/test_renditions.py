@@ -0,0 +1,17 @@
+import pytest
+from app.utils.renditions import media_kind
+
+
+@pytest.mark.parametrize("file_name, content_type, kind", [
+    ("photo.jpg", "image/jpeg", "image"),
+    ("photo.jpg", "application/octet-stream", "image"),
+    ("scan.PNG", "binary/octet-stream", "image"),
+    ("photo.webp", None, "image"),
+    ("brochure.pdf", "application/octet-stream", "pdf"),
+    ("clip.mov", "application/octet-stream", "video"),
+    ("notes.txt", "application/octet-stream", None),
+    ("archive", "application/octet-stream", None),
+    ("upload", "image/png", "image"),
+])
+def test_media_kind(file_name, content_type, kind):
+    assert media_kind(file_name, content_type) == kind
@@ -0,0 +1,235 @@
+import io
+import os
+import asyncio
+from uuid import uuid4
+import aioboto3
+import pytest
+import pytest_asyncio
+from botocore.config import Config
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+from app.utils import s3 as s3_utils
+from app.utils.s3 import MULTIPART_PART_SIZE, MULTIPART_THRESHOLD, _multipart_upload
+
+
+def s3_client(endpoint: str):
+    session = aioboto3.Session(aws_access_key_id="testing", aws_secret_access_key="testing")
+    return session.client("s3", endpoint_url=endpoint, config=Config(region_name="us-east-1"))
+
+
+async def make_bucket(s3) -> str:
+    bucket = f"test-{uuid4().hex[:12]}"
+    await s3.create_bucket(Bucket=bucket)
+    return bucket
+
+
+def part_reader(data: bytes):
+    offset = 0
+    reads = 0
+
+    async def read_part() -> bytes:
+        nonlocal offset, reads
+        reads += 1
+        part = data[offset:offset + MULTIPART_PART_SIZE]
+        offset += len(part)
+        return part
+
+    read_part.reads = lambda: reads
+    return read_part
+
+
+class FailingParts:
+    """Wraps a client so that upload_part fails at once for the given part numbers and is delayed for the others."""
+
+    def __init__(self, s3, failing: set, delay: float = 0.0):
+        self._s3 = s3
+        self._failing = failing
+        self._delay = delay
+        self.sent = []
+
+    def __getattr__(self, name):
+        return getattr(self._s3, name)
+
+    async def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] in self._failing:
+            raise RuntimeError(f"part {kwargs['PartNumber']} failed")
+        await asyncio.sleep(self._delay)
+        self.sent.append(kwargs["PartNumber"])
+        return await self._s3.upload_part(**kwargs)
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_roundtrip(moto_endpoint):
+    data = os.urandom(2 * MULTIPART_PART_SIZE + 1234)
+    async with s3_client(moto_endpoint) as s3:
+        bucket = await make_bucket(s3)
+        await _multipart_upload(s3, part_reader(data), bucket, "big.bin", {"ContentType": "application/octet-stream"})
+
+        response = await s3.get_object(Bucket=bucket, Key="big.bin")
+        async with response["Body"] as stream:
+            assert await stream.read() == data
+        assert response["ContentType"] == "application/octet-stream"
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_stops_reading_after_a_failed_part(moto_endpoint, monkeypatch):
+    monkeypatch.setattr(s3_utils, "MULTIPART_CONCURRENCY", 1)
+    data = os.urandom(6 * MULTIPART_PART_SIZE)
+    read_part = part_reader(data)
+    async with s3_client(moto_endpoint) as s3:
+        bucket = await make_bucket(s3)
+        failing = FailingParts(s3, failing={1})
+
+        with pytest.raises(RuntimeError, match="part 1 failed"):
+            await _multipart_upload(failing, read_part, bucket, "big.bin", {})
+
+        # One part in flight at a time: the failure of part 1 is seen before part 2 is read
+        assert read_part.reads() == 1
+        uploads = await s3.list_multipart_uploads(Bucket=bucket)
+        assert not uploads.get("Uploads")
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload_waits_for_cancelled_parts_before_aborting(moto_endpoint):
+    data = os.urandom(4 * MULTIPART_PART_SIZE)
+    async with s3_client(moto_endpoint) as s3:
+        bucket = await make_bucket(s3)
+        aborted_with_pending = []
+
+        class Tracking(FailingParts):
+            async def abort_multipart_upload(self, **kwargs):
+                aborted_with_pending.append(
+                    [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "upload_part" and not task.done()]
+                )
+                return await self._s3.abort_multipart_upload(**kwargs)
+
+        failing = Tracking(s3, failing={4}, delay=0.2)
+
+        with pytest.raises(RuntimeError, match="part 4 failed"):
+            await _multipart_upload(failing, part_reader(data), bucket, "big.bin", {})
+
+        assert aborted_with_pending == [[]]
+        # Parts 1-3 were cancelled while delayed, before reaching S3
+        assert failing.sent == []
+        uploads = await s3.list_multipart_uploads(Bucket=bucket)
+        assert not uploads.get("Uploads")
+
+
+@pytest.mark.asyncio
+async def test_ensure_s3_bucket_provisions_once(moto_endpoint, monkeypatch):
+    monkeypatch.setenv("AWS_ENDPOINT_URL", moto_endpoint)
+    calls = []
+    provision = s3_utils._provision_bucket
+    monkeypatch.setattr(s3_utils, "_provision_bucket", lambda bucket: calls.append(bucket) or provision(bucket))
+    tenant_id = uuid4().hex
+
+    buckets = await asyncio.gather(*(s3_utils.ensure_s3_bucket(f"AWS_S3_BUCKET_{tenant_id}") for _ in range(5)))
+    await s3_utils.ensure_s3_bucket(f"AWS_S3_BUCKET_{tenant_id}")
+
+    assert len(calls) == 1
+    assert set(buckets) == {s3_utils.get_valid_bucket_name(f"AWS_S3_BUCKET_{tenant_id}")}
+    async with s3_client(moto_endpoint) as s3:
+        await s3.head_bucket(Bucket=buckets[0])
+
+
+@pytest.mark.asyncio
+async def test_ensure_s3_bucket_retries_after_a_failure(monkeypatch):
+    attempts = []
+
+    def provision(bucket):
+        attempts.append(bucket)
+        if len(attempts) == 1:
+            raise RuntimeError("S3 unavailable")
+
+    monkeypatch.setattr(s3_utils, "_provision_bucket", provision)
+    bucket_name = f"AWS_S3_BUCKET_{uuid4().hex}"
+
+    await s3_utils.ensure_s3_bucket(bucket_name)
+    assert s3_utils.get_valid_bucket_name(bucket_name) not in s3_utils._provisioned_buckets
+
+    await s3_utils.ensure_s3_bucket(bucket_name)
+    await s3_utils.ensure_s3_bucket(bucket_name)
+    assert len(attempts) == 2
+
+
+class RecordedCalls:
+    """Operation name and parameters of every request an aiobotocore client makes."""
+
+    def __init__(self, client):
+        self.calls = []
+        client.meta.events.register("provide-client-params.s3.*", self._record)
+
+    def _record(self, params, model, **kwargs):
+        self.calls.append((model.name, dict(params)))
+
+    @property
+    def operations(self) -> list:
+        return [name for name, params in self.calls]
+
+    def params(self, operation: str) -> dict:
+        return next(params for name, params in self.calls if name == operation)
+
+
+@pytest_asyncio.fixture
+async def pooled_s3(moto_endpoint, monkeypatch):
+    """The shared s3_pool client, started against moto, with its calls recorded."""
+    monkeypatch.setenv("AWS_ENDPOINT_URL", moto_endpoint)
+    await s3_utils.s3_pool.start()
+    try:
+        yield RecordedCalls(s3_utils.s3_pool._client)
+    finally:
+        await s3_utils.s3_pool.close()
+
+
+def upload(data: bytes, filename: str = "report.bin") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename, headers=Headers({"content-type": "application/octet-stream"}))
+
+
+async def is_public(s3, bucket: str, key: str) -> bool:
+    acl = await s3.get_object_acl(Bucket=bucket, Key=key)
+    return any(
+        grant["Grantee"].get("URI") == "http://acs.amazonaws.com/groups/global/AllUsers" and grant["Permission"] == "READ"
+        for grant in acl["Grants"]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size, operations", [
+    (1024, ["PutObject"]),
+    (MULTIPART_THRESHOLD, ["PutObject"]),
+    (MULTIPART_THRESHOLD + 1, ["CreateMultipartUpload", "UploadPart", "UploadPart", "UploadPart", "CompleteMultipartUpload"]),
+])
+async def test_upload_sends_the_acl_with_the_object(pooled_s3, moto_endpoint, size, operations):
+    bucket_name = f"AWS_S3_BUCKET_{uuid4().hex}"
+    bucket = s3_utils.get_valid_bucket_name(bucket_name)
+    data = os.urandom(size)
+    async with s3_client(moto_endpoint) as s3:
+        await s3.create_bucket(Bucket=bucket)
+
+        await s3_utils.upload_file_to_s3(upload(data), key="report.bin", bucket=bucket_name)
+
+        assert sorted(pooled_s3.operations) == sorted(operations)
+        first = "PutObject" if operations == ["PutObject"] else "CreateMultipartUpload"
+        assert pooled_s3.params(first)["ACL"] == "public-read"
+        assert "PutObjectAcl" not in pooled_s3.operations
+
+        response = await s3.get_object(Bucket=bucket, Key="report.bin")
+        async with response["Body"] as stream:
+            assert await stream.read() == data
+        assert await is_public(s3, bucket, "report.bin")
+
+
+@pytest.mark.asyncio
+async def test_upload_without_the_pool_uses_a_short_lived_client(moto_endpoint, monkeypatch):
+    monkeypatch.setenv("AWS_ENDPOINT_URL", moto_endpoint)
+    bucket_name = f"AWS_S3_BUCKET_{uuid4().hex}"
+    bucket = s3_utils.get_valid_bucket_name(bucket_name)
+    async with s3_client(moto_endpoint) as s3:
+        await s3.create_bucket(Bucket=bucket)
+
+        await s3_utils.upload_file_to_s3(upload(b"hello"), key="hello.txt", bucket=bucket_name)
+
+        response = await s3.get_object(Bucket=bucket, Key="hello.txt")
+        async with response["Body"] as stream:
+            assert await stream.read() == b"hello"
+        assert await is_public(s3, bucket, "hello.txt")
@@ -0,0 +1,77 @@
+import pytest
+import pytest_asyncio
+from mongomock_motor import AsyncMongoMockClient
+from app.db.repository.events import EVENT_SEARCH_FIELDS
+from app.utils.search import MAX_SEARCH_TERMS, search_filter, search_pipeline, search_terms, search_tokens, tokenize
+
+
+def event(_id: str, **fields) -> dict:
+    doc = {"_id": _id, "tenant_id": "tenant", **fields}
+    doc["search_tokens"] = search_tokens(doc, EVENT_SEARCH_FIELDS)
+    return doc
+
+
+@pytest_asyncio.fixture
+async def events():
+    collection = AsyncMongoMockClient()["test"]["events"]
+    await collection.insert_many([
+        event("expo", event_name="Robot Expo", institute_name="City College", location="Pune"),
+        event("fair", event_name="Robotics Fair", institute_name="City College", location="Delhi"),
+        event("lab", event_name="Science Day", institute_name="Robotics Lab", location="Kochi"),
+        event("other", event_name="Music Night", institute_name="Arts Academy", location="Goa"),
+    ])
+    return collection
+
+
+async def matching_ids(collection, search: str) -> set:
+    return {doc["_id"] async for doc in collection.find(search_filter(search_terms(search)))}
+
+
+def test_tokenize():
+    assert tokenize("Annual Tech-Fest, 2026!") == ["annual", "tech", "fest", "2026"]
+    assert tokenize("Café ÜBER café") == ["café", "über", "café"]
+    assert tokenize(None) == []
+    assert tokenize(42) == ["42"]
+
+
+def test_search_tokens_are_unique_and_sorted():
+    doc = {"event_name": "Robot Fair", "location": "Pune", "institute_name": "Robot Club"}
+    assert search_tokens(doc, EVENT_SEARCH_FIELDS) == ["club", "fair", "pune", "robot"]
+
+
+def test_search_terms_are_distinct_and_capped():
+    assert search_terms("Robot robot FAIR") == ["robot", "fair"]
+    assert len(search_terms(" ".join(f"term{i}" for i in range(20)))) == MAX_SEARCH_TERMS
+
+
+def test_regex_metacharacters_are_escaped():
+    # The tokenizer drops them from typed input...
+    assert search_terms("a.*(") == ["a"]
+    # ...and a term that still carries one matches it literally
+    assert search_filter(["a.*("]) == {"$and": [{"search_tokens": {"$regex": "^a\\.\\*\\("}}]}
+
+
+@pytest.mark.asyncio
+async def test_user_regex_is_not_interpreted(events):
+    await events.insert_one({"_id": "literal", "search_tokens": ["a.*("]})
+    assert {doc["_id"] async for doc in events.find(search_filter(["a.*("]))} == {"literal"}
+    assert {doc["_id"] async for doc in events.find(search_filter(["r.*"]))} == set()
+
+
+@pytest.mark.asyncio
+async def test_terms_match_word_prefixes_only(events):
+    assert all(clause["search_tokens"]["$regex"].startswith("^") for clause in search_filter(["rob", "fair"])["$and"])
+    assert await matching_ids(events, "rob") == {"expo", "fair", "lab"}
+    # "otics" is inside "robotics" but starts no word
+    assert await matching_ids(events, "otics") == set()
+    assert await matching_ids(events, "rob fair") == {"fair"}
+
+
+@pytest.mark.asyncio
+async def test_results_are_ranked_by_relevance(events):
+    pipeline = search_pipeline({"tenant_id": "tenant"}, "robot", "event_name")
+    ranked = [doc async for doc in events.aggregate(pipeline)]
+
+    # Whole word in the name, then a prefix in the name, then a prefix elsewhere
+    assert [doc["_id"] for doc in ranked] == ["expo", "fair", "lab"]
+    assert [doc["_score"] for doc in ranked] == [3, 2, 1]
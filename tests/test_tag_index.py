@@ -0,0 +1,50 @@
+from app.utils.tag_index import FUZZY_MAX_QUERY_CHARS, FUZZY_SCORE_CUTOFF, TenantTagIndex
+
+
+def make_index() -> TenantTagIndex:
+    index = TenantTagIndex()
+    index.add_tags([
+        ("robotics", "Robotics", "topic"),
+        ("robots", "Robots", "topic"),
+        ("arm", "Robotic Arm", "topic"),
+        ("club", "Robotics Club", "group"),
+        ("rotary", "Rotary", "group"),
+        ("music", "Music", "topic"),
+    ])
+    index.set_file_tags("f1", ["arm", "club", "music"])
+    index.set_file_tags("f2", ["arm", "robots"])
+    index.set_file_tags("f3", ["arm"])
+    return index
+
+
+def names(suggestions: list) -> list:
+    return [tag["name"] for tag in suggestions]
+
+
+def test_fuzzy_suggestions_rank_by_score_then_co_occurrence():
+    index = make_index()
+
+    # "Robotic Arm" and "Robotics Club" score the same; the arm is on more files.
+    # "Rotary" and "Music" score below FUZZY_SCORE_CUTOFF.
+    assert names(index.suggest("robotcs", fuzzy=True)) == ["Robotics", "Robots", "Robotic Arm", "Robotics Club"]
+
+
+def test_fuzzy_score_cutoff():
+    index = make_index()
+    scores = index.fuzzy_matching_tags("robotcs")
+
+    assert set(scores) == {"robotics", "robots", "arm", "club"}
+    assert all(score >= FUZZY_SCORE_CUTOFF for score in scores.values())
+    assert set(index.fuzzy_matching_tags("robotcs", score_cutoff=90)) == {"robotics", "robots"}
+
+
+def test_fuzzy_suggestions_within_selected_tags():
+    index = make_index()
+    assert names(index.suggest("robotcs", selected=["arm"], fuzzy=True)) == ["Robots", "Robotic Arm", "Robotics Club"]
+
+
+def test_long_fuzzy_query_is_cut_before_scoring():
+    index = make_index()
+    query = "robotcs " + "z" * 100_000
+
+    assert index.fuzzy_matching_tags(query) == index.fuzzy_matching_tags(query[:FUZZY_MAX_QUERY_CHARS])
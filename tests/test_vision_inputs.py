@@ -0,0 +1,46 @@
+import random
+from PIL import Image, ImageDraw, ImageFilter
+from app.utils import vision_inputs
+from app.utils.vision_inputs import VisionInputs, _ImageSelector, _join_text
+
+
+def text_page(seed: int) -> Image.Image:
+    """A page of dense 'text': rows of word-sized dark blocks."""
+    rng = random.Random(seed)
+    page = Image.new("L", (1240, 1754), 255)
+    draw = ImageDraw.Draw(page)
+    for y in range(150, 1600, 28):
+        x = 100
+        while x < 1100:
+            width = rng.randint(20, 90)
+            draw.rectangle((x, y, min(x + width, 1140), y + 14), fill=30)
+            x += width + 12
+    return page
+
+
+def test_different_text_pages_are_all_kept():
+    inputs = VisionInputs()
+    selector = _ImageSelector(inputs)
+    for seed in range(5):
+        selector.offer(text_page(seed), b"page-%d" % seed)
+    assert inputs.images == [b"page-0", b"page-1", b"page-2", b"page-3", b"page-4"]
+
+
+def test_only_a_rescan_of_the_previous_page_is_dropped():
+    inputs = VisionInputs()
+    selector = _ImageSelector(inputs)
+    rescan = text_page(0).rotate(0.5, fillcolor=255).filter(ImageFilter.GaussianBlur(1))
+
+    selector.offer(text_page(0), b"first")
+    selector.offer(rescan, b"rescan")
+    selector.offer(text_page(1), b"second")
+    selector.offer(rescan, b"rescan again")
+
+    assert inputs.images == [b"first", b"second", b"rescan again"]
+
+
+def test_text_is_capped(monkeypatch):
+    monkeypatch.setattr(vision_inputs, "VISION_MAX_TEXT_CHARS", 10)
+    assert _join_text(["abcd", "efgh"]) == "abcd\n\nefgh"
+    assert _join_text(["abcd", "efghijkl", "mnop"]) == "abcd\n\nefgh"
+    assert _join_text(["abcdefghijklmnop", "qrst"]) == "abcdefghij"